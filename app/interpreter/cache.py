@@ -0,0 +1,142 @@
+import sys
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .helpers import (
+    ALL_ASSERTIONS,
+    ALL_RULES,
+    Compound,
+    get_conclusion,
+    get_index_key,
+    is_indexable,
+    is_rule,
+    is_var,
+)
+from .terms import Symbol, Term, compound, map_term, var
+
+RESULT_CACHE_ENTRIES = 1024
+RESULT_CACHE_BYTES = 64 << 20
+
+CANONICAL_PREFIX = "$_"
+
+Names = Dict[str, Symbol]
+
+
+# Renames the variables of a query to `$_0`, `$_1`, ... in order of first appearance, so queries that differ only
+# in variable names share a key. `names` maps the canonical names back to the original variables.
+def canonicalize(query: Compound) -> Tuple[Compound, Names]:
+    canonical: Dict[str, Symbol] = {}
+    names: Names = {}
+
+    def rename_var(node: Term) -> Term:
+        if not is_var(node):
+            return node
+        if node.value not in canonical:
+            canonical[node.value] = var(f"{CANONICAL_PREFIX}{len(canonical)}")
+            names[canonical[node.value].value] = node
+        return canonical[node.value]
+
+    return map_term(query, rename_var, compound), names
+
+
+def rename(term: Term, names: Names) -> Term:
+    def rename_var(node: Term) -> Term:
+        return names.get(node.value, node) if is_var(node) else node
+
+    return map_term(term, rename_var, tuple)
+
+
+def changed_keys(entities: Iterable[Compound]) -> Set[str]:
+    keys: Set[str] = set()
+    for entity in entities:
+        if is_rule(entity):
+            keys.add(ALL_RULES)
+            pattern = get_conclusion(entity)
+        else:
+            keys.add(ALL_ASSERTIONS)
+            pattern = entity
+        if is_indexable(pattern):
+            keys.add(get_index_key(pattern))
+    return keys
+
+
+class CacheEntry:
+    __slots__ = ("results", "dependencies", "size")
+
+    def __init__(self, results: List[Term], dependencies: Set[str], size: int):
+        self.results = results
+        self.dependencies = dependencies
+        self.size = size
+
+
+# Least recently used query results, keyed by the canonical query. Every entry lists the index keys of the fact
+# buckets and rule lists read while it was computed; a change to a bucket only drops the entries that read it.
+# `ALL_ASSERTIONS` and `ALL_RULES` stand for scans that could see any fact or rule. Sizes are shallow estimates.
+# While a query is evaluated for the cache, the keys it reads are collected in `reads`.
+class ResultCache:
+    def __init__(self, entries: int = RESULT_CACHE_ENTRIES, max_bytes: int = RESULT_CACHE_BYTES):
+        self.enabled = False
+        self.max_entries = entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Compound, CacheEntry]" = OrderedDict()
+        self.dependents: Dict[str, Set[Compound]] = {}
+        self.size = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.reads: Optional[Set[str]] = None
+
+    def enable(self, entries: int = RESULT_CACHE_ENTRIES, max_bytes: int = RESULT_CACHE_BYTES) -> None:
+        self.enabled = True
+        self.max_entries = entries
+        self.max_bytes = max_bytes
+        self.clear()
+
+    def depend_on(self, *keys: str) -> None:
+        if self.reads is not None:
+            self.reads.update(keys)
+
+    def get(self, key: Compound) -> Optional[List[Term]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry.results
+
+    def put(self, key: Compound, results: List[Term], dependencies: Set[str], version: int) -> None:
+        size = sys.getsizeof(key) + sys.getsizeof(results) + sum(sys.getsizeof(result) for result in results)
+        if version != self.version or size > self.max_bytes or self.max_entries <= 0:
+            return
+        self._evict(key)
+        self.entries[key] = CacheEntry(results, dependencies, size)
+        self.size += size
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(key)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            self._evict(next(iter(self.entries)))
+
+    def invalidate(self, entities: Sequence[Compound]) -> None:
+        self.version += 1
+        for dependency in changed_keys(entities):
+            for key in self.dependents.pop(dependency, set()):
+                self._evict(key)
+
+    def clear(self) -> None:
+        self.version += 1
+        self.entries.clear()
+        self.dependents.clear()
+        self.size = 0
+
+    def _evict(self, key: Compound) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        for dependency in entry.dependencies:
+            dependents = self.dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self.dependents[dependency]
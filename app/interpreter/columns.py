@@ -0,0 +1,280 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .helpers import (
+    Frame,
+    Frames,
+    get_index_key,
+    is_constant_symbol,
+    is_dot,
+    is_var,
+    resolve,
+    use_index,
+)
+from .matcher import Matcher
+from .terms import Compound, Symbol, compound
+
+CODE = struct.Struct("<I")
+INDEX_AFTER_SCANS = 2
+# Codes, like every number in an image, are little-endian, so native arrays of them are byte-swapped on big-endian
+# hosts.
+SWAP_BYTES = sys.byteorder != "little"
+
+Buffer = Union[bytearray, mmap.mmap]
+
+
+def is_columnar(fact: Compound) -> bool:
+    return use_index(fact) and all(is_constant_symbol(argument) for argument in fact[1:])
+
+
+# One argument of a relation: packed little-endian uint32 symbol codes in `data[start:start + 4 * size]`. `data` is a
+# bytearray, or a read-only memory map shared with other processes until the first append copies it out.
+# A lookup scans the raw bytes for the code; once a column has been scanned `INDEX_AFTER_SCANS` times it gets an
+# `index` from every code to the rows holding it, which appends keep up to date.
+class Column:
+    __slots__ = ("data", "start", "size", "index", "scans")
+
+    def __init__(self, data: Optional[Buffer] = None, start: int = 0, size: int = 0):
+        self.data: Buffer = bytearray() if data is None else data
+        self.start = start
+        self.size = size
+        self.index: Optional[Dict[int, array]] = None
+        self.scans = 0
+
+    def append(self, code: int) -> None:
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data[self.start:self.start + CODE.size * self.size])
+            self.start = 0
+        self.data += CODE.pack(code)
+        if self.index is not None:
+            self.index.setdefault(code, array("I")).append(self.size)
+        self.size += 1
+
+    def code(self, row: int) -> int:
+        return CODE.unpack_from(self.data, self.start + CODE.size * row)[0]
+
+    def rows(self, code: int) -> Sequence[int]:
+        if self.index is None:
+            self.scans += 1
+            if self.scans < INDEX_AFTER_SCANS:
+                return self._scan(code)
+            self.index = self._build_index()
+        return self.index.get(code, ())
+
+    def _scan(self, code: int) -> List[int]:
+        pattern = CODE.pack(code)
+        end = self.start + CODE.size * self.size
+        rows = []
+        offset = self.data.find(pattern, self.start, end)  # type: ignore
+        while offset >= 0:
+            row, misaligned = divmod(offset - self.start, CODE.size)
+            if not misaligned:
+                rows.append(row)
+            offset = self.data.find(pattern, offset + (1 if misaligned else CODE.size), end)  # type: ignore
+        return rows
+
+    def _build_index(self) -> Dict[int, array]:
+        codes = array("I", self.tobytes())
+        if SWAP_BYTES:
+            codes.byteswap()
+        index: Dict[int, array] = {}
+        for row, code in enumerate(codes):
+            index.setdefault(code, array("I")).append(row)
+        return index
+
+    def tobytes(self) -> bytes:
+        return bytes(self.data[self.start:self.start + CODE.size * self.size])
+
+
+# Ground facts of one predicate and arity whose arguments are all constant symbols. `seen` holds a bitmap of the
+# codes met in every column, which keeps the planner's distinct counts without storing the values again.
+# Retracted rows stay in the columns, listed in `removed`, until the relation is compacted.
+class ColumnRelation:
+    __slots__ = ("head", "size", "columns", "seen", "removed")
+
+    def __init__(self, head: Symbol, columns: List[Column], seen: List[bytearray], size: int = 0):
+        self.head = head
+        self.size = size
+        self.columns = columns
+        self.seen = seen
+        self.removed: Set[int] = set()
+
+    def live(self) -> int:
+        return self.size - len(self.removed)
+
+    def rows(self) -> Iterator[int]:
+        return (row for row in range(self.size) if row not in self.removed)
+
+    def compact(self) -> None:
+        if not self.removed:
+            return
+        rows = list(self.rows())
+        for column in self.columns:
+            codes = [column.code(row) for row in rows]
+            column.data = bytearray(b"".join(CODE.pack(code) for code in codes))
+            column.start = 0
+            column.size = len(rows)
+            column.index = None
+            column.scans = 0
+        self.size = len(rows)
+        self.removed = set()
+
+    def append(self, codes: List[int]) -> List[int]:
+        new = []
+        for position, (column, seen, code) in enumerate(zip(self.columns, self.seen, codes), 1):
+            column.append(code)
+            byte, bit = divmod(code, 8)
+            if byte >= len(seen):
+                seen.extend(bytes(byte + 1 - len(seen)))
+            if not seen[byte] & (1 << bit):
+                seen[byte] |= 1 << bit
+                new.append(position)
+        self.size += 1
+        return new
+
+    def distinct(self) -> List[int]:
+        return [bin(int.from_bytes(seen, "little")).count("1") for seen in self.seen]
+
+    def copy(self) -> "ColumnRelation":
+        columns = [Column(bytearray(column.tobytes()), 0, column.size) for column in self.columns]
+        relation = ColumnRelation(self.head, columns, [bytearray(seen) for seen in self.seen], self.size)
+        relation.removed = set(self.removed)
+        return relation
+
+
+# Flat ground facts are kept column by column as codes into a local symbol table instead of as tuples, a few bytes
+# per argument. Lookups by constants read the rows of the rarest one from its column index and check the others row
+# by row, and tuples are only built for callers that need whole facts.
+class ColumnStore:
+    def __init__(self):
+        self.enabled = False
+        self.symbols: List[Symbol] = []
+        self.codes: Dict[Symbol, int] = {}
+        self.relations: Dict[str, List[ColumnRelation]] = {}
+        self.size = 0
+
+    def restore(self, other: "ColumnStore") -> None:
+        self.symbols = other.symbols
+        self.codes = other.codes
+        self.relations = other.relations
+        self.size = other.size
+
+    def copy(self) -> "ColumnStore":
+        store = ColumnStore()
+        store.symbols = list(self.symbols)
+        store.codes = dict(self.codes)
+        for key, relations in self.relations.items():
+            store.relations[key] = [relation.copy() for relation in relations]
+        store.size = self.size
+        return store
+
+    def code(self, value: Symbol) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.symbols)
+            self.symbols.append(value)
+        return code
+
+    def add(self, fact: Compound) -> List[int]:
+        relations = self.relations.setdefault(get_index_key(fact), [])
+        relation = next((r for r in relations if r.head is fact[0] and len(r.columns) == len(fact) - 1), None)
+        if relation is None:
+            relation = ColumnRelation(fact[0], [Column() for _ in fact[1:]], [bytearray() for _ in fact[1:]])
+            relations.append(relation)
+        self.size += 1
+        return relation.append([self.code(argument) for argument in fact[1:]])
+
+    def remove(self, fact: Compound) -> int:
+        relation = next((r for r in self.relations.get(get_index_key(fact), [])
+                         if r.head is fact[0] and len(r.columns) == len(fact) - 1), None)
+        codes = [self.codes.get(argument) for argument in fact[1:]]
+        if relation is None or None in codes:
+            return 0
+        rows = list(self._rows(relation, list(zip(relation.columns, codes))))  # type: ignore
+        relation.removed.update(rows)
+        self.size -= len(rows)
+        return len(rows)
+
+    def compact(self) -> None:
+        for relations in self.relations.values():
+            for relation in relations:
+                relation.compact()
+
+    def count(self, key: str) -> int:
+        return sum(relation.live() for relation in self.relations.get(key, []))
+
+    def facts(self, key: Optional[str] = None) -> Iterator[Compound]:
+        relations = self.relations.get(key, []) if key is not None else \
+            [relation for relations in self.relations.values() for relation in relations]
+        for relation in relations:
+            for row in relation.rows():
+                yield self._fact(relation, row)
+
+    def match(self, query: Compound, frame: Frame, fallback: Matcher) -> Frames:
+        if not query:
+            return
+        head = resolve(query[0], frame)
+        if is_var(head):
+            relations = [relation for relations in self.relations.values() for relation in relations]
+        elif is_constant_symbol(head):
+            relations = [relation for relation in self.relations.get(head.value, []) if relation.head is head]
+        else:
+            return
+        if any(is_dot(node) for node in query):
+            yield from self._match_facts(relations, frame, fallback)
+            return
+        for relation in relations:
+            if len(relation.columns) == len(query) - 1:
+                local = frame.set(head.value, relation.head) if is_var(head) else frame
+                yield from self._match_relation(relation, query, local)
+
+    # Dotted patterns match whole facts, so the rows are turned back into tuples for the general matcher.
+    def _match_facts(self, relations: List[ColumnRelation], frame: Frame, match: Matcher) -> Frames:
+        for relation in relations:
+            for row in relation.rows():
+                match_result = match(self._fact(relation, row), frame)
+                if match_result is not None:
+                    yield match_result
+
+    def _fact(self, relation: ColumnRelation, row: int) -> Compound:
+        return compound((relation.head, *(self.symbols[column.code(row)] for column in relation.columns)))
+
+    def _match_relation(self, relation: ColumnRelation, query: Compound, frame: Frame) -> Frames:
+        constants: List[Tuple[Column, int]] = []
+        variables: List[Tuple[Column, str]] = []
+        for column, node in zip(relation.columns, query[1:]):
+            node = resolve(node, frame)
+            if is_var(node):
+                variables.append((column, node.value))
+                continue
+            code = self.codes.get(node) if is_constant_symbol(node) else None
+            if code is None:
+                return
+            constants.append((column, code))
+        for row in self._rows(relation, constants):
+            result: Optional[Frame] = frame
+            for column, name in variables:
+                value = self.symbols[column.code(row)]
+                binding = result.get(name)
+                if binding is None:
+                    result = result.set(name, value)
+                elif binding is not value:
+                    result = None
+                    break
+            if result is not None:
+                yield result
+
+    @staticmethod
+    def _rows(relation: ColumnRelation, constants: List[Tuple[Column, int]]) -> Iterator[int]:
+        if not constants:
+            yield from relation.rows()
+            return
+        candidates = [column.rows(code) for column, code in constants]
+        rarest = min(range(len(constants)), key=lambda position: len(candidates[position]))
+        checks = constants[:rarest] + constants[rarest + 1:]
+        for row in candidates[rarest]:
+            if row not in relation.removed and all(column.code(row) == other for column, other in checks):
+                yield row
@@ -0,0 +1,284 @@
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..lexer import token
+from .columns import ColumnStore
+from .helpers import (
+    ALL_RULES,
+    VAR_INDEX_KEY,
+    Compound,
+    get_body,
+    get_conclusion,
+    get_index_key,
+    instantiate_args,
+    is_constant_symbol,
+    is_keyword,
+    is_non_empty_list,
+    is_var,
+    use_index,
+)
+from .rules import RuleBuckets
+from .terms import Term, compound, is_ground
+
+Relation = Dict[Term, None]
+Store = Dict[str, List[Compound]]
+Procedures = Dict[str, Callable[[List[object]], bool]]
+Binding = Dict[str, Term]
+
+
+def is_flat_atom(pattern: Term) -> bool:
+    return is_non_empty_list(pattern) and is_constant_symbol(pattern[0]) and \
+        all(is_var(arg) or is_ground(arg) for arg in pattern[1:])
+
+
+def atom_vars(pattern: Compound) -> Set[str]:
+    return {arg.value for arg in pattern[1:] if is_var(arg)}
+
+
+class Clause:
+    __slots__ = ("head", "positives", "negatives", "applies")
+
+    def __init__(self, head: Compound):
+        self.head = head
+        self.positives: List[Compound] = []
+        self.negatives: List[Compound] = []
+        self.applies: List[Compound] = []
+
+    def add_conjunct(self, conjunct: Compound) -> bool:
+        if is_keyword(conjunct, token.NOT_KEYWORD):
+            self.negatives.append(conjunct[1])
+            return is_flat_atom(conjunct[1])
+        if is_keyword(conjunct, token.APPLY_KEYWORD):
+            self.applies.append(conjunct)
+            return True
+        self.positives.append(conjunct)
+        return is_flat_atom(conjunct)
+
+    def is_safe(self) -> bool:
+        bound: Set[str] = set()
+        for positive in self.positives:
+            bound |= atom_vars(positive)
+        return atom_vars(self.head) <= bound and all(atom_vars(negative) <= bound for negative in self.negatives)
+
+    def dependencies(self) -> Iterable[Tuple[str, bool]]:
+        for positive in self.positives:
+            yield get_index_key(positive), False
+        for negative in self.negatives:
+            yield get_index_key(negative), True
+
+
+def compile_rule(rule: Compound) -> Optional[List[Clause]]:
+    head = get_conclusion(rule)
+    body = get_body(rule)
+    if not is_flat_atom(head):
+        return None
+    disjuncts = body[1:] if is_keyword(body, token.OR_KEYWORD) else (body,)
+    clauses = []
+    for disjunct in disjuncts:
+        clause = Clause(head)
+        if disjunct is None:
+            conjuncts: Compound = ()
+        elif is_keyword(disjunct, token.AND_KEYWORD):
+            conjuncts = disjunct[1:]
+        else:
+            conjuncts = (disjunct,)
+        if not all(clause.add_conjunct(conjunct) for conjunct in conjuncts) or not clause.is_safe():
+            return None
+        clauses.append(clause)
+    return clauses
+
+
+# Bottom-up evaluation of the plain Datalog part of the knowledge base: predicates whose rules have flat heads and
+# bodies made of flat atoms, @not and @apply, and that only depend on such predicates or on pure facts. They are
+# stratified around @not and materialized with semi-naive iteration; everything else is left to the resolver.
+class Datalog:
+    def __init__(self, assertions: Store, rules: RuleBuckets, procedures: Procedures, columns: ColumnStore,
+                 retracted: Dict[Compound, int]):
+        self.enabled = False
+        self.assertions = assertions
+        self.columns = columns
+        self.retracted = retracted
+        self.rules = rules
+        self.procedures = procedures
+        self.relations: Optional[Dict[str, Relation]] = None
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.clear()
+
+    def clear(self) -> None:
+        self.relations = None
+
+    def relation(self, pattern: Compound) -> Optional[Relation]:
+        if not self.enabled or not use_index(pattern):
+            return None
+        if self.relations is None:
+            self.relations = self._materialize()
+        return self.relations.get(get_index_key(pattern))
+
+    def _materialize(self) -> Dict[str, Relation]:
+        strata = self._stratify(self._eligible_clauses(self.rules))
+        relations: Dict[str, Relation] = {}
+        for stratum in strata:
+            for predicate in stratum:
+                relations[predicate] = dict.fromkeys(self._facts(predicate))
+            self._evaluate_stratum(stratum, relations)
+        return relations
+
+    @staticmethod
+    def _eligible_clauses(rules: RuleBuckets) -> Dict[str, List[Clause]]:
+        if rules.get(VAR_INDEX_KEY):
+            return {}
+        programs: Dict[str, List[Clause]] = {}
+        for predicate, predicate_rules in rules.items():
+            if predicate == ALL_RULES:
+                continue
+            compiled = [compile_rule(template.rule) for template in predicate_rules.values()]
+            if all(clauses is not None for clauses in compiled):
+                programs[predicate] = [clause for clauses in compiled for clause in clauses]
+        changed = True
+        while changed:
+            changed = False
+            for predicate, clauses in list(programs.items()):
+                dependencies = {dependency for clause in clauses for dependency, _ in clause.dependencies()}
+                if any(dependency in rules and dependency not in programs for dependency in dependencies):
+                    del programs[predicate]
+                    changed = True
+        return programs
+
+    def _stratify(self, programs: Dict[str, List[Clause]]) -> List[Dict[str, List[Clause]]]:
+        while True:
+            levels = stratum_levels(programs)
+            unstratified = {predicate for predicate, level in levels.items() if level > len(programs)}
+            if not unstratified:
+                break
+            programs = {predicate: clauses for predicate, clauses in programs.items() if predicate not in unstratified}
+            programs = self._eligible_clauses_without(programs, unstratified)
+        strata: List[Dict[str, List[Clause]]] = [{} for _ in range(max(levels.values(), default=-1) + 1)]
+        for predicate, level in levels.items():
+            strata[level][predicate] = programs[predicate]
+        return strata
+
+    @staticmethod
+    def _eligible_clauses_without(programs: Dict[str, List[Clause]], removed: Set[str]) -> Dict[str, List[Clause]]:
+        changed = True
+        while changed:
+            changed = False
+            for predicate, clauses in list(programs.items()):
+                if any(dependency in removed for clause in clauses for dependency, _ in clause.dependencies()):
+                    del programs[predicate]
+                    removed.add(predicate)
+                    changed = True
+        return programs
+
+    def _evaluate_stratum(self, stratum: Dict[str, List[Clause]], relations: Dict[str, Relation]) -> None:
+        delta = {predicate: self._derive(predicate, clauses, relations, None) for predicate, clauses in stratum.items()}
+        while any(delta.values()):
+            for predicate, facts in delta.items():
+                relations[predicate].update(facts)
+            delta = {
+                predicate: self._derive(predicate, clauses, relations, delta) for predicate, clauses in stratum.items()
+            }
+
+    # Facts of one predicate that its clauses derive and `relations` does not hold yet. Without `delta` every clause
+    # is joined once against whole relations; otherwise each positive of a stratum predicate is joined in turn
+    # against the facts the previous round added only.
+    def _derive(self, predicate: str, clauses: List[Clause], relations: Dict[str, Relation],
+                delta: Optional[Dict[str, Relation]]) -> Relation:
+        known = relations[predicate]
+        derived: Relation = {}
+        for clause in clauses:
+            for fact in self._clause_facts(clause, relations, delta):
+                if fact not in known:
+                    derived[fact] = None
+        return derived
+
+    def _clause_facts(self, clause: Clause, relations: Dict[str, Relation],
+                      delta: Optional[Dict[str, Relation]]) -> Iterable[Compound]:
+        if delta is None:
+            yield from self._evaluate_clause(clause, relations, -1, {})
+            return
+        for position, positive in enumerate(clause.positives):
+            recursive = delta.get(get_index_key(positive))
+            if recursive:
+                yield from self._evaluate_clause(clause, relations, position, recursive)
+
+    def _source(self, predicate: str, relations: Dict[str, Relation]) -> Iterable[Compound]:
+        relation = relations.get(predicate)
+        return self._facts(predicate) if relation is None else relation
+
+    def _facts(self, predicate: str) -> Iterable[Compound]:
+        facts = self.assertions.get(predicate, [])
+        if self.retracted:
+            facts = [fact for fact in facts if fact not in self.retracted]
+        return chain(facts, self.columns.facts(predicate))
+
+    def _evaluate_clause(self, clause: Clause, relations: Dict[str, Relation], delta_position: int,
+                         delta: Relation) -> Iterable[Compound]:
+        bound: Set[str] = set()
+        plans = []
+        for position, positive in enumerate(clause.positives):
+            source = delta if position == delta_position else self._source(get_index_key(positive), relations)
+            keys = [index for index in range(1, len(positive))
+                    if not is_var(positive[index]) or positive[index].value in bound]
+            plans.append((positive, keys, build_index(source, len(positive), keys, positive)))
+            bound |= atom_vars(positive)
+        for binding in join(plans, 0, {}):
+            if self._filter(clause, binding, relations):
+                yield compound(tuple(substitute_flat(clause.head, binding)))
+
+    def _filter(self, clause: Clause, binding: Binding, relations: Dict[str, Relation]) -> bool:
+        for negative in clause.negatives:
+            predicate = get_index_key(negative)
+            if predicate not in relations:
+                relations[predicate] = dict.fromkeys(self._facts(predicate))
+            if compound(tuple(substitute_flat(negative, binding))) in relations[predicate]:
+                return False
+        for apply in clause.applies:
+            args = instantiate_args(apply[2:], binding)
+            if args is None or not self.procedures.get(apply[1].value, lambda _: False)(args):
+                return False
+        return True
+
+
+Plan = Tuple[Compound, List[int], Dict[Tuple[Term, ...], List[Compound]]]
+
+
+# Stratum of every predicate: at least that of its positive dependencies and one more than that of its negated ones.
+# Levels only grow past the number of predicates when a cycle goes through @not.
+def stratum_levels(programs: Dict[str, List[Clause]]) -> Dict[str, int]:
+    levels = dict.fromkeys(programs, 0)
+    edges = [
+        (predicate, dependency, negated)
+        for predicate, clauses in programs.items() for clause in clauses
+        for dependency, negated in clause.dependencies() if dependency in levels
+    ]
+    for _ in range(len(programs) + 1):
+        for predicate, dependency, negated in edges:
+            levels[predicate] = max(levels[predicate], levels[dependency] + negated)
+    return levels
+
+
+def build_index(source: Iterable[Compound], size: int, keys: List[int],
+                pattern: Compound) -> Dict[Tuple[Term, ...], List[Compound]]:
+    index: Dict[Tuple[Term, ...], List[Compound]] = {}
+    for fact in source:
+        if len(fact) == size and fact[0] is pattern[0]:
+            index.setdefault(tuple(fact[key] for key in keys), []).append(fact)
+    return index
+
+
+def join(plans: List[Plan], position: int, binding: Binding) -> Iterable[Binding]:
+    if position == len(plans):
+        yield binding
+        return
+    pattern, keys, index = plans[position]
+    key = tuple(binding[pattern[k].value] if is_var(pattern[k]) else pattern[k] for k in keys)
+    for fact in index.get(key, []):
+        extended = dict(binding)
+        if all(extended.setdefault(arg.value, fact[k]) is fact[k] for k, arg in enumerate(pattern) if is_var(arg)):
+            yield from join(plans, position + 1, extended)
+
+
+def substitute_flat(pattern: Compound, binding: Binding) -> Iterable[Term]:
+    return (binding[arg.value] if is_var(arg) else arg for arg in pattern)
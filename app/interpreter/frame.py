@@ -0,0 +1,140 @@
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, Tuple, Union
+
+from .terms import Term
+
+BITS = 5
+BRANCH_MASK = (1 << BITS) - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+Pair = Tuple[str, Term]
+
+
+class _Node:
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: Tuple[Any, ...]):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _Collision:
+    __slots__ = ("pairs",)
+
+    def __init__(self, pairs: Tuple[Pair, ...]):
+        self.pairs = pairs
+
+
+Entry = Union[Pair, _Node, _Collision]
+_EMPTY_NODE = _Node(0, ())
+_MISSING = object()
+
+
+def _hash(key: str) -> int:
+    return hash(key) & HASH_MASK
+
+
+try:
+    _popcount = int.bit_count  # type: ignore
+except AttributeError:  # pragma: no cover
+    def _popcount(value: int) -> int:
+        return bin(value).count("1")
+
+
+def _lookup(node: Union[_Node, _Collision], key: str, key_hash: int) -> Any:
+    shift = 0
+    while True:
+        if type(node) is _Collision:  # pylint: disable=unidiomatic-typecheck
+            for pair_key, value in node.pairs:
+                if pair_key == key:
+                    return value
+            return _MISSING
+        bit = 1 << ((key_hash >> shift) & BRANCH_MASK)
+        bitmap = node.bitmap
+        if not bitmap & bit:
+            return _MISSING
+        entry = node.entries[_popcount(bitmap & (bit - 1))]
+        if type(entry) is tuple:  # pylint: disable=unidiomatic-typecheck
+            return entry[1] if entry[0] == key else _MISSING
+        node = entry
+        shift += BITS
+
+
+def _assoc(node: Union[_Node, _Collision], shift: int, pair: Pair, key_hash: int) -> Tuple[Entry, bool]:
+    if type(node) is _Collision:  # pylint: disable=unidiomatic-typecheck
+        pairs = tuple(old for old in node.pairs if old[0] != pair[0])
+        return _Collision(pairs + (pair,)), len(pairs) == len(node.pairs)
+    bit = 1 << ((key_hash >> shift) & BRANCH_MASK)
+    position = _popcount(node.bitmap & (bit - 1))
+    entries = node.entries
+    if not node.bitmap & bit:
+        return _Node(node.bitmap | bit, entries[:position] + (pair,) + entries[position:]), True
+    entry = entries[position]
+    if type(entry) is not tuple:  # pylint: disable=unidiomatic-typecheck
+        child, grown = _assoc(entry, shift + BITS, pair, key_hash)
+    elif entry[0] == pair[0]:
+        child, grown = pair, False
+    else:
+        child, grown = _merge(shift + BITS, entry, _hash(entry[0]), pair, key_hash), True
+    return _Node(node.bitmap, entries[:position] + (child,) + entries[position + 1:]), grown
+
+
+def _merge(shift: int, first: Pair, first_hash: int, second: Pair, second_hash: int) -> Entry:
+    if shift >= HASH_BITS:
+        return _Collision((first, second))
+    first_index = (first_hash >> shift) & BRANCH_MASK
+    second_index = (second_hash >> shift) & BRANCH_MASK
+    if first_index == second_index:
+        return _Node(1 << first_index, (_merge(shift + BITS, first, first_hash, second, second_hash),))
+    entries = (first, second) if first_index < second_index else (second, first)
+    return _Node((1 << first_index) | (1 << second_index), entries)
+
+
+def _walk(node: Entry) -> Iterator[Pair]:
+    if type(node) is tuple:  # pylint: disable=unidiomatic-typecheck
+        yield node
+    elif type(node) is _Collision:  # pylint: disable=unidiomatic-typecheck
+        yield from node.pairs
+    else:
+        for entry in node.entries:
+            yield from _walk(entry)
+
+
+# Frames are persistent hash array mapped tries: `set` returns a new frame sharing every untouched branch
+# with the old one, so extending a frame costs O(log n) and bound terms are never copied.
+class Frame(Mapping):  # type: ignore
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, root: Union[_Node, _Collision] = _EMPTY_NODE, size: int = 0):
+        self._root = root
+        self._size = size
+
+    def get(self, key: str, default: Optional[Term] = None) -> Optional[Term]:  # type: ignore
+        value = _lookup(self._root, key, _hash(key))
+        return default if value is _MISSING else value
+
+    def __getitem__(self, key: str) -> Term:
+        value = _lookup(self._root, key, _hash(key))
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        return (key for key, _ in _walk(self._root))
+
+    def items(self) -> Iterator[Pair]:  # type: ignore
+        return _walk(self._root)
+
+    def __repr__(self) -> str:
+        return f"Frame({dict(_walk(self._root))!r})"
+
+    def set(self, key: str, value: Term) -> "Frame":
+        root, grown = _assoc(self._root, 0, (key, value), _hash(key))
+        return Frame(root, self._size + 1 if grown else self._size)  # type: ignore
+
+
+EMPTY_FRAME = Frame()
@@ -1,136 +1,377 @@
-import uuid
-from typing import Callable, Dict, List, Optional, Union
+from itertools import count
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple, Union
 
 from ..lexer import token
-from ..parser import AST, AstAtom, AstNode
-
-Frame = Dict[str, AstNode]
-Consume = Callable[[str], None]
+from .frame import Frame
+from .terms import (
+    Compound,
+    Symbol,
+    Term,
+    compound,
+    interned_suffix,
+    is_interned,
+    leaves,
+    map_term,
+    var,
+)
+
+Frames = Iterator[Frame]
+Consume = Callable[[str], Optional[bool]]
+ArgumentKey = Tuple[str, int, str]
 
 ALL_ASSERTIONS = "all_assertions"
 ALL_RULES = "all_rules"
 VAR_INDEX_KEY = "$"
 ID_DELIMITER = "__"
+COMPOUND_KEY_PREFIX = "("
+QUERY_KEYWORDS = (
+    token.AND_KEYWORD, token.OR_KEYWORD, token.NOT_KEYWORD, token.APPLY_KEYWORD, token.LIMIT_KEYWORD,
+    token.OFFSET_KEYWORD,
+)
+
+_rename_ids = count()
 
 
-def is_list(node: AstNode) -> bool:
-    return isinstance(node, list)
+def is_list(node: Term) -> bool:
+    return isinstance(node, tuple)
 
 
-def is_non_empty_list(node: AstNode) -> bool:
+def is_non_empty_list(node: Term) -> bool:
     return is_list(node) and len(node) > 0
 
 
-def is_atom(node: AstNode) -> bool:
-    return isinstance(node, AstAtom)
+def is_atom(node: Term) -> bool:
+    return isinstance(node, Symbol)
 
 
-def is_var(node: AstNode) -> bool:
+def is_var(node: Term) -> bool:
     return is_atom(node) and node.domain == token.VAR_DOMAIN
 
 
-def is_constant_symbol(node: AstNode) -> bool:
+def is_constant_symbol(node: Term) -> bool:
     return is_atom(node) and (node.domain == token.WORD_DOMAIN or node.domain == token.NUMBER_DOMAIN)
 
 
-def is_dot(node: AstNode) -> bool:
+def is_dot(node: Term) -> bool:
     return is_atom(node) and node.domain == token.DOT
 
 
-def is_insert(ast: AST) -> bool:
+def is_insert(ast: Compound) -> bool:
     return is_non_empty_list(ast) and is_atom(ast[0]) and ast[0].domain == token.NEW_KEYWORD
 
 
-def get_entities(insert_command: AST) -> AST:
+def is_delete(ast: Compound) -> bool:
+    return is_non_empty_list(ast) and is_atom(ast[0]) and ast[0].domain == token.DELETE_KEYWORD
+
+
+def is_keyword(query: Term, keyword: str) -> bool:
+    return is_non_empty_list(query) and is_atom(query[0]) and query[0].domain == keyword
+
+
+def is_compound_query(query: Term) -> bool:
+    return is_non_empty_list(query) and is_atom(query[0]) and query[0].domain in QUERY_KEYWORDS
+
+
+def get_entities(insert_command: Compound) -> Compound:
     return insert_command[1:]
 
 
-def is_rule(entity: AST) -> bool:
+def is_rule(entity: Compound) -> bool:
     return is_non_empty_list(entity) and is_atom(entity[0]) and entity[0].domain == token.RULE_KEYWORD
 
 
-def get_conclusion(rule: AST) -> AST:
+def get_conclusion(rule: Compound) -> Compound:
     return rule[1]
 
 
-def get_body(rule: AST) -> Optional[AST]:
+def get_body(rule: Compound) -> Optional[Compound]:
     if len(rule) < 3:
         return None
     return rule[2]
 
 
-def is_indexable(pattern: AST) -> bool:
+def is_indexable(pattern: Compound) -> bool:
     return len(pattern) > 0 and (is_constant_symbol(pattern[0]) or is_var(pattern[0]))
 
 
-def use_index(pattern: AST) -> bool:
+def use_index(pattern: Compound) -> bool:
     return len(pattern) > 0 and is_constant_symbol(pattern[0])
 
 
-def get_index_key(pattern: AST) -> str:
+def get_index_key(pattern: Compound) -> str:
     atom = pattern[0]
     return VAR_INDEX_KEY if is_var(atom) else atom.value
 
 
-def rename_variables(rule: AST) -> AST:
-    var_id = uuid.uuid4().__str__()
+def resolve(node: Term, frame: Frame) -> Term:
+    while is_var(node):
+        binding = frame.get(node.value)
+        if binding is None:
+            return node
+        node = binding
+    return node
+
+
+def get_argument_value(node: Term, frame: Frame) -> Optional[str]:
+    node = resolve(node, frame)
+    if is_constant_symbol(node):
+        return node.value
+    if is_non_empty_list(node):
+        head = resolve(node[0], frame)
+        if is_constant_symbol(head):
+            return f"{COMPOUND_KEY_PREFIX}{head.value}"
+    return None
+
+
+def get_argument_keys(pattern: Compound, frame: Frame) -> Iterator[ArgumentKey]:
+    key = get_index_key(pattern)
+    for position in range(1, len(pattern)):
+        node = pattern[position]
+        if is_dot(node):
+            return
+        value = get_argument_value(node, frame)
+        if value is not None:
+            yield key, position, value
 
-    def tree_walk(exp: AstNode) -> AstNode:
-        if is_var(exp):
-            return make_id_variable(exp.value, var_id)
-        if is_non_empty_list(exp):
-            return [tree_walk(exp[0])] + tree_walk(exp[1:])
-        return exp
 
-    return tree_walk(rule)
+def fresh_id() -> int:
+    return next(_rename_ids)
 
 
-def make_id_variable(var: str, var_id: str) -> AstAtom:
-    return AstAtom(token.VAR_DOMAIN, f"{var}{ID_DELIMITER}{var_id}")
+def set_fresh_ids(start: int) -> None:
+    global _rename_ids  # pylint: disable=global-statement
+    _rename_ids = count(start)
 
 
-def depends_on(expression: AstNode, var: str, frame: Frame) -> bool:
-    def tree_walk(exp: AstNode) -> bool:
-        if is_var(exp):
-            if exp.value == var:
+def rename_variables(rule: Compound) -> Compound:
+    var_id = fresh_id()
+
+    def rename_var(node: Term) -> Term:
+        return make_id_variable(node.value, var_id) if is_var(node) else node
+
+    return map_term(rule, rename_var, tuple)
+
+
+def make_id_variable(name: str, var_id: int) -> Symbol:
+    return var(f"{name}{ID_DELIMITER}{var_id}")
+
+
+def get_vars(node: Term) -> Set[str]:
+    return {leaf.value for leaf in leaves(node) if is_var(leaf)}
+
+
+def depends_on(expression: Term, name: str, frame: Frame) -> bool:
+    stack = [expression]
+    visited: Set[str] = set()
+    while stack:
+        exp = stack.pop()
+        if is_list(exp):
+            stack.extend(exp)
+        elif is_var(exp) and exp.value not in visited:
+            if exp.value == name:
                 return True
+            visited.add(exp.value)
             binding = frame.get(exp.value)
             if binding is not None:
-                return tree_walk(binding)
-            return False
-        if is_non_empty_list(exp):
-            return tree_walk(exp[0]) or tree_walk(exp[1:])
-        return False
+                stack.append(binding)
+    return False
+
 
-    return tree_walk(expression)
+def instantiate(pattern: Compound, frame: Frame) -> str:
+    return ast_to_string(instantiate_term(pattern, frame))
 
 
-def instantiate(pattern: AST, frame: Frame) -> str:
-    def helper(node: AstNode) -> AstNode:
-        if is_var(node):
+def instantiate_term(pattern: Compound, frame: Frame) -> Term:
+    def resolve_var(node: Term) -> Term:
+        while is_var(node):
             binding = frame.get(node.value)
-            return helper(binding) \
-                if binding is not None \
-                else AstAtom(domain=token.VAR_DOMAIN, value=node.value.split(ID_DELIMITER)[0])
-        if is_non_empty_list(node) and is_dot(node[0]):
-            return helper(node[1])
-        if is_non_empty_list(node):
-            return [helper(node[0])] + helper(node[1:])
+            if binding is None:
+                return var(node.value.split(ID_DELIMITER)[0])
+            node = binding
         return node
 
-    return ast_to_string(helper(pattern))
+    return _rebuild(pattern, resolve_var, tuple)
+
+
+def substitute(node: Term, frame: Frame) -> Term:
+    return _rebuild(node, lambda child: resolve(child, frame), compound)
+
+
+# Lists are rebuilt with an explicit stack of [list, next position, built items], and a dotted tail bound to a list
+# is spliced into the items of the list being built, so neither deep nor long terms recurse. Interned compounds hold
+# no variables or dotted tails and are kept as they are.
+def _rebuild(root: Term, resolve_node: Callable[[Term], Term], build: Callable[[Compound], Term]) -> Term:
+    root = resolve_node(root)
+    if not is_non_empty_list(root) or is_interned(root):
+        return root
+    stack: List[List[Any]] = [[root, 0, []]]
+    while True:
+        entry = stack[-1]
+        node, position, items = entry
+        if position == len(node):
+            stack.pop()
+            built = build(tuple(items))
+            if not stack:
+                return built
+            stack[-1][2].append(built)
+            continue
+        child = node[position]
+        if is_dot(child):
+            _splice(entry, child, resolve_node(node[position + 1]))
+            continue
+        entry[1] = position + 1
+        child = resolve_node(child)
+        if is_non_empty_list(child) and not is_interned(child):
+            stack.append([child, 0, []])
+        else:
+            items.append(child)
+
+
+def _splice(entry: List[Any], dot: Term, tail: Term) -> None:
+    if is_list(tail) and not is_interned(tail):
+        entry[0], entry[1] = tail, 0
+        return
+    entry[2].extend(tail if is_list(tail) else (dot, tail))
+    entry[1] = len(entry[0])
 
 
-def ast_to_string(ast: AST) -> str:
-    res = ""
-    for node in ast:
-        res += f"{ast_to_string(node)} " if is_list(node) else f"{node.value} "
-    return f"({res.strip()})"
+# Pairs still to match wait on an explicit stack, pushed right to left so they are matched in written order. A list
+# is paired with a start position instead of a slice, so a dotted tail is matched against the rest of the data in
+# place and the rest is copied only when a variable is bound to it.
+Pairs = List[Tuple[Term, Term, int]]
+
+
+# The rest of a list bound to a variable; the rest of an interned list is interned too, so substituting it or
+# checking it for the variable does not walk it again.
+def _rest(data: Term, start: int) -> Term:
+    if not start:
+        return data
+    return interned_suffix(data, start) if is_interned(data) else data[start:]
+
+
+# One-sided match of a pattern against data.
+def pattern_match(pattern: Term, data: Term, frame: Optional[Frame]) -> Optional[Frame]:
+    stack = [(pattern, data, 0)]
+    while stack:
+        if frame is None:
+            return None
+        pattern, data, start = stack.pop()
+        if pattern is data and not start:
+            continue
+        if is_var(pattern):
+            binding = frame.get(pattern.value)
+            if binding is None:
+                frame = frame.set(pattern.value, _rest(data, start))
+            else:
+                stack.append((binding, data, start))
+            continue
+        pairs = _list_pairs(pattern, data, start)
+        if pairs is None:
+            return None
+        stack.extend(reversed(pairs))
+    return frame
+
+
+def _list_pairs(pattern: Term, data: Term, start: int) -> Optional[Pairs]:
+    if not is_list(pattern) or not is_list(data):
+        return None
+    pairs = []
+    for position, node in enumerate(pattern):
+        if is_dot(node):
+            pairs.append((pattern[position + 1], data, start + position))
+            return pairs
+        if start + position >= len(data):
+            return None
+        pairs.append((node, data[start + position], 0))
+    return pairs if len(pattern) == len(data) - start else None
+
+
+UnifyPairs = List[Tuple[Term, int, Term, int]]
+
+
+# Unification with the same explicit stack; either side may hold variables and dotted tails. A variable bound
+# to another variable is followed instead of extended, and the occurs check rejects cyclic bindings.
+def unify_match(left: Term, right: Term, frame: Optional[Frame]) -> Optional[Frame]:
+    stack = [(left, 0, right, 0)]
+    while stack:
+        if frame is None:
+            return None
+        left, left_start, right, right_start = stack.pop()
+        if left is right and left_start == right_start:
+            continue
+        if is_var(left):
+            frame = _bind(left, right, right_start, frame, stack)
+        elif is_var(right):
+            frame = _bind(right, left, left_start, frame, stack)
+        else:
+            pairs = _unify_pairs(left, left_start, right, right_start)
+            if pairs is None:
+                return None
+            stack.extend(reversed(pairs))
+    return frame
+
+
+def _bind(variable: Symbol, data: Term, start: int, frame: Frame, stack: UnifyPairs) -> Optional[Frame]:
+    binding = frame.get(variable.value)
+    if binding is not None:
+        stack.append((binding, 0, data, start))
+        return frame
+    if is_var(data):
+        binding = frame.get(data.value)
+        if binding is not None:
+            stack.append((variable, 0, binding, 0))
+            return frame
+    else:
+        data = _rest(data, start)
+        if not is_interned(data) and depends_on(data, variable.value, frame):
+            return None
+    return frame.set(variable.value, data)
+
+
+def _unify_pairs(left: Term, left_start: int, right: Term, right_start: int) -> Optional[UnifyPairs]:
+    if not is_list(left) or not is_list(right):
+        return None
+    pairs = []
+    left_size, right_size = len(left) - left_start, len(right) - right_start
+    for position in range(max(left_size, right_size)):
+        if position < left_size and is_dot(left[left_start + position]):
+            pairs.append((left[left_start + position + 1], 0, right, right_start + position))
+            return pairs
+        if position < right_size and is_dot(right[right_start + position]):
+            pairs.append((left, left_start + position, right[right_start + position + 1], 0))
+            return pairs
+        if position >= min(left_size, right_size):
+            return None
+        pairs.append((left[left_start + position], 0, right[right_start + position], 0))
+    return pairs
+
+
+def ast_to_string(ast: Compound) -> str:
+    parts = ["("]
+    stack = [iter(ast)]
+    first = True
+    while stack:
+        node = next(stack[-1], None)
+        if node is None:
+            stack.pop()
+            parts.append(")")
+            first = False
+            continue
+        if not first:
+            parts.append(" ")
+        if is_list(node):
+            parts.append("(")
+            stack.append(iter(node))
+            first = True
+        else:
+            parts.append(node.value)
+            first = False
+    return "".join(parts)
 
 
-def instantiate_args(args: List[AstAtom], frame: Frame) -> Optional[List[Union[str, int]]]:
-    def instantiate_var(var: str) -> Optional[Union[str, int]]:
-        binding = frame.get(var)
+def instantiate_args(args: Compound, frame: Frame) -> Optional[List[Union[str, int]]]:
+    def instantiate_var(name: str) -> Optional[Union[str, int]]:
+        binding = frame.get(name)
         if binding is None or is_list(binding):
             return None
         if is_var(binding):
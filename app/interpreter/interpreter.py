@@ -1,201 +1,458 @@
-import copy
-from itertools import chain
+from concurrent.futures import Future
+from functools import partial
+from itertools import chain, islice
+from typing import Any, AsyncIterator, Dict, Iterable, Sequence
 
-from ..parser import parse
+from ..parser import AST, ParseError, parse
+from ..parser.script import split_commands
+from .cache import ResultCache, canonicalize, rename
+from .datalog import Datalog
+from .frame import EMPTY_FRAME
 from .helpers import *
+from .journal import DELETE_RECORD, Persistence, Persistent
+from .knowledge import KnowledgeBase
+from .matcher import Matcher, compile_pattern
+from .options import Configurable
+from .parallel import PARALLEL_BATCH_SIZE, Snapshot, WorkerPool, collect, collect_batch
+from .planner import Planner, is_filter
+from .prepared import (
+    PreparedQuery,
+    Statements,
+    check_query,
+    make_entities,
+    parse_statement,
+)
+from .rules import RuleTemplate
+from .snapshot import Image
+from .streaming import ASYNC_BATCH_SIZE, ASYNC_QUEUE_SIZE, Streams
+from .subscriptions import Subscriptions, conjuncts_of
+from .tabling import Answer, AnswerTable, Tabling
+from .terms import is_ground, make_term, to_ast
 
+PROCEDURES = {
+    token.LESS_OP: lambda args: args[0] < args[1],
+    token.GREATER_OP: lambda args: args[0] > args[1]
+}
 
+Goals = Optional[Tuple[Compound, Any]]
+State = Tuple[Frame, Goals, Optional[AnswerTable]]
+States = Iterator[State]
+
+
+# Evaluates queries against the knowledge base. Storage, the optional engines, persistence and standing queries are
+# collaborators: `knowledge`, `tabling`, `datalog`, `cache`, `pool`, `persistence`, `subscriptions` and `streams`.
+# Every write takes the lock of `streams`, as do commands run by `run`, so they never overlap an async batch.
 # flake8: noqa: F405
-class Interpreter:
+class Interpreter(Configurable, Persistent):  # pylint: disable=too-many-instance-attributes
     def __init__(self, consume: Consume):
-        self.assertions = {ALL_ASSERTIONS: []}
-        self.rules = {ALL_RULES: []}
-        self.procedures = {
-            token.LESS_OP: lambda args: args[0] < args[1],
-            token.GREATER_OP: lambda args: args[0] > args[1]
-        }
         self.consume = consume
+        self.knowledge = KnowledgeBase()
+        self.tabling = Tabling()
+        knowledge = self.knowledge
+        self.datalog = Datalog(
+            knowledge.assertions, knowledge.rules, PROCEDURES, knowledge.columns, knowledge.retracted
+        )
+        self.planner = Planner(knowledge.statistics, knowledge.is_fact_query, lambda q: len(self._fetch_rules(q)))
+        self.pool = WorkerPool()
+        self.cache = ResultCache()
+        self.statements = Statements()
+        self.subscriptions = Subscriptions(self._results, self._and, knowledge.is_fact_query)
+        self.persistence = Persistence(knowledge.image, self._restore, self._replay)
+        self.streams = Streams()
+
+    def run(self, command: str, consume: Optional[Consume] = None) -> None:
+        self._run_command(self.statements.get(command), consume)
+
+    # Runs every top-level command of a source given as chunks of text, each as soon as it is complete. A command
+    # that fails is reported with the line it starts on and the script goes on. Returns the number of failures.
+    def run_script(self, chunks: Iterable[str], consume: Optional[Consume] = None,
+                   report: Callable[[str], None] = print) -> int:
+        failures = 0
+        for text, row, column in split_commands(chunks):
+            try:
+                self._run_command(parse_statement(text, row, column), consume)
+            except (ParseError, ValueError) as error:
+                failures += 1
+                report(f"Error in command at line {row}: {error}")
+        return failures
 
-    def run(self, command: str) -> None:
-        command_ast = parse(command)
+    def _run_command(self, command_ast: Compound, consume: Optional[Consume]) -> None:
         if is_insert(command_ast):
             self._insert(get_entities(command_ast))
-        else:
-            for frame in self._run_query(command_ast, [{}]):
-                self.consume(instantiate(command_ast, frame))
+            return
+        if is_delete(command_ast):
+            self._delete(get_entities(command_ast))
+            return
+        consume = consume or self.consume
+        with self.streams.lock:
+            for result in self._results(command_ast):
+                if consume(result) is False:
+                    break
 
-    def _insert(self, entities: AST) -> None:
-        for entity in entities:
-            if is_rule(entity):
-                self._insert_rule(entity)
-            else:
-                self._insert_assertion(entity)
+    def query(self, command: str) -> Iterator[str]:
+        return self._results(check_query(self.statements.get(command)))
 
-    def _insert_rule(self, rule: AST):
-        self._store_rule_in_index(rule)
-        old_rules = self.rules.get(ALL_RULES, [])
-        self.rules[ALL_RULES] = old_rules + [rule]
+    def prepare(self, command: str) -> PreparedQuery:
+        return PreparedQuery(check_query(make_term(parse(command))), self._execute)
 
-    def _store_rule_in_index(self, rule: AST) -> None:
-        pattern = get_conclusion(rule)
-        if not is_indexable(pattern):
-            return
-        key = get_index_key(pattern)
-        old_rules = self.rules.get(key, [])
-        self.rules[key] = old_rules + [rule]
+    def subscribe(self, command: str, consume: Consume) -> int:
+        return self.subscriptions.subscribe(check_query(self.statements.get(command)), consume)
+
+    def unsubscribe(self, handle: int) -> None:
+        self.subscriptions.unsubscribe(handle)
+
+    def load(self, entities: Iterable[AST]) -> None:
+        terms = make_entities(entities)
+        with self.streams.lock:
+            self.knowledge.load(terms)
+            self._knowledge_changed(terms)
+            self.persistence.record(terms)
+            self.subscriptions.notify(terms)
+
+    def retract(self, entities: Iterable[AST]) -> None:
+        self._delete(make_entities(entities))
 
-    def _insert_assertion(self, assertion: AST) -> None:
-        self._store_assertion_in_index(assertion)
-        old_assertions = self.assertions.get(ALL_ASSERTIONS, [])
-        self.assertions[ALL_ASSERTIONS] = old_assertions + [assertion]
+    def aquery(self, command: str, batch_size: int = ASYNC_BATCH_SIZE,
+               queue_size: int = ASYNC_QUEUE_SIZE) -> AsyncIterator[str]:
+        return self.streams.stream(self.query(command), batch_size, queue_size)
 
-    def _store_assertion_in_index(self, assertion: AST) -> None:
-        if not is_indexable(assertion):
+    async def ainsert(self, command: str) -> None:
+        command_ast = parse_statement(command)
+        if not is_insert(command_ast):
+            raise ValueError("expected insert command, got query")
+        await self.streams.call(self._insert, get_entities(command_ast))
+
+    # With the result cache on, arguments are substituted into the query so entries are keyed by their values.
+    def _execute(self, statement: PreparedQuery, frame: Frame) -> Iterator[str]:
+        if self.cache.enabled:
+            return self._results(substitute(statement.query, frame))
+        conjuncts = conjuncts_of(statement.query)
+        if statement.version != self.knowledge.version:
+            statement.plan = self.planner.plan(conjuncts, {f"?{name}" for name in statement.parameters})
+            statement.version = self.knowledge.version
+        frames = self._and(conjuncts, iter([frame]), statement.plan)
+        return (instantiate(statement.query, result) for result in frames)
+
+    def _results(self, query: Compound) -> Iterator[str]:
+        if not self.cache.enabled:
+            for frame in self._run_query(query, iter([EMPTY_FRAME])):
+                yield instantiate(query, frame)
             return
-        key = get_index_key(assertion)
-        old_assertions = self.assertions.get(key, [])
-        self.assertions[key] = old_assertions + [assertion]
-
-    def _run_query(self, query: AST, frames: List[Frame]) -> List[Frame]:
-        if is_non_empty_list(query):
-            if is_atom(query[0]) and query[0].domain == token.AND_KEYWORD:
-                return self._and(query[1:], frames)
-            if is_atom(query[0]) and query[0].domain == token.OR_KEYWORD:
-                return self._or(query[1:], frames)
-            if is_atom(query[0]) and query[0].domain == token.NOT_KEYWORD:
-                return self._not(query[1], frames)
-            if is_atom(query[0]) and query[0].domain == token.APPLY_KEYWORD:
-                return self._apply(query[1].value, query[2:], frames)
+        key, names = canonicalize(query)
+        results = self.cache.get(key)
+        for result in self._cached_results(key) if results is None else results:
+            yield ast_to_string(rename(result, names))
+
+    # Evaluates a canonical query for the cache, collecting the index keys read along the way. Only a query that
+    # runs to completion with no change to the knowledge base in between is stored.
+    def _cached_results(self, query: Compound) -> Iterator[Term]:
+        version = self.cache.version
+        dependencies: Set[str] = set()
+        results: List[Term] = []
+        frames = self._run_query(query, iter([EMPTY_FRAME]))
+        while True:
+            outer, self.cache.reads = self.cache.reads, dependencies
+            try:
+                frame = next(frames, None)
+            finally:
+                self.cache.reads = outer
+            if frame is None:
+                break
+            result = instantiate_term(query, frame)
+            results.append(result)
+            yield result
+        self.cache.put(query, results, dependencies, version)
+
+    def _knowledge_changed(self, entities: Optional[Sequence[Compound]] = None) -> None:
+        self.knowledge.version += 1
+        if self.cache.enabled:
+            if entities is None:
+                self.cache.clear()
+            else:
+                self.cache.invalidate(entities)
+        self.tabling.clear()
+        self.datalog.clear()
+        self.pool.invalidate()
+
+    def _restore(self, image: Image) -> None:
+        with self.streams.lock:
+            self.knowledge.restore(image)
+            self._knowledge_changed()
+
+    def _replay(self, operation: int, entities: List[Compound]) -> None:
+        if operation == DELETE_RECORD:
+            self._delete(entities)
+        else:
+            self._insert(entities)
+
+    def _snapshot(self) -> Snapshot:
+        assertions = [to_ast(assertion) for assertion in self.knowledge.facts()]
+        rules = [to_ast(template.rule) for template in self.knowledge.rules[ALL_RULES].values()]
+        return assertions, rules, sorted(self.tabling.predicates), self.tabling.all, self.datalog.enabled
+
+    def _insert(self, entities: Compound) -> None:
+        with self.streams.lock:
+            self._knowledge_changed(entities)
+            self.knowledge.insert(entities)
+            self.persistence.record(entities)
+            self.subscriptions.notify(entities)
+
+    # Subscriptions are re-run after a delete, so a row that disappears is forgotten and pushed again when it
+    # comes back.
+    def _delete(self, entities: Sequence[Compound]) -> None:
+        with self.streams.lock:
+            self._knowledge_changed(entities)
+            self.knowledge.delete(entities)
+            self.persistence.record(entities, DELETE_RECORD)
+            self.subscriptions.refresh()
+
+    def _run_query(self, query: Compound, frames: Frames) -> Frames:
+        if is_keyword(query, token.AND_KEYWORD):
+            return self._and(query[1:], frames)
+        if is_keyword(query, token.OR_KEYWORD):
+            return self._or(query[1:], frames)
+        if is_keyword(query, token.NOT_KEYWORD):
+            return self._not(query[1], frames)
+        if is_keyword(query, token.APPLY_KEYWORD):
+            return self._apply(query[1].value, query[2:], frames)
+        if is_keyword(query, token.LIMIT_KEYWORD):
+            return self._slice(query[2], 0, int(query[1].value), frames)
+        if is_keyword(query, token.OFFSET_KEYWORD):
+            return self._slice(query[2], int(query[1].value), None, frames)
         return self._run_simple_query(query, frames)
 
-    def _and(self, conjuncts: AST, frames: List[Frame]) -> List[Frame]:
-        if len(conjuncts) == 0:
-            return frames
-        return self._and(conjuncts[1:], self._run_query(conjuncts[0], frames))
-
-    def _or(self, disjuncts: AST, frames: List[Frame]) -> List[Frame]:
-        if len(disjuncts) == 0:
-            return []
-        return list(chain(*[
-            self._run_query(disjuncts[0], copy.deepcopy(frames)),
-            self._or(disjuncts[1:], frames)
-        ]))
-
-    def _not(self, operand: AST, frames: List[Frame]) -> List[Frame]:
-        return list(chain(*[
-            [frame] if len(self._run_query(operand, [frame])) == 0 else []
-            for frame in frames
-        ]))
-
-    def _apply(self, predicate: str, arguments: List[AstAtom], frames: List[Frame]) -> List[Frame]:
+    def _and(self, conjuncts: Compound, frames: Frames, plan: Optional[Compound] = None) -> Frames:
+        bound: Set[str] = set()
+        for conjunct in self.planner.plan(conjuncts) if plan is None else plan:
+            join_vars = self.planner.join_vars(conjunct, bound)
+            frames = self._hash_join(conjunct, join_vars, frames) if join_vars else self._run_query(conjunct, frames)
+            if not is_filter(conjunct):
+                bound |= get_vars(conjunct)
+        return frames
+
+    def _hash_join(self, query: Compound, join_vars: Set[str], frames: Frames) -> Frames:
+        keys = [var(name) for name in sorted(join_vars)]
+        match = compile_pattern(query, pattern_match)
+        table: Optional[Dict[Tuple[Term, ...], List[Frame]]] = None
+        for frame in frames:
+            key = tuple(substitute(name, frame) for name in keys)
+            if not all(map(is_ground, key)):
+                yield from self._find_assertions(query, frame, match)
+                continue
+            if table is None:
+                table = self._build_join_table(query, keys, match)
+            for right in table.get(key, []):
+                merged = self._merge_frames(frame, right)
+                if merged is not None:
+                    yield merged
+
+    def _build_join_table(self, query: Compound, keys: List[Symbol],
+                          match: Matcher) -> Dict[Tuple[Term, ...], List[Frame]]:
+        table: Dict[Tuple[Term, ...], List[Frame]] = {}
+        for frame in self._find_assertions(query, EMPTY_FRAME, match):
+            table.setdefault(tuple(frame[key.value] for key in keys), []).append(frame)
+        return table
+
+    def _merge_frames(self, frame: Frame, other: Frame) -> Optional[Frame]:
+        for name, value in other.items():
+            binding = frame.get(name)
+            frame = frame.set(name, value) if binding is None else pattern_match(binding, value, frame)
+            if frame is None:
+                return None
+        return frame
+
+    def _or(self, disjuncts: Compound, frames: Frames) -> Frames:
+        heavy = self._heavy(disjuncts, self.planner.cost)
+        if heavy is None:
+            for frame in frames:
+                for disjunct in disjuncts:
+                    yield from self._run_query(disjunct, iter([frame]))
+            return
+        batch = list(islice(frames, PARALLEL_BATCH_SIZE))
+        while batch:
+            yield from self._or_batch(disjuncts, heavy, batch)
+            batch = list(islice(frames, PARALLEL_BATCH_SIZE))
+
+    # Heavy branches are shipped to the workers for a whole batch of frames at once; the answers are yielded in the
+    # same order as the sequential evaluation, frame by frame and branch by branch.
+    def _or_batch(self, disjuncts: Compound, heavy: List[bool], batch: List[Frame]) -> Frames:
+        futures = [self.pool.submit_query(disjunct, batch) if is_heavy else None
+                   for disjunct, is_heavy in zip(disjuncts, heavy)]
+        replies = [None if future is None else collect_batch(future, batch) for future in futures]
+        for position, frame in enumerate(batch):
+            for disjunct, reply in zip(disjuncts, replies):
+                yield from self._run_query(disjunct, iter([frame])) if reply is None else reply[position]
+
+    def _heavy(self, branches: Sequence[Any], cost: Callable[[Any], float]) -> Optional[List[bool]]:
+        if not self.pool.enabled or len(branches) < 2:
+            return None
+        heavy = [cost(branch) >= self.pool.threshold for branch in branches]
+        if not any(heavy):
+            return None
+        self.pool.start(self._snapshot)
+        self.cache.depend_on(ALL_ASSERTIONS, ALL_RULES)
+        return heavy
+
+    def _offload(self, branches: Sequence[Any], cost: Callable[[Any], float],
+                 submit: Callable[[Any], Future]) -> List[Optional[Future]]:
+        heavy = self._heavy(branches, cost)
+        if heavy is None:
+            return [None] * len(branches)
+        return [submit(branch) if is_heavy else None for branch, is_heavy in zip(branches, heavy)]
+
+    def _submit_rule(self, template: RuleTemplate, query: Compound, frame: Frame) -> Future:
+        return self.pool.submit_rule(template.rule, query, frame)
+
+    def _rule_cost(self, template: RuleTemplate, query: Compound, frame: Frame) -> float:
+        if template.body is None or not template.may_unify(query, frame):
+            return 0
+        return self.planner.cost(template.body)
+
+    def _not(self, operand: Compound, frames: Frames) -> Frames:
+        for frame in frames:
+            if next(self._run_query(operand, iter([frame])), None) is None:
+                yield frame
+
+    def _slice(self, operand: Compound, offset: int, limit: Optional[int], frames: Frames) -> Frames:
+        stop = None if limit is None else offset + limit
+        for frame in frames:
+            yield from islice(self._run_query(operand, iter([frame])), offset, stop)
+
+    def _apply(self, predicate: str, arguments: Compound, frames: Frames) -> Frames:
         def execute(inst_args: Optional[List[Union[str, int]]]) -> bool:
             if inst_args is None:
                 return False
-            return self.procedures.get(predicate, lambda _: False)(inst_args)
-
-        return list(chain(*[
-            [frame] if execute(instantiate_args(arguments, frame)) else []
-            for frame in frames
-        ]))
-
-    def _run_simple_query(self, query: AST, frames: List[Frame]) -> List[Frame]:
-        return list(chain(
-            *[self._find_assertions(query, frame) for frame in frames],
-            *[self._apply_rules(query, frame) for frame in frames]
-        ))
-
-    def _find_assertions(self, query: AST, frame: Frame) -> List[Frame]:
-        return list(chain(*[
-            self._check_assertion(assertion, query, frame.copy()) for assertion in self._fetch_assertions(query)
-        ]))
-
-    def _fetch_assertions(self, pattern: AST) -> List[AST]:
-        return self.assertions.get(get_index_key(pattern), []) \
-            if use_index(pattern) \
-            else self.assertions.get(ALL_ASSERTIONS, [])
-
-    def _check_assertion(self, assertion: AST, query: AST, frame: Frame) -> List[Frame]:
-        match_result = self._pattern_match(query, assertion, frame)
-        if match_result is None:
-            return []
-        return [match_result]
-
-    def _pattern_match(self, pattern: AstNode, data: AstNode, frame: Optional[Frame]) -> Optional[Frame]:
-        if frame is None:
+            return PROCEDURES.get(predicate, lambda _: False)(inst_args)
+
+        for frame in frames:
+            if execute(instantiate_args(arguments, frame)):
+                yield frame
+
+    def _run_simple_query(self, query: Compound, frames: Frames) -> Frames:
+        relation = self.datalog.relation(query)
+        if relation is not None:
+            self.cache.depend_on(ALL_ASSERTIONS, ALL_RULES)
+            return self._match_relation(query, relation, frames)
+        if self.tabling.is_tabled(query):
+            return self._run_tabled_query(query, frames)
+        return self._resolve(query, frames)
+
+    def _run_tabled_query(self, query: Compound, frames: Frames) -> Frames:
+        for frame in frames:
+            yield from self._solve(self._consume(query, frame, None, None))
+
+    def _match_relation(self, query: Compound, relation: Iterable[Compound], frames: Frames) -> Frames:
+        match = compile_pattern(query, pattern_match)
+        for frame in frames:
+            for fact in relation:
+                match_result = match(fact, frame)
+                if match_result is not None:
+                    yield match_result
+
+    def _resolve(self, query: Compound, frames: Frames) -> Frames:
+        match = compile_pattern(query, pattern_match)
+        has_rules = bool(self._fetch_rules(query))
+        for frame in frames:
+            yield from self._find_assertions(query, frame, match)
+            if has_rules:
+                yield from self._solve(self._rule_states(query, frame, None, None))
+
+    # Rule bodies are run on an explicit stack of state iterators, so a chain of rule calls as long as the data it
+    # walks does not recurse. A state is a frame, the goals left to prove as a linked list and the table its answer
+    # goes to; a state with no goals left is an answer of the query, or of its table when it has one.
+    def _solve(self, states: States) -> Frames:
+        stack = [states]
+        try:
+            while stack:
+                state = next(stack[-1], None)
+                if state is None:
+                    stack.pop()
+                    continue
+                frame, goals, table = state
+                if goals is not None:
+                    stack.append(self._expand(goals[0], frame, goals[1], table))
+                elif table is None:
+                    yield frame
+                else:
+                    self.tabling.record(table, tuple(substitute(variable, frame) for variable in table.variables))
+        finally:
+            for pending in reversed(stack):
+                close = getattr(pending, "close", None)
+                if close is not None:
+                    close()
+
+    # Conjunctions and disjunctions that stay in this process are pushed as goals; other compound queries and
+    # Datalog relations are run as nested queries, which recurse only as deep as the query is written.
+    def _expand(self, goal: Compound, frame: Frame, rest: Goals, table: Optional[AnswerTable]) -> States:
+        if is_keyword(goal, token.AND_KEYWORD):
+            for conjunct in reversed(self.planner.plan(goal[1:])):
+                rest = (conjunct, rest)
+            return iter([(frame, rest, table)])
+        if is_keyword(goal, token.OR_KEYWORD) and self._heavy(goal[1:], self.planner.cost) is None:
+            return ((frame, (disjunct, rest), table) for disjunct in goal[1:])
+        if is_compound_query(goal) or self.datalog.relation(goal) is not None:
+            return ((result, rest, table) for result in self._run_query(goal, iter([frame])))
+        if self.tabling.is_tabled(goal):
+            return self._consume(goal, frame, rest, table)
+        return self._alternatives(goal, frame, rest, table)
+
+    def _alternatives(self, goal: Compound, frame: Frame, rest: Goals, table: Optional[AnswerTable]) -> States:
+        for result in self._find_assertions(goal, frame, compile_pattern(goal, pattern_match)):
+            yield result, rest, table
+        yield from self._rule_states(goal, frame, rest, table)
+
+    # A tabled goal reads the table of its call, evaluating it first when it is neither complete nor already under
+    # evaluation. The evaluation runs on the same stack as the goal.
+    def _consume(self, goal: Compound, frame: Frame, rest: Goals, table: Optional[AnswerTable]) -> States:
+        self.cache.depend_on(ALL_ASSERTIONS, ALL_RULES)
+        call_table, variables = self.tabling.lookup(substitute(goal, frame))
+        resumed = self._resume(variables, frame, rest, table, call_table.answers)
+        if call_table.complete or call_table.evaluating:
+            self.tabling.read(call_table)
+            return resumed
+        produce = partial(self._alternatives, call_table.call, EMPTY_FRAME, None, call_table)
+        return chain(self.tabling.evaluate(call_table, produce), resumed)
+
+    @staticmethod
+    def _resume(variables: Tuple[Symbol, ...], frame: Frame, rest: Goals, table: Optional[AnswerTable],
+                answers: List[Answer]) -> States:
+        for answer in answers:
+            result = frame
+            for variable, value in zip(variables, answer if is_ground(answer) else rename_variables(answer)):
+                result = result.set(variable.value, value)
+            yield result, rest, table
+
+    def _find_assertions(self, query: Compound, frame: Frame, match: Matcher) -> Frames:
+        self.cache.depend_on(get_index_key(query) if use_index(query) else ALL_ASSERTIONS)
+        yield from self.knowledge.find_assertions(query, frame, match)
+
+    def _rule_states(self, query: Compound, frame: Frame, rest: Goals, table: Optional[AnswerTable]) -> States:
+        templates = self._fetch_rules(query)
+        futures = self._offload(templates, partial(self._rule_cost, query=query, frame=frame),
+                                partial(self._submit_rule, query=query, frame=frame))
+        for template, future in zip(templates, futures):
+            if future is not None:
+                yield from ((result, rest, table) for result in collect(future, frame))
+                continue
+            state = self._rule_state(template, query, frame, rest, table)
+            if state is not None:
+                yield state
+
+    def _fetch_rules(self, pattern: Compound) -> List[RuleTemplate]:
+        self.cache.depend_on(*((get_index_key(pattern), VAR_INDEX_KEY) if use_index(pattern) else (ALL_RULES,)))
+        return self.knowledge.fetch_rules(pattern)
+
+    def _apply_rule(self, template: RuleTemplate, query: Compound, frame: Frame) -> Frames:
+        state = self._rule_state(template, query, frame, None, None)
+        return iter([]) if state is None else self._solve(iter([state]))
+
+    def _rule_state(self, template: RuleTemplate, query: Compound, frame: Frame, rest: Goals,
+                    table: Optional[AnswerTable]) -> Optional[State]:
+        if not template.may_unify(query, frame):
             return None
-        if pattern == data:
-            return frame
-        if is_var(pattern):
-            return self._extend_frame(pattern.value, data, frame)
-        if is_non_empty_list(pattern) and is_list(data) and is_dot(pattern[0]):
-            return self._pattern_match(pattern[1], data[0:], frame)
-        if is_non_empty_list(pattern) and is_non_empty_list(data):
-            return self._pattern_match(
-                pattern[1:],
-                data[1:],
-                self._pattern_match(pattern[0], data[0], frame)
-            )
-        return None
-
-    def _extend_frame(self, var: str, data: AST, frame: Frame) -> Optional[Frame]:
-        binding = frame.get(var)
-        if binding is None:
-            frame[var] = data
-            return frame
-        return self._pattern_match(binding, data, frame)
-
-    def _apply_rules(self, pattern: AST, frame: Frame) -> List[Frame]:
-        return list(chain(*[
-            self._apply_rule(rule, pattern, frame.copy()) for rule in self._fetch_rules(pattern)
-        ]))
-
-    def _fetch_rules(self, pattern: AST) -> List[AST]:
-        return self.rules.get(get_index_key(pattern), []) + self.rules.get(VAR_INDEX_KEY, []) \
-            if use_index(pattern) \
-            else self.rules.get(ALL_RULES, [])
-
-    def _apply_rule(self, rule: AST, query: AST, frame: Frame) -> List[Frame]:
-        clean_rule = rename_variables(rule)
-        unify_result = self._unify_match(query, get_conclusion(clean_rule), frame)
+        names = template.fresh_names()
+        unify_result = unify_match(query, template.build_conclusion(names), frame)
         if unify_result is None:
-            return []
-        body = get_body(clean_rule)
-        if body is None:
-            return [unify_result]
-        return self._run_query(body, [unify_result])
-
-    def _unify_match(self, pattern1: AstNode, pattern2: AstNode, frame: Frame) -> Optional[Frame]:
-        if frame is None:
-            return None
-        if pattern1 == pattern2:
-            return frame
-        if is_var(pattern1):
-            return self._unify_extend(pattern1.value, pattern2, frame)
-        if is_var(pattern2):
-            return self._unify_extend(pattern2.value, pattern1, frame)
-        if is_non_empty_list(pattern1) and is_list(pattern2) and is_dot(pattern1[0]):
-            return self._unify_match(pattern1[1], pattern2[0:], frame)
-        if is_non_empty_list(pattern2) and is_list(pattern1) and is_dot(pattern2[0]):
-            return self._unify_match(pattern1[0:], pattern2[1], frame)
-        if is_non_empty_list(pattern1) and is_non_empty_list(pattern2):
-            return self._unify_match(
-                pattern1[1:],
-                pattern2[1:],
-                self._unify_match(pattern1[0], pattern2[0], frame)
-            )
-        return None
-
-    def _unify_extend(self, var: str, data: AstNode, frame: Frame) -> Optional[Frame]:
-        binding = frame.get(var)
-        if binding is not None:
-            return self._unify_match(binding, data, frame)
-        if is_var(data):
-            binding = frame.get(data.value)
-            if binding is not None:
-                return self._unify_match(AstAtom(token.VAR_DOMAIN, var), binding, frame)
-            frame[var] = data
-            return frame
-        if depends_on(data, var, frame):
             return None
-        frame[var] = data
-        return frame
+        body = template.build_body(names)
+        return unify_result, rest if body is None else (body, rest), table
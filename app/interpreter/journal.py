@@ -0,0 +1,244 @@
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import BinaryIO, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from .snapshot import Image, decode_terms, encode_terms, load_image, save_image
+from .terms import Term
+
+JOURNAL_GROUP_SIZE = 64
+JOURNAL_COMPACT_AFTER = 100_000
+JOURNAL_SYNC_INTERVAL = 1.0
+
+RECORD = struct.Struct("<II")
+INSERT_RECORD = 0
+DELETE_RECORD = 1
+JOURNAL_NAME = re.compile(r"journal-(\d+)\.log")
+BASE_NAME = re.compile(r"base-(\d+)\.img")
+
+Record = Tuple[int, List[Term]]
+Replay = Callable[[int, List[Term]], None]
+
+
+def journal_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"journal-{generation}.log")
+
+
+def base_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"base-{generation}.img")
+
+
+def _generations(directory: str, pattern: "re.Pattern[str]") -> List[int]:
+    matches = (pattern.fullmatch(name) for name in os.listdir(directory))
+    return sorted(int(match.group(1)) for match in matches if match is not None)
+
+
+def _sync_directory(directory: str) -> None:
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def _read_records(path: str) -> Iterator[Record]:
+    with open(path, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        size, checksum = RECORD.unpack_from(data, offset)
+        payload = data[offset + RECORD.size:offset + RECORD.size + size]
+        if len(payload) < size or zlib.crc32(payload) != checksum:
+            break
+        yield payload[0], decode_terms(payload[1:])
+        offset += RECORD.size + size
+    if offset < len(data):
+        with open(path, "r+b") as file:
+            file.truncate(offset)
+
+
+# A knowledge base directory holds at most one current base image `base-N.img`, covering every insert journaled in
+# `journal-M.log` files with M <= N, and the journals written after it. Recovery loads the newest base and replays
+# the newer journals in order; a torn record at the end of a journal is dropped.
+def recover(directory: str) -> Tuple[Optional[str], int, Iterator[Record]]:
+    os.makedirs(directory, exist_ok=True)
+    bases = _generations(directory, BASE_NAME)
+    covered = bases[-1] if bases else -1
+    journals = [generation for generation in _generations(directory, JOURNAL_NAME) if generation > covered]
+    base = base_path(directory, covered) if bases else None
+    records = (record for generation in journals for record in _read_records(journal_path(directory, generation)))
+    return base, max([covered + 1, *journals]), records
+
+
+# Inserts and deletes are appended as length- and checksum-prefixed records: an operation byte followed by the
+# entities in the snapshot term encoding. Records are flushed to the OS immediately and fsynced in groups of
+# `group_size`, or `sync_interval` seconds after the first unsynced one when fewer arrive, so a crash loses at most
+# the last unsynced group or second. The timed sync runs on a timer thread, hence the lock around the file.
+# Once `compact_after` records accumulate, the journal is rotated and a thread writes a copy of the state as of the
+# rotation into a new base image, after which the folded files are removed. A thread rather than a forked child, as
+# forking a process that runs other threads can leave the child waiting on a lock that no thread will release.
+class Journal:
+    def __init__(self, directory: str, generation: int, group_size: int = JOURNAL_GROUP_SIZE,
+                 compact_after: int = JOURNAL_COMPACT_AFTER, sync_interval: float = JOURNAL_SYNC_INTERVAL):
+        self.directory = directory
+        self.generation = generation
+        self.group_size = group_size
+        self.compact_after = compact_after
+        self.sync_interval = sync_interval
+        self.records = 0
+        self.unsynced = 0
+        self.compaction: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.file: BinaryIO = open(journal_path(directory, generation), "ab")  # pylint: disable=consider-using-with
+
+    def append(self, entities: Sequence[Term], operation: int = INSERT_RECORD) -> None:
+        payload = bytes([operation]) + encode_terms(entities)
+        with self.lock:
+            self.file.write(RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+            self.file.flush()
+            self.records += 1
+            self.unsynced += 1
+            if self.unsynced >= self.group_size:
+                self._sync()
+            elif self.unsynced == 1:
+                timer = threading.Timer(self.sync_interval, self.sync)
+                timer.daemon = True
+                timer.start()
+
+    # A timer left over from a group that has since been synced finds nothing to do, or syncs a later group early.
+    def sync(self) -> None:
+        with self.lock:
+            if self.unsynced:
+                self._sync()
+
+    def needs_compaction(self) -> bool:
+        self._reap(wait=False)
+        return self.compaction is None and self.records >= self.compact_after
+
+    def compact(self, image: Image, background: bool = True) -> None:
+        self._reap(wait=True)
+        with self.lock:
+            covered = self._rotate()
+        if not background:
+            self._fold(image, covered)
+            return
+        self.compaction = threading.Thread(target=self._fold, args=(image.copy(), covered), name="journal-compaction")
+        self.compaction.start()
+
+    def close(self) -> None:
+        self._reap(wait=True)
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+    def _sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def _rotate(self) -> int:
+        self._sync()
+        self.file.close()
+        covered = self.generation
+        self.generation += 1
+        self.records = 0
+        self.file = open(journal_path(self.directory, self.generation), "ab")  # pylint: disable=consider-using-with
+        _sync_directory(self.directory)
+        return covered
+
+    def _fold(self, image: Image, covered: int) -> None:
+        if self._write_base(image, covered):
+            self._remove_folded(covered)
+
+    def _write_base(self, image: Image, covered: int) -> bool:
+        target = base_path(self.directory, covered)
+        temporary = f"{target}.tmp"
+        try:
+            save_image(temporary, image)
+            with open(temporary, "rb") as file:
+                os.fsync(file.fileno())
+            os.replace(temporary, target)
+            _sync_directory(self.directory)
+        except OSError:
+            return False
+        return True
+
+    def _reap(self, wait: bool) -> None:
+        if self.compaction is None or (self.compaction.is_alive() and not wait):
+            return
+        self.compaction.join()
+        self.compaction = None
+
+    def _remove_folded(self, covered: int) -> None:
+        for generation in _generations(self.directory, BASE_NAME):
+            if generation < covered:
+                os.remove(base_path(self.directory, generation))
+        for generation in _generations(self.directory, JOURNAL_NAME):
+            if generation <= covered:
+                os.remove(journal_path(self.directory, generation))
+
+
+# Snapshots and the journal of an interpreter. `image` returns the current knowledge base, `restore` replaces it
+# with a loaded one, and `replay` applies a recovered journal record.
+class Persistence:
+    def __init__(self, image: Callable[[], Image], restore: Callable[[Image], None], replay: Replay):
+        self.journal: Optional[Journal] = None
+        self._image = image
+        self._restore = restore
+        self._replay = replay
+
+    def save_snapshot(self, path: str) -> None:
+        save_image(path, self._image())
+
+    def load_snapshot(self, path: str) -> None:
+        self._restore(load_image(path))
+
+    def open_journal(self, directory: str, group_size: int = JOURNAL_GROUP_SIZE,
+                     compact_after: int = JOURNAL_COMPACT_AFTER, sync_interval: float = JOURNAL_SYNC_INTERVAL) -> None:
+        self.close_journal()
+        base, generation, records = recover(directory)
+        if base is not None:
+            self.load_snapshot(base)
+        for operation, entities in records:
+            self._replay(operation, entities)
+        self.journal = Journal(directory, generation, group_size, compact_after, sync_interval)
+
+    def close_journal(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def compact(self) -> None:
+        if self.journal is None:
+            raise ValueError("no journal is open")
+        self.journal.compact(self._image(), background=False)
+
+    def record(self, entities: Sequence[Term], operation: int = INSERT_RECORD) -> None:
+        if self.journal is None:
+            return
+        self.journal.append(entities, operation)
+        if self.journal.needs_compaction():
+            self.journal.compact(self._image())
+
+
+# Snapshot and journal entry points of an interpreter, delegating to its `persistence`.
+class Persistent:
+    persistence: Persistence
+
+    def save_snapshot(self, path: str) -> None:
+        self.persistence.save_snapshot(path)
+
+    def load_snapshot(self, path: str) -> None:
+        self.persistence.load_snapshot(path)
+
+    def open_journal(self, directory: str, group_size: int = JOURNAL_GROUP_SIZE,
+                     compact_after: int = JOURNAL_COMPACT_AFTER, sync_interval: float = JOURNAL_SYNC_INTERVAL) -> None:
+        self.persistence.open_journal(directory, group_size, compact_after, sync_interval)
+
+    def close_journal(self) -> None:
+        self.persistence.close_journal()
+
+    def compact(self) -> None:
+        self.persistence.compact()
@@ -0,0 +1,257 @@
+import gc
+from itertools import chain, count
+from typing import Dict, Iterator, List, Sequence
+
+from .columns import ColumnStore, is_columnar
+from .frame import EMPTY_FRAME
+from .helpers import (
+    ALL_ASSERTIONS,
+    ALL_RULES,
+    VAR_INDEX_KEY,
+    ArgumentKey,
+    Compound,
+    Frame,
+    Frames,
+    get_argument_keys,
+    get_conclusion,
+    get_index_key,
+    is_indexable,
+    is_rule,
+    use_index,
+)
+from .matcher import Matcher
+from .planner import Statistics
+from .rules import RuleBuckets, RuleTemplate
+from .snapshot import Image
+from .terms import release_compounds
+
+TOMBSTONE_RATIO = 0.25
+FREEZE_INTERVAL = 4096
+
+Buckets = Dict[str, List[Compound]]
+
+_unfrozen = 0
+
+
+# Stored facts live as long as their knowledge base, so every `FREEZE_INTERVAL` terms stored in any knowledge base
+# the garbage collector runs once and moves everything still alive to its permanent generation: later collections
+# stop rescanning stored facts, and the cost of an insert stays flat as the knowledge base grows. Frozen objects are
+# still freed by reference counting, which is all acyclic terms need.
+def _freeze(stored: int) -> None:
+    global _unfrozen  # pylint: disable=global-statement
+    _unfrozen += stored
+    if _unfrozen >= FREEZE_INTERVAL:
+        gc.collect()
+        gc.freeze()
+        _unfrozen = 0
+
+
+# Facts and rules with their indexes: facts are bucketed by index key and by every argument that has a constant or
+# a compound with a constant head, flat ground facts go to the column store once it is enabled, and rules are kept
+# as compiled templates in insertion order and bucketed by the index key of their conclusion. Every copy of a rule
+# gets its own insertion serial, and the rule term itself maps to its serials, so a rule is deleted by lookup.
+# Retracted facts stay in the lists and indexes as tombstones, skipped by every scan, so a delete only costs a
+# lookup in the candidate bucket; a retracted fact inserted again just loses its tombstone. Once tombstones make up
+# `TOMBSTONE_RATIO` of the facts, all buckets are filtered in one pass.
+class KnowledgeBase:
+    def __init__(self):
+        self.assertions: Buckets = {ALL_ASSERTIONS: []}
+        self.rules: RuleBuckets = {ALL_RULES: {}}
+        self.rule_index: Dict[Compound, List[int]] = {}
+        self.argument_index: Dict[ArgumentKey, List[Compound]] = {}
+        self.columns = ColumnStore()
+        self.statistics = Statistics(self.assertions, self.columns)
+        self.retracted: Dict[Compound, int] = {}
+        self.tombstones = 0
+        self.version = 0
+        self._serials = count()
+
+    def load(self, terms: Sequence[Compound]) -> None:
+        new_assertions: List[Compound] = []
+        new_rules: List[Compound] = []
+        for entity in terms:
+            if is_rule(entity):
+                new_rules.append(entity)
+            elif self._revive(entity):
+                continue
+            elif self.columns.enabled and is_columnar(entity):
+                self._store_in_columns(entity)
+            else:
+                new_assertions.append(entity)
+        self.assertions[ALL_ASSERTIONS].extend(new_assertions)
+        for assertion in new_assertions:
+            self._store_assertion_in_index(assertion)
+        for rule in new_rules:
+            self._insert_rule(rule)
+        _freeze(len(terms))
+
+    def insert(self, entities: Sequence[Compound]) -> None:
+        for entity in entities:
+            if is_rule(entity):
+                self._insert_rule(entity)
+            else:
+                self._insert_assertion(entity)
+        _freeze(len(entities))
+
+    def delete(self, entities: Sequence[Compound]) -> None:
+        for entity in entities:
+            if is_rule(entity):
+                self._delete_rule(entity)
+            else:
+                self._delete_assertion(entity)
+        if self.tombstones > TOMBSTONE_RATIO * (len(self.assertions[ALL_ASSERTIONS]) + self.columns.size):
+            self._compact()
+
+    def image(self) -> Image:
+        self._compact()
+        rules = [template.rule for template in self.rules[ALL_RULES].values()]
+        return Image(self.assertions, rules, self.argument_index, self.columns)
+
+    def restore(self, image: Image) -> None:
+        self.assertions.clear()
+        self.assertions.update(image.assertions)
+        self.argument_index = image.argument_index
+        self.retracted.clear()
+        self.tombstones = 0
+        self.columns.restore(image.columns)
+        self._count_distinct()
+        self.rules.clear()
+        self.rules[ALL_RULES] = {}
+        self.rule_index.clear()
+        for rule in image.rules:
+            self._insert_rule(rule)
+        _freeze(len(self.assertions[ALL_ASSERTIONS]) + self.columns.size + len(image.rules))
+
+    # Runs while a query may still be iterating the buckets, so retracted facts are skipped instead of compacted.
+    def facts(self) -> Iterator[Compound]:
+        facts = (assertion for assertion in self.assertions[ALL_ASSERTIONS] if assertion not in self.retracted)
+        return chain(facts, self.columns.facts())
+
+    def is_fact_query(self, pattern: Compound) -> bool:
+        return use_index(pattern) and get_index_key(pattern) not in self.rules and not self.rules.get(VAR_INDEX_KEY)
+
+    def find_assertions(self, query: Compound, frame: Frame, match: Matcher) -> Frames:
+        retracted = self.retracted
+        for assertion in self.fetch_assertions(query, frame):
+            if retracted and assertion in retracted:
+                continue
+            match_result = match(assertion, frame)
+            if match_result is not None:
+                yield match_result
+        if self.columns.size:
+            yield from self.columns.match(query, frame, match)
+
+    def fetch_assertions(self, pattern: Compound, frame: Frame) -> List[Compound]:
+        if not use_index(pattern):
+            return self.assertions.get(ALL_ASSERTIONS, [])
+        candidates = self.assertions.get(get_index_key(pattern), [])
+        for argument_key in get_argument_keys(pattern, frame):
+            bucket = self.argument_index.get(argument_key, [])
+            if len(bucket) < len(candidates):
+                candidates = bucket
+        return candidates
+
+    def fetch_rules(self, pattern: Compound) -> List[RuleTemplate]:
+        if not use_index(pattern):
+            return list(self.rules[ALL_RULES].values())
+        return [*self.rules.get(get_index_key(pattern), {}).values(), *self.rules.get(VAR_INDEX_KEY, {}).values()]
+
+    def _insert_rule(self, rule: Compound) -> None:
+        serial = next(self._serials)
+        template = RuleTemplate(rule)
+        self.rules[ALL_RULES][serial] = template
+        self.rule_index.setdefault(rule, []).append(serial)
+        pattern = get_conclusion(rule)
+        if is_indexable(pattern):
+            self.rules.setdefault(get_index_key(pattern), {})[serial] = template
+
+    def _insert_assertion(self, assertion: Compound) -> None:
+        if self._revive(assertion):
+            return
+        if self.columns.enabled and is_columnar(assertion):
+            self._store_in_columns(assertion)
+            return
+        self._store_assertion_in_index(assertion)
+        self.assertions[ALL_ASSERTIONS].append(assertion)
+
+    def _store_in_columns(self, assertion: Compound) -> None:
+        key = get_index_key(assertion)
+        for position in self.columns.add(assertion):
+            self.statistics.add_distinct((key, position, ""))
+
+    def _store_assertion_in_index(self, assertion: Compound) -> None:
+        if not is_indexable(assertion):
+            return
+        self.assertions.setdefault(get_index_key(assertion), []).append(assertion)
+        if not use_index(assertion):
+            return
+        for argument_key in get_argument_keys(assertion, EMPTY_FRAME):
+            bucket = self.argument_index.setdefault(argument_key, [])
+            if not bucket:
+                self.statistics.add_distinct(argument_key)
+            bucket.append(assertion)
+
+    def _delete_rule(self, rule: Compound) -> None:
+        serials = self.rule_index.pop(rule, None)
+        if serials is None:
+            return
+        buckets = [self.rules[ALL_RULES]]
+        pattern = get_conclusion(rule)
+        if is_indexable(pattern):
+            buckets.append(self.rules[get_index_key(pattern)])
+        for bucket in buckets:
+            for serial in serials:
+                del bucket[serial]
+        if len(buckets) > 1 and not buckets[1]:
+            del self.rules[get_index_key(pattern)]
+
+    def _delete_assertion(self, assertion: Compound) -> None:
+        if self.columns.size and is_columnar(assertion):
+            self.tombstones += self.columns.remove(assertion)
+        if assertion in self.retracted:
+            return
+        copies = sum(1 for stored in self.fetch_assertions(assertion, EMPTY_FRAME) if stored == assertion)
+        if copies:
+            self.retracted[assertion] = copies
+            self.tombstones += copies
+
+    # Inserting a retracted fact again clears its tombstone; the copies stored beyond the first are dropped.
+    def _revive(self, assertion: Compound) -> bool:
+        copies = self.retracted.pop(assertion, 0)
+        if not copies:
+            return False
+        self.tombstones -= copies
+        buckets = [self.assertions[ALL_ASSERTIONS], self.assertions[get_index_key(assertion)]]
+        if use_index(assertion):
+            buckets.extend(self.argument_index[key] for key in get_argument_keys(assertion, EMPTY_FRAME))
+        for bucket in buckets:
+            for _ in range(copies - 1):
+                bucket.remove(assertion)
+        return True
+
+    def _compact(self) -> None:
+        self.columns.compact()
+        self.tombstones = 0
+        if not self.retracted:
+            return
+        for key, bucket in self.assertions.items():
+            self.assertions[key] = [assertion for assertion in bucket if assertion not in self.retracted]
+        for argument_key, bucket in list(self.argument_index.items()):
+            kept = [assertion for assertion in bucket if assertion not in self.retracted]
+            if kept:
+                self.argument_index[argument_key] = kept
+            else:
+                del self.argument_index[argument_key]
+        self.retracted.clear()
+        self._count_distinct()
+        release_compounds()
+
+    def _count_distinct(self) -> None:
+        distinct = self.statistics.distinct
+        distinct.clear()
+        for argument_key in self.argument_index:
+            self.statistics.add_distinct(argument_key)
+        for key, relations in self.columns.relations.items():
+            for relation in relations:
+                for position, values in enumerate(relation.distinct(), 1):
+                    distinct[key, position] = distinct.get((key, position), 0) + values
@@ -0,0 +1,81 @@
+from typing import Callable, List, Optional, Tuple
+
+from .helpers import Frame, is_dot
+from .terms import Compound, Symbol, Term, canonical, is_ground
+
+Matcher = Callable[[Term, Frame], Optional[Frame]]
+Fallback = Callable[[Term, Term, Frame], Optional[Frame]]
+Constants = List[Tuple[int, Term]]
+Steps = List[Tuple[int, Matcher]]
+
+
+# Ground subterms are checked first, so a failed match usually stops before any frame is extended.
+# Already bound variables are matched with `fallback`.
+def compile_pattern(pattern: Term, fallback: Fallback) -> Matcher:
+    if is_ground(pattern):
+        return _compile_constant(canonical(pattern))
+    if isinstance(pattern, Symbol):
+        return _compile_var(pattern.value, fallback)
+    return _compile_compound(pattern, fallback)
+
+
+def _compile_constant(constant: Term) -> Matcher:
+    def step(data: Term, frame: Frame) -> Optional[Frame]:
+        return frame if data is constant else None
+
+    return step
+
+
+def _compile_var(name: str, fallback: Fallback) -> Matcher:
+    def step(data: Term, frame: Frame) -> Optional[Frame]:
+        binding = frame.get(name)
+        if binding is None:
+            return frame.set(name, data)
+        if binding is data:
+            return frame
+        return fallback(binding, data, frame)
+
+    return step
+
+
+def _compile_compound(pattern: Compound, fallback: Fallback) -> Matcher:
+    size, tail = _split_tail(pattern)
+    constants, steps = _compile_arguments(pattern[:size], fallback)
+    tail_step = None if tail is None else compile_pattern(tail, fallback)
+
+    def step(data: Term, frame: Frame) -> Optional[Frame]:
+        if type(data) is not tuple:  # pylint: disable=unidiomatic-typecheck
+            return None
+        if len(data) != size and (tail_step is None or len(data) < size):
+            return None
+        for position, constant in constants:
+            if data[position] is not constant:
+                return None
+        result: Optional[Frame] = frame
+        for position, child in steps:
+            result = child(data[position], result)
+            if result is None:
+                return None
+        if tail_step is not None:
+            return tail_step(data[size:], result)
+        return result
+
+    return step
+
+
+def _compile_arguments(nodes: Compound, fallback: Fallback) -> Tuple[Constants, Steps]:
+    constants: Constants = []
+    steps: Steps = []
+    for position, node in enumerate(nodes):
+        if is_ground(node):
+            constants.append((position, canonical(node)))
+        else:
+            steps.append((position, compile_pattern(node, fallback)))
+    return constants, steps
+
+
+def _split_tail(pattern: Compound) -> Tuple[int, Optional[Term]]:
+    for position, node in enumerate(pattern):
+        if is_dot(node):
+            return position, pattern[position + 1]
+    return len(pattern), None
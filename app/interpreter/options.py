@@ -0,0 +1,34 @@
+from typing import Optional
+
+from .cache import RESULT_CACHE_BYTES, RESULT_CACHE_ENTRIES, ResultCache
+from .datalog import Datalog
+from .knowledge import KnowledgeBase
+from .parallel import PARALLEL_THRESHOLD, WorkerPool
+from .tabling import Tabling
+
+
+# Switches for the optional engines of an interpreter, each delegating to the collaborator that runs it.
+class Configurable:
+    knowledge: KnowledgeBase
+    tabling: Tabling
+    datalog: Datalog
+    cache: ResultCache
+    pool: WorkerPool
+
+    def table(self, *predicates: str) -> None:
+        self.tabling.enable(predicates)
+
+    def use_datalog(self) -> None:
+        self.datalog.enable()
+
+    def use_columns(self) -> None:
+        self.knowledge.columns.enabled = True
+
+    def use_cache(self, entries: int = RESULT_CACHE_ENTRIES, max_bytes: int = RESULT_CACHE_BYTES) -> None:
+        self.cache.enable(entries, max_bytes)
+
+    def parallel(self, workers: Optional[int] = None, threshold: float = PARALLEL_THRESHOLD) -> None:
+        self.pool.enable(workers, threshold)
+
+    def sequential(self) -> None:
+        self.pool.disable()
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from ..parser import AST, AstNode
+from .frame import EMPTY_FRAME, Frame
+from .helpers import ALL_RULES, set_fresh_ids
+from .terms import Term, make_term, to_ast
+
+PARALLEL_THRESHOLD = 10_000
+PARALLEL_BATCH_SIZE = 256
+WORKER_ID_SHIFT = 40
+
+Bindings = List[Tuple[str, AstNode]]
+Snapshot = Tuple[List[AST], List[AST], List[str], bool, bool]
+
+_worker: Any = None
+
+
+def frame_to_bindings(frame: Frame, base: Frame = EMPTY_FRAME) -> Bindings:
+    return [(name, to_ast(value)) for name, value in frame.items() if name not in base]
+
+
+def bindings_to_frame(bindings: Bindings, base: Frame = EMPTY_FRAME) -> Frame:
+    for name, value in bindings:
+        base = base.set(name, make_term(value))
+    return base
+
+
+def _init_worker(snapshot: Snapshot) -> None:
+    from .interpreter import (  # pylint: disable=import-outside-toplevel,cyclic-import
+        Interpreter,
+    )
+
+    global _worker  # pylint: disable=global-statement
+    assertions, rules, tabled, table_all, datalog = snapshot
+    set_fresh_ids(os.getpid() << WORKER_ID_SHIFT)
+    _worker = Interpreter(None)
+    _worker.load([*assertions, *rules])
+    if tabled or table_all:
+        _worker.table(*tabled)
+    if datalog:
+        _worker.use_datalog()
+
+
+def _run_query(query: AST, batch: List[Bindings]) -> List[List[Bindings]]:
+    term = make_term(query)
+    replies = []
+    for bindings in batch:
+        frame = bindings_to_frame(bindings)
+        results = _worker._run_query(term, iter([frame]))  # pylint: disable=protected-access
+        replies.append([frame_to_bindings(result, frame) for result in results])
+    return replies
+
+
+def _apply_rule(rule: AST, query: AST, bindings: Bindings) -> List[Bindings]:
+    frame = bindings_to_frame(bindings)
+    knowledge = _worker.knowledge
+    template = knowledge.rules[ALL_RULES][knowledge.rule_index[make_term(rule)][0]]
+    results = _worker._apply_rule(template, make_term(query), frame)  # pylint: disable=protected-access
+    return [frame_to_bindings(result, frame) for result in results]
+
+
+# Runs independent branches of a query in a process pool. Every worker holds a read-only copy of the knowledge base
+# taken when the pool is started; the pool is restarted lazily after the knowledge base changes. Frames cross the
+# process boundary as parser ASTs, so workers and the coordinator keep their own interned terms.
+class WorkerPool:
+    def __init__(self, workers: Optional[int] = None, threshold: float = PARALLEL_THRESHOLD):
+        self.enabled = False
+        self.workers = workers
+        self.threshold = threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def enable(self, workers: Optional[int] = None, threshold: float = PARALLEL_THRESHOLD) -> None:
+        self.invalidate()
+        self.enabled = True
+        self.workers = workers
+        self.threshold = threshold
+
+    def disable(self) -> None:
+        self.invalidate()
+        self.enabled = False
+
+    def invalidate(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def start(self, snapshot: Callable[[], Snapshot]) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(snapshot(),))
+
+    # Frames are split into one task per worker instead of one task each.
+    def submit_query(self, query: Term, frames: List[Frame]) -> "List[Future[List[List[Bindings]]]]":
+        assert self._executor is not None
+        query_ast = to_ast(query)
+        size = -(-len(frames) // (self.workers or os.cpu_count() or 1))
+        bindings = [frame_to_bindings(frame) for frame in frames]
+        batches = (bindings[start:start + size] for start in range(0, len(bindings), size))
+        return [self._executor.submit(_run_query, query_ast, batch) for batch in batches]
+
+    def submit_rule(self, rule: Term, query: Term, frame: Frame) -> "Future[List[Bindings]]":
+        assert self._executor is not None
+        return self._executor.submit(_apply_rule, to_ast(rule), to_ast(query), frame_to_bindings(frame))
+
+
+def collect(future: "Future[List[Bindings]]", frame: Frame) -> Iterable[Frame]:
+    return (bindings_to_frame(bindings, frame) for bindings in future.result())
+
+
+def collect_batch(futures: "List[Future[List[List[Bindings]]]]", frames: List[Frame]) -> List[List[Frame]]:
+    replies = [reply for future in futures for reply in future.result()]
+    return [[bindings_to_frame(bindings, frame) for bindings in reply] for frame, reply in zip(frames, replies)]
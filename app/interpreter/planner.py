@@ -0,0 +1,145 @@
+from typing import AbstractSet, Callable, Dict, List, Set, Tuple
+
+from ..lexer import token
+from .columns import ColumnStore
+from .frame import EMPTY_FRAME
+from .helpers import (
+    ALL_ASSERTIONS,
+    ArgumentKey,
+    Compound,
+    get_argument_value,
+    get_index_key,
+    get_vars,
+    is_atom,
+    is_dot,
+    is_non_empty_list,
+    is_var,
+    use_index,
+)
+
+IsRelation = Callable[[Compound], bool]
+RuleCount = Callable[[Compound], int]
+
+RULE_CALL_COST = 1_000
+
+
+def is_filter(conjunct: Compound) -> bool:
+    return is_non_empty_list(conjunct) and is_atom(conjunct[0]) and \
+        conjunct[0].domain in (token.NOT_KEYWORD, token.APPLY_KEYWORD)
+
+
+class Statistics:
+    def __init__(self, assertions: Dict[str, List[Compound]], columns: ColumnStore):
+        self.assertions = assertions
+        self.columns = columns
+        self.distinct: Dict[Tuple[str, int], int] = {}
+
+    def total(self) -> int:
+        return len(self.assertions[ALL_ASSERTIONS]) + self.columns.size
+
+    def count(self, key: str) -> int:
+        return len(self.assertions.get(key, [])) + self.columns.count(key)
+
+    def add_distinct(self, argument_key: ArgumentKey) -> None:
+        key, position, _ = argument_key
+        self.distinct[key, position] = self.distinct.get((key, position), 0) + 1
+
+    def estimate(self, pattern: Compound, bound: Set[str]) -> float:
+        key = get_index_key(pattern)
+        rows = float(self.count(key))
+        for position in range(1, len(pattern)):
+            node = pattern[position]
+            if is_dot(node):
+                break
+            if is_var(node):
+                known = node.value in bound
+            else:
+                known = get_argument_value(node, EMPTY_FRAME) is not None or not get_vars(node) - bound
+            if known:
+                rows /= max(self.distinct.get((key, position), 1), 1)
+        return rows
+
+
+# Reorders the conjuncts of an @and by estimated result size. Only simple queries answered from facts are moved;
+# every other conjunct stays in place relative to them. @not and @apply are moved as early as possible, but never
+# before a conjunct that binds one of their variables in the written order, so they see the same bindings.
+# A fact query is hash joined on the variables it shares with earlier conjuncts when none of them is at an
+# argument position covered by the argument index.
+class Planner:
+    def __init__(self, statistics: Statistics, is_relation: IsRelation, rule_count: RuleCount):
+        self.statistics = statistics
+        self.is_relation = is_relation
+        self.rule_count = rule_count
+
+    def cost(self, query: Compound) -> float:
+        if is_non_empty_list(query) and is_atom(query[0]):
+            if query[0].domain in (token.AND_KEYWORD, token.OR_KEYWORD):
+                return sum(self.cost(operand) for operand in query[1:])
+            if query[0].domain == token.NOT_KEYWORD:
+                return self.cost(query[1])
+            if query[0].domain == token.APPLY_KEYWORD:
+                return 1
+            if query[0].domain in (token.LIMIT_KEYWORD, token.OFFSET_KEYWORD):
+                return self.cost(query[2])
+        rows = self.statistics.estimate(query, set()) if use_index(query) else self.statistics.total()
+        return rows + RULE_CALL_COST * self.rule_count(query)
+
+    def plan(self, conjuncts: Compound, bound: AbstractSet[str] = frozenset()) -> Compound:
+        if len(conjuncts) < 2:
+            return conjuncts
+        ordered: List[Compound] = []
+        segment: List[int] = []
+        for position, conjunct in enumerate(conjuncts):
+            if self._is_movable(conjuncts, position):
+                segment.append(position)
+                continue
+            ordered.extend(self._order(conjuncts, segment, ordered, bound))
+            segment = []
+            ordered.append(conjunct)
+        ordered.extend(self._order(conjuncts, segment, ordered, bound))
+        return tuple(ordered)
+
+    def _is_movable(self, conjuncts: Compound, position: int) -> bool:
+        conjunct = conjuncts[position]
+        if is_filter(conjunct):
+            variables = get_vars(conjunct)
+            return not any(variables & get_vars(later) for later in conjuncts[position + 1:] if not is_filter(later))
+        return self.is_relation(conjunct)
+
+    def _order(self, conjuncts: Compound, segment: List[int], placed: List[Compound],
+               known: AbstractSet[str]) -> List[Compound]:
+        bound = set(known).union(*(get_vars(conjunct) for conjunct in placed))
+        suppliers = {
+            position: {
+                other for other in segment
+                if other < position and get_vars(conjuncts[other]) & get_vars(conjuncts[position])
+            }
+            for position in segment if is_filter(conjuncts[position])
+        }
+        pending = list(segment)
+        done: Set[int] = set()
+        ordered: List[Compound] = []
+        while pending:
+            ready = [position for position in pending if position in suppliers and suppliers[position] <= done]
+            if not ready:
+                relations = [position for position in pending if position not in suppliers]
+                ready = [min(relations, key=lambda p: self.statistics.estimate(conjuncts[p], bound))]
+            for position in ready:
+                pending.remove(position)
+                done.add(position)
+                ordered.append(conjuncts[position])
+                bound |= get_vars(conjuncts[position])
+        return ordered
+
+    def join_vars(self, conjunct: Compound, bound: Set[str]) -> Set[str]:
+        if not self.is_relation(conjunct):
+            return set()
+        shared = get_vars(conjunct) & bound
+        indexed = set()
+        for node in conjunct[1:]:
+            if is_dot(node):
+                break
+            head = node[0] if is_non_empty_list(node) else node
+            if is_var(head):
+                indexed.add(head.value)
+        return set() if shared & indexed else shared
@@ -0,0 +1,107 @@
+import re
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+from ..lexer import token
+from ..lexer.lexer import NUMBER, WORD
+from ..parser import AST, parse
+from .frame import EMPTY_FRAME, Frame
+from .helpers import Compound, is_atom, is_delete, is_insert
+from .terms import Symbol, Term, compound, leaves, make_term, map_term, symbol, var
+
+STATEMENT_CACHE_SIZE = 256
+
+Argument = Union[str, int]
+Execute = Callable[["PreparedQuery", Frame], Iterator[str]]
+
+_word = re.compile(WORD)
+_number = re.compile(NUMBER)
+
+
+def is_parameter(node: Term) -> bool:
+    return is_atom(node) and node.domain == token.PARAMETER_DOMAIN
+
+
+def parameters_of(query: Term) -> List[str]:
+    return list(dict.fromkeys(node.value for node in leaves(query) if is_parameter(node)))
+
+
+def parameter_to_var(node: Term) -> Term:
+    return var(node.value) if is_parameter(node) else node
+
+
+def parameters_to_vars(query: Term) -> Term:
+    return map_term(query, parameter_to_var, compound)
+
+
+def parse_statement(command: str, row: int = 1, column: int = 1) -> Compound:
+    statement = make_term(parse(command, row, column))
+    if parameters_of(statement):
+        raise ValueError("command has parameters, prepare it first")
+    return statement
+
+
+def make_entities(entities: Iterable[AST]) -> List[Compound]:
+    terms = [make_term(entity) for entity in entities]
+    if any(parameters_of(term) for term in terms):
+        raise ValueError("entity has parameters, prepare it first")
+    return terms
+
+
+def check_query(command_ast: Compound) -> Compound:
+    if is_insert(command_ast):
+        raise ValueError("expected query, got insert command")
+    if is_delete(command_ast):
+        raise ValueError("expected query, got delete command")
+    return command_ast
+
+
+def to_constant(value: Argument) -> Symbol:
+    text = str(value)
+    if _number.fullmatch(text):
+        return symbol(token.NUMBER_DOMAIN, text)
+    if _word.fullmatch(text):
+        return symbol(token.WORD_DOMAIN, text)
+    raise ValueError(f"{value!r} is neither a word nor a number")
+
+
+# A query parsed once, with its `?name` parameters turned into variables that `execute` binds in the initial frame.
+# The interpreter keeps the order it planned for the conjuncts in `plan` and reuses it until the knowledge base
+# changes, so a call skips lexing, parsing and planning.
+class PreparedQuery:
+    def __init__(self, query: Compound, execute: Execute):
+        self.parameters = [name[1:] for name in parameters_of(query)]
+        self.query: Compound = parameters_to_vars(query)  # type: ignore
+        self.plan: Optional[Compound] = None
+        self.version = -1
+        self._execute = execute
+
+    def execute(self, **arguments: Argument) -> Iterator[str]:
+        missing = [name for name in self.parameters if name not in arguments]
+        unknown = [name for name in arguments if name not in self.parameters]
+        if missing or unknown:
+            raise ValueError(f"missing parameters {missing}, unknown parameters {unknown}")
+        frame = EMPTY_FRAME
+        for name in self.parameters:
+            frame = frame.set(f"?{name}", to_constant(arguments[name]))
+        return self._execute(self, frame)
+
+
+# Parsed queries are kept by their text, so callers repeating the same string skip lexing and parsing.
+# Inserts and deletes rarely repeat and are not kept.
+class Statements:
+    def __init__(self, size: int = STATEMENT_CACHE_SIZE):
+        self.size = size
+        self.parsed: "OrderedDict[str, Compound]" = OrderedDict()
+
+    def get(self, command: str) -> Compound:
+        statement = self.parsed.get(command)
+        if statement is not None:
+            self.parsed.move_to_end(command)
+            return statement
+        statement = parse_statement(command)
+        if not is_insert(statement) and not is_delete(statement):
+            self.parsed[command] = statement
+            if len(self.parsed) > self.size:
+                self.parsed.popitem(last=False)
+        return statement
@@ -0,0 +1,81 @@
+from typing import Callable, Dict, Optional, Tuple
+
+from .helpers import (
+    Compound,
+    Frame,
+    fresh_id,
+    get_body,
+    get_conclusion,
+    get_vars,
+    is_dot,
+    is_list,
+    is_var,
+    make_id_variable,
+    resolve,
+)
+from .terms import Symbol, Term, is_ground, is_uninterned, map_term
+
+Names = Tuple[Symbol, ...]
+Builder = Callable[[Names], Term]
+
+
+# Interned compounds are ground and kept as they are; every other list is rebuilt from its children.
+def compile_template(term: Term, slots: Tuple[str, ...]) -> Builder:
+    def compile_leaf(node: Term) -> Builder:
+        if is_var(node):
+            slot = slots.index(node.value)
+            return lambda names: names[slot]
+        return lambda _: node
+
+    def compile_list(builders: Tuple[Builder, ...]) -> Builder:
+        return lambda names: tuple(builder(names) for builder in builders)
+
+    return map_term(term, compile_leaf, compile_list, is_uninterned)
+
+
+def has_dot(term: Compound) -> bool:
+    return any(is_dot(node) for node in term)
+
+
+# A rule compiled once at insert time: its variables get numbered slots, and applying the rule only fills the slots
+# with variables suffixed by a fresh counter value. The body is renamed only after the conclusion unifies.
+class RuleTemplate:
+    __slots__ = ("rule", "slots", "conclusion", "body", "_conclusion", "_body", "_constants")
+
+    def __init__(self, rule: Compound):
+        self.rule = rule
+        self.slots = tuple(sorted(get_vars(rule)))
+        self.conclusion = get_conclusion(rule)
+        self.body = get_body(rule)
+        self._conclusion = compile_template(self.conclusion, self.slots)
+        self._body = None if self.body is None else compile_template(self.body, self.slots)
+        self._constants: Optional[Tuple[Tuple[int, Term], ...]] = None
+        if is_list(self.conclusion) and not has_dot(self.conclusion):
+            self._constants = tuple(
+                (position, head) for position, head in enumerate(self.conclusion) if is_ground(head)
+            )
+
+    def may_unify(self, query: Compound, frame: Frame) -> bool:
+        if self._constants is None or has_dot(query):
+            return True
+        if len(query) != len(self.conclusion):
+            return False
+        for position, head in self._constants:
+            node = resolve(query[position], frame)
+            if node is not head and is_ground(node) and node != head:
+                return False
+        return True
+
+    def fresh_names(self) -> Names:
+        var_id = fresh_id()
+        return tuple(make_id_variable(name, var_id) for name in self.slots)
+
+    def build_conclusion(self, names: Names) -> Term:
+        return self._conclusion(names)
+
+    def build_body(self, names: Names) -> Optional[Term]:
+        return None if self._body is None else self._body(names)
+
+
+# Rule templates bucketed like facts, each bucket keyed by the insertion serial of its rules so it keeps their order.
+RuleBuckets = Dict[str, Dict[int, RuleTemplate]]
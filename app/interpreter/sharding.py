@@ -0,0 +1,277 @@
+import zlib
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..parser import AST
+from .columns import ColumnStore
+from .datalog import Datalog
+from .helpers import (
+    ALL_ASSERTIONS,
+    Compound,
+    Consume,
+    Frame,
+    Frames,
+    ast_to_string,
+    get_index_key,
+    is_dot,
+    is_indexable,
+    is_rule,
+    pattern_match,
+    substitute,
+    use_index,
+)
+from .interpreter import PROCEDURES, Interpreter
+from .journal import Persistence
+from .matcher import Matcher, compile_pattern
+from .parallel import (
+    PARALLEL_THRESHOLD,
+    Bindings,
+    WorkerPool,
+    bindings_to_frame,
+    frame_to_bindings,
+)
+from .planner import Statistics
+from .terms import Symbol, Term, is_ground, make_term, to_ast
+
+SHARD_BATCH_SIZE = 256
+
+INSERT = "insert"
+DELETE = "delete"
+MATCH = "match"
+STATS = "stats"
+STOP = "stop"
+
+Partition = Dict[str, int]
+Summary = Tuple[int, Dict[str, int], Dict[Tuple[str, int], int]]
+
+
+def _term_key(term: Term) -> str:
+    return term.value if isinstance(term, Symbol) else ast_to_string(term)
+
+
+def _stable_hash(key: str) -> int:
+    return zlib.crc32(key.encode())
+
+
+def _serve(connection: Connection) -> None:
+    shard = Interpreter(None)
+    while True:
+        message = connection.recv()
+        if message[0] == STOP:
+            break
+        if message[0] == INSERT:
+            shard.load(message[1])
+        elif message[0] == DELETE:
+            shard.retract(message[1])
+        elif message[0] == MATCH:
+            connection.send(_match_batch(shard, make_term(message[1]), message[2]))
+        elif message[0] == STATS:
+            connection.send(_summarize(shard))
+    connection.close()
+
+
+def _summarize(shard: Interpreter) -> Summary:
+    statistics = shard.planner.statistics
+    rows = {key: len(bucket) for key, bucket in shard.knowledge.assertions.items() if key != ALL_ASSERTIONS}
+    return statistics.total(), rows, statistics.distinct
+
+
+def _match_batch(shard: Interpreter, query: Compound, batch: List[Bindings]) -> List[List[Bindings]]:
+    match = compile_pattern(query, pattern_match)
+    replies = []
+    for bindings in batch:
+        frame = bindings_to_frame(bindings)
+        results = shard.knowledge.find_assertions(query, frame, match)
+        replies.append([frame_to_bindings(result, frame) for result in results])
+    return replies
+
+
+# Fact counts for the coordinator's planner, summed over the shard summaries the first time they are needed after
+# the facts change. A value held by several shards is counted once per shard, so the distinct counts of a partitioned
+# predicate are upper bounds; the counts of a predicate kept whole on one shard are exact.
+class _ShardStatistics(Statistics):
+    def __init__(self, summarize: Callable[[], List[Summary]]):
+        super().__init__({ALL_ASSERTIONS: []}, ColumnStore())
+        self.summarize = summarize
+        self.size = 0
+        self.rows: Dict[str, int] = {}
+        self.stale = False
+
+    def total(self) -> int:
+        self._refresh()
+        return self.size
+
+    def count(self, key: str) -> int:
+        self._refresh()
+        return self.rows.get(key, 0)
+
+    def _refresh(self) -> None:
+        if not self.stale:
+            return
+        self.stale = False
+        self.size = 0
+        self.rows = {}
+        self.distinct = {}
+        for size, rows, distinct in self.summarize():
+            self.size += size
+            for key, count in rows.items():
+                self.rows[key] = self.rows.get(key, 0) + count
+            for position, count in distinct.items():
+                self.distinct[position] = self.distinct.get(position, 0) + count
+
+
+class _ShardedDatalog(Datalog):
+    def enable(self) -> None:
+        raise RuntimeError("datalog evaluation needs every fact in the coordinator")
+
+
+class _ShardedPool(WorkerPool):
+    def enable(self, workers: Optional[int] = None, threshold: float = PARALLEL_THRESHOLD) -> None:
+        raise RuntimeError("sharded knowledge base is already spread over processes")
+
+
+class _ShardedPersistence(Persistence):
+    def save_snapshot(self, path: str) -> None:
+        raise RuntimeError("facts of a sharded knowledge base live in the shard processes")
+
+    def load_snapshot(self, path: str) -> None:
+        raise RuntimeError("facts of a sharded knowledge base live in the shard processes")
+
+    def open_journal(self, directory: str, group_size: int = 0, compact_after: int = 0,
+                     sync_interval: float = 0) -> None:
+        raise RuntimeError("facts of a sharded knowledge base live in the shard processes")
+
+
+# Coordinator of a knowledge base whose facts are spread over worker processes. Facts are owned by the shard picked
+# by a stable hash of their index key, or of one argument for predicates listed in `partition`. Rules stay in the
+# coordinator, which resolves them as usual and sends every fact lookup, in batches of frames, to the shards that
+# can own a match: one shard when the routing key is known, all of them otherwise.
+class ShardedInterpreter(Interpreter):
+    def __init__(self, consume: Consume, shards: int = 2, partition: Optional[Partition] = None):
+        super().__init__(consume)
+        knowledge = self.knowledge
+        self.datalog = _ShardedDatalog(
+            knowledge.assertions, knowledge.rules, PROCEDURES, knowledge.columns, knowledge.retracted
+        )
+        self.pool = _ShardedPool()
+        self.persistence = _ShardedPersistence(knowledge.image, self._restore, self._replay)
+        self.statistics = _ShardStatistics(self._summaries)
+        self.planner.statistics = self.statistics
+        self.partition: Partition = partition or {}
+        self.scattered: Set[str] = set()
+        self.connections: List[Connection] = []
+        self.processes: List[Process] = []
+        for _ in range(shards):
+            coordinator_end, shard_end = Pipe()
+            process = Process(target=_serve, args=(shard_end,), daemon=True)
+            process.start()
+            shard_end.close()
+            self.connections.append(coordinator_end)
+            self.processes.append(process)
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.send((STOP,))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def load(self, entities: Iterable[AST]) -> None:
+        terms = [make_term(entity) for entity in entities]
+        super().load([to_ast(term) for term in terms if is_rule(term)])
+        facts = [term for term in terms if not is_rule(term)]
+        with self.streams.lock:
+            self._knowledge_changed(facts)
+            self._distribute(facts)
+            self.subscriptions.notify(facts)
+
+    def _insert(self, entities: Compound) -> None:
+        with self.streams.lock:
+            self._knowledge_changed(entities)
+            self.knowledge.insert([entity for entity in entities if is_rule(entity)])
+            self._distribute([entity for entity in entities if not is_rule(entity)])
+            self.subscriptions.notify(entities)
+
+    def _delete(self, entities: Compound) -> None:
+        with self.streams.lock:
+            self._knowledge_changed(entities)
+            self.knowledge.delete([entity for entity in entities if is_rule(entity)])
+            self._distribute([entity for entity in entities if not is_rule(entity)], DELETE)
+            self.subscriptions.refresh()
+
+    def _distribute(self, assertions: List[Compound], operation: str = INSERT) -> None:
+        if assertions:
+            self.statistics.stale = True
+        batches: Dict[int, List[AST]] = {}
+        for assertion in assertions:
+            batches.setdefault(self._owner(assertion), []).append(to_ast(assertion))
+        for shard, batch in batches.items():
+            self.connections[shard].send((operation, batch))
+
+    def _summaries(self) -> List[Summary]:
+        for connection in self.connections:
+            connection.send((STATS,))
+        return [connection.recv() for connection in self.connections]
+
+    def _owner(self, assertion: Compound) -> int:
+        if not is_indexable(assertion):
+            return 0
+        key = get_index_key(assertion)
+        position = self.partition.get(key)
+        if position is None:
+            return _stable_hash(key) % len(self.connections)
+        if position < len(assertion) and is_ground(assertion[position]):
+            return _stable_hash(_term_key(assertion[position])) % len(self.connections)
+        self.scattered.add(key)
+        return _stable_hash(key) % len(self.connections)
+
+    def _targets(self, query: Compound, frame: Frame) -> List[int]:
+        everyone = list(range(len(self.connections)))
+        if not use_index(query):
+            return everyone
+        key = get_index_key(query)
+        position = self.partition.get(key)
+        if position is None:
+            return [_stable_hash(key) % len(self.connections)]
+        if key in self.scattered or position >= len(query) or any(is_dot(node) for node in query[:position + 1]):
+            return everyone
+        argument = substitute(query[position], frame)
+        if not is_ground(argument):
+            return everyone
+        return [_stable_hash(_term_key(argument)) % len(self.connections)]
+
+    def _resolve(self, query: Compound, frames: Frames) -> Frames:
+        batch: List[Frame] = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == SHARD_BATCH_SIZE:
+                yield from self._resolve_batch(query, batch)
+                batch = []
+        if batch:
+            yield from self._resolve_batch(query, batch)
+
+    def _resolve_batch(self, query: Compound, batch: List[Frame]) -> Frames:
+        for frame, results in zip(batch, self._scatter(query, batch)):
+            yield from results
+            yield from self._solve(self._rule_states(query, frame, None, None))
+
+    def _find_assertions(self, query: Compound, frame: Frame, match: Matcher) -> Frames:
+        return self._scatter(query, [frame])[0]
+
+    def _scatter(self, query: Compound, batch: List[Frame]) -> List[List[Frame]]:
+        self.cache.depend_on(get_index_key(query) if use_index(query) else ALL_ASSERTIONS)
+        requests: Dict[int, List[int]] = {}
+        for position, frame in enumerate(batch):
+            for shard in self._targets(query, frame):
+                requests.setdefault(shard, []).append(position)
+        query_ast = to_ast(query)
+        for shard, positions in requests.items():
+            self.connections[shard].send((MATCH, query_ast, [frame_to_bindings(batch[p]) for p in positions]))
+        results: List[List[Frame]] = [[] for _ in batch]
+        for shard, positions in sorted(requests.items()):
+            for position, replies in zip(positions, self.connections[shard].recv()):
+                results[position].extend(bindings_to_frame(bindings, batch[position]) for bindings in replies)
+        return results
@@ -0,0 +1,281 @@
+import mmap
+import struct
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .columns import SWAP_BYTES, Column, ColumnRelation, ColumnStore
+from .helpers import ALL_ASSERTIONS, ArgumentKey, Compound
+from .terms import Symbol, Term, compound, symbol
+
+MAGIC = b"SQLIMG02"
+COUNT = struct.Struct("<Q")
+ALIGNMENT = 8
+
+Buckets = Dict[str, List[Compound]]
+ArgumentIndex = Dict[ArgumentKey, List[Compound]]
+
+
+# Everything an interpreter needs to answer queries without re-parsing: facts in insertion order, rules in
+# insertion order, the fact indexes, stored as positions in the fact list, and the column store.
+class Image:
+    def __init__(self, assertions: Buckets, rules: List[Compound], argument_index: ArgumentIndex,
+                 columns: ColumnStore):
+        self.assertions = assertions
+        self.rules = rules
+        self.argument_index = argument_index
+        self.columns = columns
+
+    # A copy that later changes to the knowledge base leave alone, so it can be written out from another thread.
+    def copy(self) -> "Image":
+        assertions = {key: list(bucket) for key, bucket in self.assertions.items()}
+        argument_index = {key: list(bucket) for key, bucket in self.argument_index.items()}
+        return Image(assertions, list(self.rules), argument_index, self.columns.copy())
+
+
+# Terms are written once each: symbols as (domain, value) string ids and compounds, children first, as lists of
+# references, where a reference is `symbol << 1` or `compound << 1 | 1`. All strings share one table.
+class _Encoder:
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.symbols: Dict[Symbol, int] = {}
+        self.symbol_domains = array("I")
+        self.symbol_values = array("I")
+        self.compounds: Dict[int, int] = {}
+        self.term_offsets = array("I", [0])
+        self.term_refs = array("I")
+
+    def string(self, value: str) -> int:
+        return self.strings.setdefault(value, len(self.strings))
+
+    def ref(self, term: Term) -> int:
+        if isinstance(term, Symbol):
+            index = self.symbols.get(term)
+            if index is None:
+                index = self.symbols[term] = len(self.symbols)
+                self.symbol_domains.append(self.string(term.domain))
+                self.symbol_values.append(self.string(term.value))
+            return index << 1
+        index = self.compounds.get(id(term))
+        if index is None:
+            children = [self.ref(child) for child in term]
+            self.term_refs.extend(children)
+            self.term_offsets.append(len(self.term_refs))
+            index = self.compounds[id(term)] = len(self.term_offsets) - 2
+        return index << 1 | 1
+
+    def sections(self) -> List[Union[array, bytes]]:
+        strings = list(self.strings)
+        string_offsets = array("I", [0])
+        for value in strings:
+            string_offsets.append(string_offsets[-1] + len(value))
+        return [
+            string_offsets, "".join(strings).encode(),
+            self.symbol_domains, self.symbol_values, self.term_offsets, self.term_refs,
+        ]
+
+
+def _to_bytes(section: Union[array, bytes]) -> bytes:
+    if not isinstance(section, array):
+        return section
+    if SWAP_BYTES:
+        section = array(section.typecode, section)
+        section.byteswap()
+    return section.tobytes()
+
+
+def _pack(sections: Iterable[Union[array, bytes]]) -> Iterator[bytes]:
+    for section in sections:
+        data = _to_bytes(section)
+        yield COUNT.pack(len(section))
+        yield data
+        yield bytes(-len(data) % ALIGNMENT)
+
+
+def encode_terms(terms: Sequence[Term]) -> bytes:
+    encoder = _Encoder()
+    refs = array("I", (encoder.ref(term) for term in terms))
+    return b"".join(_pack([*encoder.sections(), refs]))
+
+
+def decode_terms(data: bytes) -> List[Term]:
+    with memoryview(data) as buffer:
+        reader = _Reader(buffer, 0)
+        terms = _Terms(reader)
+        return [terms.term(ref) for ref in reader.ints()]
+
+
+def save_image(path: str, image: Image) -> None:
+    encoder = _Encoder()
+    facts = image.assertions[ALL_ASSERTIONS]
+    positions = {id(fact): position for position, fact in enumerate(facts)}
+    sections = [
+        array("I", (encoder.ref(fact) for fact in facts)),
+        array("I", (encoder.ref(rule) for rule in image.rules)),
+        *_encode_fact_buckets(encoder, image.assertions, positions),
+        *_encode_argument_index(encoder, image.argument_index, positions),
+        *_encode_columns(encoder, image.columns),
+    ]
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.writelines(_pack([*encoder.sections(), *sections]))
+
+
+def _encode_fact_buckets(encoder: _Encoder, assertions: Buckets, positions: Dict[int, int]) -> List[array]:
+    buckets = [(key, bucket) for key, bucket in assertions.items() if key != ALL_ASSERTIONS]
+    bucket_keys = array("I", (encoder.string(key) for key, _ in buckets))
+    return [bucket_keys, *_encode_buckets([bucket for _, bucket in buckets], positions)]
+
+
+def _encode_argument_index(encoder: _Encoder, argument_index: ArgumentIndex,
+                           positions: Dict[int, int]) -> List[array]:
+    keys = array("I", (encoder.string(key) for key, _, _ in argument_index))
+    arguments = array("I", (position for _, position, _ in argument_index))
+    values = array("I", (encoder.string(value) for _, _, value in argument_index))
+    return [keys, arguments, values, *_encode_buckets(list(argument_index.values()), positions)]
+
+
+def _encode_columns(encoder: _Encoder, columns: ColumnStore) -> List[Union[array, bytes]]:
+    relations = [relation for relations in columns.relations.values() for relation in relations]
+    return [
+        array("I", (encoder.ref(value) >> 1 for value in columns.symbols)),
+        array("I", (encoder.ref(relation.head) >> 1 for relation in relations)),
+        array("I", (len(relation.columns) for relation in relations)),
+        array("I", (relation.size for relation in relations)),
+        *(column.tobytes() for relation in relations for column in relation.columns),
+        *(bytes(seen) for relation in relations for seen in relation.seen),
+    ]
+
+
+def _encode_buckets(buckets: List[List[Compound]], positions: Dict[int, int]) -> Tuple[array, array]:
+    offsets = array("I", [0])
+    members = array("I")
+    for bucket in buckets:
+        members.extend(positions[id(fact)] for fact in bucket)
+        offsets.append(len(members))
+    return offsets, members
+
+
+class _Reader:
+    def __init__(self, buffer: memoryview, offset: int):
+        self.buffer = buffer
+        self.offset = offset
+
+    def section(self, item_size: int) -> memoryview:
+        (count,) = COUNT.unpack_from(self.buffer, self.offset)
+        start = self.offset + COUNT.size
+        size = count * item_size
+        self.offset = start + size + (-size % ALIGNMENT)
+        return self.buffer[start:start + size]
+
+    def locate(self, item_size: int) -> Tuple[int, int]:
+        (count,) = COUNT.unpack_from(self.buffer, self.offset)
+        start = self.offset + COUNT.size
+        self.offset = start + count * item_size + (-count * item_size % ALIGNMENT)
+        return start, count
+
+    def ints(self) -> array:
+        items = array("I")
+        with self.section(items.itemsize) as view:
+            items.frombytes(view)
+        if SWAP_BYTES:
+            items.byteswap()
+        return items
+
+    def text(self) -> str:
+        with self.section(1) as view:
+            return str(view, "utf-8")
+
+
+# The file is mapped read-only, so processes loading the same image share its pages through the page cache
+# and sections are decoded straight from the mapping without an intermediate copy. Columns keep reading from
+# the mapping, which stays open as long as they do.
+def load_image(path: str) -> Image:
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    with memoryview(mapping) as buffer:
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a knowledge base image")
+        return _decode(_Reader(buffer, len(MAGIC)), mapping)
+
+
+# Terms are decoded the first time a fact, a rule or a column refers to them, each at most once. A compound only
+# refers to terms written before it, so the compounds it still waits for are decoded from an explicit stack.
+class _Terms:
+    def __init__(self, reader: _Reader):
+        string_offsets = reader.ints()
+        text = reader.text()
+        self.strings = [text[start:end] for start, end in zip(string_offsets, string_offsets[1:])]
+        self.symbol_domains = reader.ints()
+        self.symbol_values = reader.ints()
+        self.offsets = reader.ints()
+        self.refs = reader.ints()
+        self.symbols: List[Optional[Symbol]] = [None] * len(self.symbol_domains)
+        self.compounds: List[Optional[Compound]] = [None] * (len(self.offsets) - 1)
+
+    def term(self, ref: int) -> Term:
+        return self.compound(ref >> 1) if ref & 1 else self.symbol(ref >> 1)
+
+    def symbol(self, index: int) -> Symbol:
+        decoded = self.symbols[index]
+        if decoded is None:
+            domain = self.strings[self.symbol_domains[index]]
+            decoded = self.symbols[index] = symbol(domain, self.strings[self.symbol_values[index]])
+        return decoded
+
+    def compound(self, index: int) -> Compound:
+        compounds = self.compounds
+        stack = [index]
+        while stack:
+            current = stack[-1]
+            if compounds[current] is not None:
+                stack.pop()
+                continue
+            refs = self.refs[self.offsets[current]:self.offsets[current + 1]]
+            pending = [ref >> 1 for ref in refs if ref & 1 and compounds[ref >> 1] is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            compounds[current] = compound(tuple(
+                compounds[ref >> 1] if ref & 1 else self.symbol(ref >> 1) for ref in refs
+            ))
+            stack.pop()
+        return compounds[index]  # type: ignore
+
+
+def _decode(reader: _Reader, mapping: mmap.mmap) -> Image:
+    terms = _Terms(reader)
+    strings = terms.strings
+    facts = [terms.compound(ref >> 1) for ref in reader.ints()]
+    rules = [terms.compound(ref >> 1) for ref in reader.ints()]
+    assertions: Buckets = {ALL_ASSERTIONS: facts}
+    bucket_keys = reader.ints()
+    assertions.update(zip((strings[key] for key in bucket_keys), _decode_buckets(reader, facts)))
+    argument_keys = [
+        (strings[key], position, strings[value])
+        for key, position, value in zip(reader.ints(), reader.ints(), reader.ints())
+    ]
+    argument_index = dict(zip(argument_keys, _decode_buckets(reader, facts)))
+    return Image(assertions, rules, argument_index, _decode_columns(reader, mapping, terms))
+
+
+def _decode_columns(reader: _Reader, mapping: mmap.mmap, terms: _Terms) -> ColumnStore:
+    store = ColumnStore()
+    for index in reader.ints():
+        store.code(terms.symbol(index))
+    heads = [terms.symbol(index) for index in reader.ints()]
+    arities = reader.ints()
+    sizes = reader.ints()
+    columns = [
+        [Column(mapping, reader.locate(1)[0], size) for _ in range(arity)] for arity, size in zip(arities, sizes)
+    ]
+    for head, arity, size, relation_columns in zip(heads, arities, sizes, columns):
+        seen = [bytearray(reader.section(1)) for _ in range(arity)]
+        store.relations.setdefault(head.value, []).append(ColumnRelation(head, relation_columns, seen, size))
+    store.size = sum(sizes)
+    return store
+
+
+def _decode_buckets(reader: _Reader, facts: List[Compound]) -> List[List[Compound]]:
+    offsets = reader.ints()
+    members = reader.ints()
+    return [[facts[member] for member in members[start:end]] for start, end in zip(offsets, offsets[1:])]
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Iterator,
+    List,
+    Tuple,
+    TypeVar,
+)
+
+ASYNC_BATCH_SIZE = 100
+ASYNC_BATCH_SECONDS = 0.05
+ASYNC_QUEUE_SIZE = 100
+
+_END = object()
+
+Result = TypeVar("Result")
+
+
+# Takes rows until the batch is full or the time budget is spent. Returns the rows and whether the results ran out.
+def _take(results: Iterator[str], batch_size: int, budget: float, lock: ContextManager[Any]) -> Tuple[List[str], bool]:
+    deadline = monotonic() + budget
+    batch = []
+    with lock:
+        for row in results:
+            batch.append(row)
+            if len(batch) >= batch_size or monotonic() > deadline:
+                return batch, False
+    return batch, True
+
+
+async def _produce(results: Iterator[str], queue: "asyncio.Queue[Any]", batch_size: int, streams: "Streams") -> None:
+    loop = asyncio.get_running_loop()
+    try:
+        done = False
+        while not done:
+            rows, done = await loop.run_in_executor(
+                streams.executor, _take, results, batch_size, ASYNC_BATCH_SECONDS, streams.lock
+            )
+            for row in rows:
+                await queue.put(row)
+    except Exception as error:  # pylint: disable=broad-except
+        await queue.put(error)
+        return
+    finally:
+        close = getattr(results, "close", None)
+        if close is not None:
+            streams.executor.submit(close)
+    await queue.put(_END)
+
+
+# The evaluation thread of one interpreter's async queries and inserts, and the lock its state is changed under.
+# Batches of rows are taken with `lock` held, and every write takes it too, so a synchronous insert, delete or
+# load waits for the batch in progress instead of changing the knowledge base under it.
+class Streams:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="aquery")
+        self.lock = threading.RLock()
+
+    # Rows are produced by a separate task that evaluates the query on `executor`, a batch of up to `batch_size`
+    # rows or `ASYNC_BATCH_SECONDS` at a time, so the event loop keeps running however many frames a row takes. The
+    # producer waits when `queue_size` rows are pending, so a slow consumer throttles evaluation. Leaving the loop
+    # early or cancelling the consuming task cancels the producer.
+    def stream(self, results: Iterator[str], batch_size: int = ASYNC_BATCH_SIZE,
+               queue_size: int = ASYNC_QUEUE_SIZE) -> AsyncIterator[str]:
+        return _stream(results, batch_size, queue_size, self)
+
+    async def call(self, function: Callable[..., Result], *args: Any) -> Result:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+
+async def _stream(results: Iterator[str], batch_size: int, queue_size: int, streams: Streams) -> AsyncIterator[str]:
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(queue_size)
+    producer = asyncio.ensure_future(_produce(results, queue, batch_size, streams))
+    try:
+        while True:
+            row = await queue.get()
+            if row is _END:
+                return
+            if isinstance(row, Exception):
+                raise row
+            yield row
+    finally:
+        producer.cancel()
@@ -0,0 +1,134 @@
+from itertools import count
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from ..lexer import token
+from .frame import EMPTY_FRAME
+from .helpers import (
+    Compound,
+    Consume,
+    Frames,
+    get_index_key,
+    instantiate,
+    is_atom,
+    is_non_empty_list,
+    is_rule,
+    pattern_match,
+    use_index,
+)
+from .matcher import compile_pattern
+from .planner import IsRelation, is_filter
+
+Delta = Dict[str, List[Compound]]
+Results = Callable[[Compound], Iterator[str]]
+Join = Callable[[Compound, Frames], Frames]
+
+
+def conjuncts_of(query: Compound) -> Compound:
+    if is_non_empty_list(query) and is_atom(query[0]) and query[0].domain == token.AND_KEYWORD:
+        return query[1:]
+    return (query,)
+
+
+def group_facts(entities: Sequence[Compound]) -> Delta:
+    delta: Delta = {}
+    for entity in entities:
+        if not is_rule(entity) and use_index(entity):
+            delta.setdefault(get_index_key(entity), []).append(entity)
+    return delta
+
+
+def negated_patterns(conjuncts: Compound) -> List[Compound]:
+    return [conjunct[1] for conjunct in conjuncts
+            if is_non_empty_list(conjunct) and is_atom(conjunct[0]) and conjunct[0].domain == token.NOT_KEYWORD]
+
+
+# A standing query. `conjuncts` is set when every conjunct, negated ones included, is answered from facts alone: new
+# results then need one of those conjuncts to match an inserted fact, so each inserted fact seeds its conjunct and the
+# remaining ones are joined against the knowledge base. An inserted fact with one of the `negated` keys can only take
+# results away, as can a delete, so those and any other query are re-run and diffed with the results seen so far.
+class Subscription:
+    __slots__ = ("query", "consume", "conjuncts", "negated", "seen")
+
+    def __init__(self, query: Compound, consume: Consume):
+        self.query = query
+        self.consume = consume
+        self.conjuncts: Optional[Compound] = None
+        self.negated: Set[str] = set()
+        self.seen: Set[str] = set()
+
+
+# The standing queries of an interpreter. Inserted entities are pushed through `notify`; a delete, or a change of
+# rules, re-runs the queries with `results` and diffs them with the results seen so far, so a row that disappears
+# is forgotten and pushed again when it comes back. `join` evaluates the remaining conjuncts of a seeded query.
+class Subscriptions:
+    def __init__(self, results: Results, join: Join, is_fact_query: IsRelation):
+        self.active: Dict[int, Subscription] = {}
+        self._ids = count()
+        self._results = results
+        self._join = join
+        self._is_fact_query = is_fact_query
+
+    def subscribe(self, query: Compound, consume: Consume) -> int:
+        subscription = Subscription(query, consume)
+        self._seed(subscription)
+        subscription.seen.update(self._results(query))
+        handle = next(self._ids)
+        self.active[handle] = subscription
+        return handle
+
+    def unsubscribe(self, handle: int) -> None:
+        self.active.pop(handle, None)
+
+    def notify(self, entities: Sequence[Compound]) -> None:
+        if not self.active:
+            return
+        rules_changed = any(is_rule(entity) for entity in entities)
+        delta = group_facts(entities)
+        for handle, subscription in list(self.active.items()):
+            if rules_changed:
+                self._seed(subscription)
+            if subscription.conjuncts is None or rules_changed or not subscription.negated.isdisjoint(delta):
+                self._refresh(handle, subscription)
+            else:
+                self._push(handle, subscription, self._delta_results(subscription.query, subscription.conjuncts, delta))
+
+    def refresh(self) -> None:
+        for handle, subscription in list(self.active.items()):
+            self._seed(subscription)
+            self._refresh(handle, subscription)
+
+    def _seed(self, subscription: Subscription) -> None:
+        conjuncts = conjuncts_of(subscription.query)
+        negated = negated_patterns(conjuncts)
+        if all(is_filter(conjunct) or self._is_fact_query(conjunct) for conjunct in conjuncts) and \
+                all(self._is_fact_query(pattern) for pattern in negated):
+            subscription.conjuncts = conjuncts
+            subscription.negated = {get_index_key(pattern) for pattern in negated}
+        else:
+            subscription.conjuncts = None
+
+    # Re-runs the query: rows that no longer match are forgotten and the new ones are pushed.
+    def _refresh(self, handle: int, subscription: Subscription) -> None:
+        results = list(self._results(subscription.query))
+        subscription.seen.intersection_update(results)
+        self._push(handle, subscription, results)
+
+    def _push(self, handle: int, subscription: Subscription, results: Iterable[str]) -> None:
+        for result in results:
+            if result in subscription.seen:
+                continue
+            subscription.seen.add(result)
+            if subscription.consume(result) is False:
+                self.unsubscribe(handle)
+                return
+
+    def _delta_results(self, query: Compound, conjuncts: Compound, delta: Delta) -> Iterator[str]:
+        for position, conjunct in enumerate(conjuncts):
+            if is_filter(conjunct) or not delta.get(get_index_key(conjunct)):
+                continue
+            match = compile_pattern(conjunct, pattern_match)
+            seeds = (match(fact, EMPTY_FRAME) for fact in delta[get_index_key(conjunct)])
+            frames: Frames = (frame for frame in seeds if frame is not None)
+            rest = conjuncts[:position] + conjuncts[position + 1:]
+            for frame in self._join(rest, frames) if rest else frames:
+                yield instantiate(query, frame)
@@ -0,0 +1,123 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+from .helpers import get_index_key, is_var, use_index
+from .terms import Compound, Symbol, Term, compound, is_uninterned, map_term, var
+
+Answer = Tuple[Term, ...]
+Produce = Callable[[], Iterator[Any]]
+
+VARIANT_PREFIX = "$_"
+
+
+# Returns the key shared by all variants of a term and the variables of the term in the order they are numbered.
+def variant(term: Term) -> Tuple[Term, Tuple[Symbol, ...]]:
+    names: Dict[str, Term] = {}
+
+    def number_var(node: Term) -> Term:
+        return names.setdefault(node.value, var(f"{VARIANT_PREFIX}{len(names)}")) if is_var(node) else node
+
+    key = map_term(term, number_var, compound, is_uninterned)
+    return key, tuple(var(name) for name in names)
+
+
+def variant_key(term: Term) -> Term:
+    return variant(term)[0]
+
+
+# An answer is the tuple of values of the call variables, so a variant call reads it by binding its own variables.
+class AnswerTable:
+    __slots__ = ("key", "call", "variables", "answers", "variants", "complete", "evaluating", "depth", "leader",
+                 "members")
+
+    def __init__(self, key: Term, call: Compound, variables: Tuple[Symbol, ...]):
+        self.key = key
+        self.call = call
+        self.variables = variables
+        self.answers: List[Answer] = []
+        self.variants: Set[Term] = set()
+        self.complete = False
+        self.evaluating = False
+        self.depth = 0
+        self.leader = 0
+        self.members: List["AnswerTable"] = []
+
+    def add(self, answer: Answer) -> bool:
+        key = variant_key(answer)
+        if key in self.variants:
+            return False
+        self.variants.add(key)
+        self.answers.append(answer)
+        return True
+
+
+# Linear tabling: the first call of a variant evaluates it to a local fixpoint, while recursive calls of a variant
+# under evaluation only read the answers found so far. Tables that read an incomplete older table join its SCC and
+# are completed together with it once a whole pass of the leader adds no new answers, or reads no table under
+# evaluation, so it could not have missed any. An evaluation is a generator of the states produced by each pass,
+# so the caller runs them on its own goal stack instead of recursing.
+class Tabling:
+    def __init__(self) -> None:
+        self.predicates: Set[str] = set()
+        self.all = False
+        self.tables: Dict[Term, AnswerTable] = {}
+        self._stack: List[AnswerTable] = []
+        self._answer_count = 0
+        self._partial_reads = 0
+
+    def enable(self, predicates: Iterable[str]) -> None:
+        self.predicates.update(predicates)
+        if not self.predicates:
+            self.all = True
+        self.clear()
+
+    def is_tabled(self, pattern: Compound) -> bool:
+        return self.all or (use_index(pattern) and get_index_key(pattern) in self.predicates)
+
+    def clear(self) -> None:
+        self.tables.clear()
+
+    def lookup(self, call: Compound) -> Tuple[AnswerTable, Tuple[Symbol, ...]]:
+        key, variables = variant(call)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.tables[key] = AnswerTable(key, call, variables)
+        return table, variables
+
+    def read(self, table: AnswerTable) -> List[Answer]:
+        if table.evaluating:
+            self._partial_reads += 1
+            self._stack[-1].leader = min(self._stack[-1].leader, table.depth)
+        return table.answers
+
+    def record(self, table: AnswerTable, answer: Answer) -> None:
+        if table.add(answer):
+            self._answer_count += 1
+
+    def evaluate(self, table: AnswerTable, produce: Produce) -> Iterator[Any]:
+        table.depth = table.leader = len(self._stack)
+        table.evaluating = True
+        self._stack.append(table)
+        try:
+            while True:
+                answer_count, partial_reads = self._answer_count, self._partial_reads
+                yield from produce()
+                if self._answer_count == answer_count or self._partial_reads == partial_reads:
+                    break
+        except BaseException:
+            del self.tables[table.key]
+            raise
+        finally:
+            table.evaluating = False
+            self._stack.pop()
+        self._complete(table)
+
+    def _complete(self, table: AnswerTable) -> None:
+        if table.leader >= table.depth:
+            for member in [table, *table.members]:
+                member.complete = True
+            table.members = []
+            return
+        caller = self._stack[-1]
+        caller.leader = min(caller.leader, table.leader)
+        caller.members.extend([table, *table.members])
+        table.members = []
@@ -0,0 +1,190 @@
+import sys
+import weakref
+from itertools import count
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from ..lexer import token
+from ..parser import AstAtom, AstNode
+
+Compound = Tuple[Any, ...]
+
+SWEEP_MINIMUM = 4096
+
+
+class Symbol:
+    __slots__ = ("id", "domain", "value", "__weakref__")
+
+    def __init__(self, symbol_id: int, domain: str, value: str):
+        self.id = symbol_id
+        self.domain = domain
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Symbol({self.domain!r}, {self.value!r})"
+
+    def __str__(self) -> str:
+        return f"{self.domain} : {self.value}"
+
+
+Term = Union[Symbol, Compound]
+
+# Symbols are compared by identity, so every (domain, value) pair has exactly one instance alive.
+# The table is weak because renamed rule variables are created for every rule application.
+_symbols: "weakref.WeakValueDictionary[Tuple[str, str], Symbol]" = weakref.WeakValueDictionary()
+_symbol_ids = count()
+# Ground compound terms are hash-consed, so structurally equal ground subterms share identity.
+# Tuples cannot be weakly referenced, so the table is strong: it is swept whenever it has doubled since the last
+# sweep, and the knowledge base releases it explicitly after dropping retracted facts.
+_compounds: Dict[Compound, Compound] = {}
+_sweep_size = SWEEP_MINIMUM
+
+
+# Entries are visited newest first, so a compound is released before the subterms interned ahead of it are visited.
+def _sweep(table: Dict[Compound, Compound], references: int) -> None:
+    keys: List[Optional[Compound]] = list(table)
+    for position in range(len(keys) - 1, -1, -1):
+        key = keys[position]
+        keys[position] = None
+        if sys.getrefcount(key) <= references:
+            del table[key]
+
+
+def _releases_unused(references: int) -> bool:
+    probe = (object(),)
+    table = {probe: probe}
+    del probe
+    _sweep(table, references)
+    return not table
+
+
+# The references an entry nothing else uses has while it is swept. Borrowed references differ between CPython
+# versions, so the count is measured on a probe table instead of assumed.
+_TABLE_REFERENCES = next(references for references in count(1) if _releases_unused(references))
+
+
+def release_compounds() -> None:
+    global _sweep_size  # pylint: disable=global-statement
+    _sweep(_compounds, _TABLE_REFERENCES)
+    _sweep_size = max(SWEEP_MINIMUM, 2 * len(_compounds))
+
+
+def _intern(items: Compound) -> Compound:
+    interned = _compounds.setdefault(items, items)
+    if interned is items and len(_compounds) >= _sweep_size:
+        release_compounds()
+    return interned
+
+
+def symbol(domain: str, value: str) -> Symbol:
+    key = (domain, value)
+    sym = _symbols.get(key)
+    if sym is None:
+        sym = Symbol(next(_symbol_ids), domain, value)
+        _symbols[key] = sym
+    return sym
+
+
+def var(name: str) -> Symbol:
+    return symbol(token.VAR_DOMAIN, name)
+
+
+def compound(items: Compound) -> Compound:
+    for item in items:
+        if isinstance(item, Symbol):
+            if item.domain == token.VAR_DOMAIN or item.domain == token.DOT:
+                return items
+        elif _compounds.get(item) is not item:
+            return items
+    return _intern(items)
+
+
+def is_compound(node: Any) -> bool:
+    return isinstance(node, tuple)
+
+
+# Rebuilds a tree bottom-up with an explicit stack, so deep terms cannot exhaust the Python stack. Nodes for which
+# `descend` holds are rebuilt with `build` from their mapped children, every other node is mapped by `leaf`. Leaves
+# are mapped left to right, in order of appearance.
+def map_term(root: Any, leaf: Callable[[Any], Any], build: Callable[[Compound], Any],
+             descend: Callable[[Any], bool] = is_compound) -> Any:
+    if not descend(root):
+        return leaf(root)
+    stack: List[Tuple[Iterator[Any], List[Any]]] = [(iter(root), [])]
+    while True:
+        children, items = stack[-1]
+        for child in children:
+            if descend(child):
+                stack.append((iter(child), []))
+                break
+            items.append(leaf(child))
+        else:
+            stack.pop()
+            built = build(tuple(items))
+            if not stack:
+                return built
+            stack[-1][1].append(built)
+
+
+# The nodes of a tree that `descend` does not enter, left to right.
+def leaves(root: Any, descend: Callable[[Any], bool] = is_compound) -> Iterator[Any]:
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if descend(node):
+            stack.extend(reversed(node))
+        else:
+            yield node
+
+
+def _make_symbol(node: AstAtom) -> Symbol:
+    return symbol(node.domain, node.value)
+
+
+def _is_ast_list(node: AstNode) -> bool:
+    return not isinstance(node, AstAtom)
+
+
+def make_term(node: AstNode) -> Term:
+    return map_term(node, _make_symbol, compound, _is_ast_list)
+
+
+def _make_atom(term: Symbol) -> AstAtom:
+    return AstAtom(term.domain, term.value)
+
+
+def to_ast(term: Term) -> AstNode:
+    return map_term(term, _make_atom, list)
+
+
+# Only ground compounds are interned, so an interned compound needs no walk to be known ground.
+def is_interned(term: Term) -> bool:
+    return isinstance(term, tuple) and _compounds.get(term) is term
+
+
+# A suffix of an interned compound holds only interned items, so it is interned without checking them.
+def interned_suffix(term: Compound, start: int) -> Compound:
+    return _intern(term[start:])
+
+
+def is_ground(term: Term) -> bool:
+    stack = [term]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Symbol):
+            if node.domain == token.VAR_DOMAIN or node.domain == token.DOT:
+                return False
+        elif _compounds.get(node) is not node:
+            stack.extend(node)
+    return True
+
+
+def is_uninterned(term: Term) -> bool:
+    return isinstance(term, tuple) and _compounds.get(term) is not term
+
+
+def _keep(term: Term) -> Term:
+    return term
+
+
+def canonical(term: Term) -> Term:
+    return map_term(term, _keep, compound, is_uninterned)
@@ -0,0 +1,87 @@
+from typing import List
+
+from app.interpreter.cache import canonicalize
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.terms import make_term
+from app.interpreter.test_interpreter import load_commands, run_commands
+from app.parser import parse
+
+COMMANDS = [
+    "(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))",
+    "(@new (@rule (same $x $x)))",
+    "(@new (parent a b) (parent b c) (parent c d) (job a dev) (list a b c))",
+]
+
+
+def cached() -> Interpreter:
+    i = Interpreter(None)
+    i.use_cache()
+    return load_commands(COMMANDS, i)
+
+
+def test_canonicalize():
+    key, names = canonicalize(make_term(parse("(@and (parent $x $y) (parent $y $x))")))
+    other, _ = canonicalize(make_term(parse("(@and (parent $b $a) (parent $a $b))")))
+    assert key == other
+    assert [name.value for name in names.values()] == ["$x", "$y"]
+
+
+def test_cached_results():
+    i = cached()
+    for query in [
+        "(grandparent $x $y)",
+        "(grandparent $a $b)",
+        "(same $x $y)",
+        "(same $q $q)",
+        "($p a $v)",
+        "(list a . $rest)",
+        "(@limit 1 (@and (parent $x $y) (@not (job $x dev))))",
+    ]:
+        expected = run_commands([*COMMANDS, query])
+        assert list(i.query(query)) == expected
+        assert list(i.query(query)) == expected
+    assert (i.cache.hits, i.cache.misses) == (8, 6)
+
+
+def test_scoped_invalidation():
+    i = cached()
+    for query in ["(grandparent $x $y)", "(same $x $y)", "($p a $v)", "(job $x dev)"]:
+        list(i.query(query))
+    assert len(i.cache.entries) == 4
+    i.run("(@new (salary a 100))")
+    assert len(i.cache.entries) == 3
+    i.run("(@new (parent d e))")
+    assert len(i.cache.entries) == 2
+    assert list(i.query("(grandparent $x e)")) == ["(grandparent c e)"]
+    i.run("(@new (@rule (same $x $y) (job $x $y)))")
+    assert len(i.cache.entries) == 2
+    assert list(i.query("(same a $y)")) == ["(same a a)", "(same a dev)"]
+    i.run("(@delete (parent d e))")
+    assert list(i.query("(grandparent $x e)")) == []
+
+
+def test_bounds():
+    i = cached()
+    i.use_cache(entries=2)
+    for query in ["(parent a $x)", "(parent b $x)", "(parent a $y)", "(parent c $x)"]:
+        list(i.query(query))
+    assert list(i.cache.entries) == [
+        canonicalize(make_term(parse(query)))[0] for query in ["(parent a $x)", "(parent c $x)"]
+    ]
+    i.use_cache(max_bytes=100)
+    list(i.query("(parent $x $y)"))
+    assert not i.cache.entries
+    assert i.cache.size == 0
+
+
+def test_partial_results_are_not_cached():
+    i = cached()
+    rows: List[str] = []
+    i.run("(parent $x $y)", lambda row: rows.append(row) or False)
+    assert rows == ["(parent a b)"]
+    assert not i.cache.entries
+    results = i.query("(parent $x $y)")
+    next(results)
+    i.run("(@new (parent x y))")
+    assert len(list(results)) == 3
+    assert not i.cache.entries
@@ -0,0 +1,81 @@
+from typing import List
+
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.terms import make_term
+from app.parser import parse
+
+COMMANDS = [
+    "(@new (@rule (colleague $x $y) (@and (job $x $j) (job $y $j) (@not (same $x $y)))))",
+    "(@new (@rule (same $x $x)))",
+    "(@new (job Ivan dev) (job Olga dev) (job Petr qa) (salary Ivan 120) (salary Olga 130) (salary Petr 90))",
+    "(@new (address Ivan (Moscow Arbat)) (flag) (pair 1 1) (pair 1 2))",
+]
+QUERIES = [
+    "(job $x dev)",
+    "(salary Olga $s)",
+    "(colleague Ivan $y)",
+    "(@and (job $x $j) (salary $x $s) (@apply > $s 100))",
+    "(pair $x $x)",
+    "($p Ivan $v)",
+    "(salary . $rest)",
+    "(address $x (Moscow $street))",
+    "(flag)",
+    "(job Anna $j)",
+]
+
+
+def answers(i: Interpreter) -> List[List[str]]:
+    return [sorted(i.query(query)) for query in QUERIES]
+
+
+def build(columns: bool) -> Interpreter:
+    i = Interpreter(None)
+    if columns:
+        i.use_columns()
+    for cmd in COMMANDS:
+        i.run(cmd)
+    return i
+
+
+def test_columns():
+    expected = answers(build(columns=False))
+    i = build(columns=True)
+    assert answers(i) == expected
+    assert [len(i.knowledge.assertions.get(key, [])) for key in ["job", "salary", "address"]] == [0, 0, 1]
+    assert i.knowledge.columns.size == 9
+    assert i.planner.statistics.estimate(make_term(parse("(job $x dev)")), set()) == 1.5
+
+
+def test_column_index():
+    i = build(columns=True)
+    column = i.knowledge.columns.relations["job"][0].columns[1]
+    assert sorted(i.query("(job $x dev)")) == ["(job Ivan dev)", "(job Olga dev)"]
+    assert column.index is None
+    assert sorted(i.query("(job $x qa)")) == ["(job Petr qa)"]
+    assert column.index is not None
+    i.run("(@new (job Anna dev))")
+    assert sorted(i.query("(job $x dev)")) == ["(job Anna dev)", "(job Ivan dev)", "(job Olga dev)"]
+    i.run("(@delete (job Ivan dev))")
+    assert sorted(i.query("(job $x dev)")) == ["(job Anna dev)", "(job Olga dev)"]
+
+
+def test_columns_datalog():
+    i = build(columns=True)
+    i.use_datalog()
+    assert sorted(i.query("(colleague $x $y)")) == ["(colleague Ivan Olga)", "(colleague Olga Ivan)"]
+
+
+def test_columns_snapshot(tmp_path):
+    source = build(columns=True)
+    source.load(parse(f"(@new (salary p{n} {n}))")[1] for n in range(100))
+    path = str(tmp_path / "kb.img")
+    source.save_snapshot(path)
+    restored = Interpreter(None)
+    restored.use_columns()
+    restored.load_snapshot(path)
+    assert answers(restored) == answers(source)
+    assert restored.planner.statistics.distinct == source.planner.statistics.distinct
+    assert not isinstance(restored.knowledge.columns.relations["salary"][0].columns[0].data, bytearray)
+    restored.run("(@new (salary Anna 150))")
+    assert list(restored.query("(salary Anna $s)")) == ["(salary Anna 150)"]
+    assert len(list(restored.query("(salary $x $s)"))) == 104
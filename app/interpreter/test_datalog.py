@@ -0,0 +1,38 @@
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.test_interpreter import parse_term
+
+
+def test_datalog():
+    i = Interpreter(None)
+    i.use_datalog()
+    i.run("(@new (@rule (path $x $y) (@or (edge $x $y) (@and (path $x $z) (edge $z $y)))))")
+    i.run("(@new (@rule (unreachable $x $y) (@and (node $x) (node $y) (@not (path $x $y)))))")
+    i.run("(@new (@rule (far $x $y) (@and (path $x $y) (weight $x $w) (@apply > $w 5))))")
+    i.run("(@new (@rule (node a)) (node b) (node c) (edge a b) (edge b c) (edge c b) (weight a 7) (weight b 3))")
+    assert set(i.datalog.relation(parse_term("(path $x $y)"))) == {
+        parse_term(f"(path {edge})") for edge in ["a b", "b c", "c b", "a c", "b b", "c c"]
+    }
+    assert sorted(i.query("(unreachable $x $y)")) == [
+        "(unreachable a a)", "(unreachable b a)", "(unreachable c a)"
+    ]
+    assert sorted(i.query("(far $x $y)")) == ["(far a b)", "(far a c)"]
+    assert sorted(i.query("(path $x b)")) == ["(path a b)", "(path b b)", "(path c b)"]
+    i.run("(@new (edge c a))")
+    assert list(i.query("(unreachable $x $y)")) == []
+
+
+def test_datalog_fallback():
+    commands = [
+        "(@new (@rule (same $x $x)))",
+        "(@new (@rule (append () $y $y)))",
+        "(@new (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+        "(@new (@rule (other $x $y) (@and (node $x) (node $y) (@not (same $x $y)))))",
+        "(@new (node a) (node b))",
+    ]
+    i = Interpreter(None)
+    i.use_datalog()
+    for cmd in commands:
+        i.run(cmd)
+    assert list(i.query("(other $x $y)")) == ["(other a b)", "(other b a)"]
+    assert list(i.query("(append $x $y (a))")) == ["(append () (a) (a))", "(append (a) () (a))"]
+    assert i.datalog.relations == {}
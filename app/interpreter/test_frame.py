@@ -0,0 +1,33 @@
+from . import frame as frame_module
+from .frame import EMPTY_FRAME
+from .terms import symbol
+
+
+def test_set_is_persistent():
+    values = [symbol("number", str(n)) for n in range(1000)]
+    frames = [EMPTY_FRAME]
+    for n, value in enumerate(values):
+        frames.append(frames[-1].set(f"$x{n}", value))
+    assert len(frames[-1]) == 1000
+    assert len(frames[500]) == 500
+    assert frames[500].get("$x499") is values[499]
+    assert frames[500].get("$x500") is None
+    assert all(frames[-1][f"$x{n}"] is value for n, value in enumerate(values))
+    assert dict(frames[3]) == {"$x0": values[0], "$x1": values[1], "$x2": values[2]}
+
+
+def test_set_existing_key():
+    first = EMPTY_FRAME.set("$x", symbol("word", "a"))
+    second = first.set("$x", symbol("word", "b"))
+    assert len(second) == 1
+    assert first["$x"] is symbol("word", "a")
+    assert second["$x"] is symbol("word", "b")
+
+
+def test_hash_collisions(monkeypatch):
+    monkeypatch.setattr(frame_module, "_hash", lambda _: 42)
+    frame = EMPTY_FRAME.set("$a", symbol("word", "a")).set("$b", symbol("word", "b")).set("$c", symbol("word", "c"))
+    frame = frame.set("$b", symbol("word", "B"))
+    assert len(frame) == 3
+    assert dict(frame) == {"$a": symbol("word", "a"), "$b": symbol("word", "B"), "$c": symbol("word", "c")}
+    assert frame.get("$d") is None
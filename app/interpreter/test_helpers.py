@@ -0,0 +1,49 @@
+import sys
+
+from app.interpreter.cache import canonicalize, rename
+from app.interpreter.helpers import get_vars, rename_variables
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.prepared import parameters_of, parameters_to_vars
+from app.interpreter.rules import RuleTemplate
+from app.interpreter.tabling import variant
+from app.interpreter.terms import canonical, is_ground, leaves, make_term, to_ast
+from app.lexer import token
+from app.parser import AstAtom
+
+
+def test_long_lists():
+    items = " ".join(f"a{n}" for n in range(2000))
+    i = Interpreter(None)
+    i.run(f"(@new (items ({items})) (@rule (same $x $x)) (@rule (head ($x . $y) $x)))")
+    assert list(i.query("(items $x)")) == [f"(items ({items}))"]
+    assert list(i.query(f"(same ({items}) (a0 . $rest))")) == [f"(same ({items}) ({items}))"]
+    assert len(list(i.query("(@and (items $x) (items (a0 a1 . $rest)))"))) == 1
+    assert list(i.query("(@and (items $x) (head $x $y) (same $y a0))")) == [
+        f"(@and (items ({items})) (head ({items}) a0) (same a0 a0))"
+    ]
+    assert list(i.query("(same $x (f $x))")) == []
+    assert list(i.query("(same (a . $x) (a b c))")) == ["(same (a b c) (a b c))"]
+    assert list(i.query("(same (() (a (b))) $x)")) == ["(same (() (a (b))) (() (a (b))))"]
+    assert list(i.query("(same (a . $x) (a . $y))")) == ["(same (a . $y) (a . $y))"]
+
+
+def test_deep_terms():
+    depth = sys.getrecursionlimit() * 2
+    ast = [AstAtom(token.WORD_DOMAIN, "leaf"), AstAtom(token.VAR_DOMAIN, "$x"), AstAtom(token.PARAMETER_DOMAIN, ":p")]
+    for _ in range(depth):
+        ast = [AstAtom(token.WORD_DOMAIN, "f"), ast]
+    term = make_term(ast)
+    symbols = list(leaves(term))
+    assert len(symbols) == depth + 3
+    assert list(leaves(make_term(to_ast(term)))) == symbols
+    assert not is_ground(term)
+    assert list(leaves(canonical(term))) == symbols
+    assert get_vars(term) == {"$x"}
+    assert parameters_of(term) == [":p"]
+    assert get_vars(parameters_to_vars(term)) == {"$x", ":p"}
+    assert len(get_vars(rename_variables(term))) == 1
+    key, names = canonicalize(term)
+    assert list(leaves(rename(key, names))) == symbols
+    assert variant(term)[1] == (make_term(AstAtom(token.VAR_DOMAIN, "$x")),)
+    template = RuleTemplate(make_term([AstAtom(token.WORD_DOMAIN, "@rule"), ast]))
+    assert template.slots == ("$x",)
@@ -1,14 +1,15 @@
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
-from app.interpreter.interpreter import ALL_ASSERTIONS, ALL_RULES, Interpreter
-from app.parser import AST
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.terms import Compound, make_term
+from app.parser import parse
 
 
-def ast_to_string(ast_dict: Dict[str, List[AST]]) -> Dict[str, List[Union[str, List[Any]]]]:
-    def to_string(tree: AST) -> List[Union[str, List[Any]]]:
+def ast_to_string(ast_dict: Dict[str, List[Compound]]) -> Dict[str, List[Union[str, List[Any]]]]:
+    def to_string(tree: Compound) -> List[Union[str, List[Any]]]:
         str_ast = []
         for node in tree:
-            if isinstance(node, list):
+            if isinstance(node, tuple):
                 str_ast.append(to_string(node))
             else:
                 str_ast.append(node.value)
@@ -20,11 +21,20 @@ def ast_to_string(ast_dict: Dict[str, List[AST]]) -> Dict[str, List[Union[str, L
     return res
 
 
-def run_commands(commands: List[str]) -> List[str]:
-    results = []
-    i = Interpreter(results.append)
+def parse_term(text: str) -> Compound:
+    return make_term(parse(text))
+
+
+def load_commands(commands: List[str], i: Optional[Interpreter] = None) -> Interpreter:
+    i = Interpreter(None) if i is None else i
     for cmd in commands:
         i.run(cmd)
+    return i
+
+
+def run_commands(commands: List[str]) -> List[str]:
+    results = []
+    load_commands(commands, Interpreter(results.append))
     return results
 
 
@@ -285,53 +295,6 @@ def test_rule_next2():
            ]
 
 
-def test_indexing():
-    i = Interpreter(None)
-    i.run("(@new (position (Pichugin Vladislav) developer))")
-    i.run("(@new (@rule (selfBoss $x) (boss $x $x)))")
-    i.run("(@new ((birth date) Vlad (19 April)))")
-    i.run("(@new (@rule ($x nextTo $y in ($x $y . $u))))")
-    i.run("(@new (position Ekaterina HR))")
-    i.run("(@new (@rule ($x nextTo $y in ($v . $z)) ($x nextTo $y in $z)))")
-    i.run("(@new (city Vlad Nizhnevartovsk))")
-    i.run("(@new (@rule ((not index) $x) (test $x)))")
-    i.run("(@new (3 follows 2))")
-    assert ast_to_string(i.assertions) == {
-        ALL_ASSERTIONS: [
-            ["position", ["Pichugin", "Vladislav"], "developer"],
-            [["birth", "date"], "Vlad", ["19", "April"]],
-            ["position", "Ekaterina", "HR"],
-            ["city", "Vlad", "Nizhnevartovsk"],
-            ["3", "follows", "2"]
-        ],
-        "position": [
-            ["position", ["Pichugin", "Vladislav"], "developer"],
-            ["position", "Ekaterina", "HR"]
-        ],
-        "city": [
-            ["city", "Vlad", "Nizhnevartovsk"]
-        ],
-        "3": [
-            ["3", "follows", "2"]
-        ]
-    }
-    assert ast_to_string(i.rules) == {
-        ALL_RULES: [
-            ["@rule", ["selfBoss", "$x"], ["boss", "$x", "$x"]],
-            ["@rule", ["$x", "nextTo", "$y", "in", ["$x", "$y", ".", "$u"]]],
-            ["@rule", ["$x", "nextTo", "$y", "in", ["$v", ".", "$z"]], ["$x", "nextTo", "$y", "in", "$z"]],
-            ["@rule", [["not", "index"], "$x"], ["test", "$x"]]
-        ],
-        "selfBoss": [
-            ["@rule", ["selfBoss", "$x"], ["boss", "$x", "$x"]]
-        ],
-        "$": [
-            ["@rule", ["$x", "nextTo", "$y", "in", ["$x", "$y", ".", "$u"]]],
-            ["@rule", ["$x", "nextTo", "$y", "in", ["$v", ".", "$z"]], ["$x", "nextTo", "$y", "in", "$z"]]
-        ]
-    }
-
-
 def test_depends_on():
     assert run_commands([
         "(@new (@rule (testDepends $y ($z $y))))",
@@ -470,3 +433,57 @@ def test_batch_new():
                "(bigBoss Denis)",
                "(bigBoss Nika)"
            ]
+
+
+def test_consumer_stops_stream():
+    results = []
+
+    def take_three(result):
+        results.append(result)
+        return len(results) < 3
+
+    i = Interpreter(take_three)
+    i.run("(@new (@rule (nat zero)))")
+    i.run("(@new (@rule (nat (succ $x)) (nat $x)))")
+    i.run("(nat $n)")
+    assert results == [
+        "(nat zero)",
+        "(nat (succ zero))",
+        "(nat (succ (succ zero)))"
+    ]
+
+
+def test_query_is_lazy():
+    i = Interpreter(None)
+    i.run("(@new (@rule (nat zero)))")
+    i.run("(@new (@rule (nat (succ $x)) (nat $x)))")
+    i.run("(@new (even zero))")
+    results = i.query("(@and (nat $n) (even $n))")
+    assert next(results) == "(@and (nat zero) (even zero))"
+
+
+def test_limit_offset():
+    i = Interpreter(None)
+    i.run("(@new (@rule (nat zero)) (@rule (nat (succ $x)) (nat $x)))")
+    i.run("(@new (parent a b) (parent a c) (parent b d) (parent b e) (parent b f))")
+    assert list(i.query("(@limit 2 (nat $x))")) == ["(@limit 2 (nat zero))", "(@limit 2 (nat (succ zero)))"]
+    assert list(i.query("(@limit 1 (@offset 2 (nat $x)))")) == ["(@limit 1 (@offset 2 (nat (succ (succ zero)))))"]
+    assert list(i.query("(@offset 3 (parent $x $y))")) == ["(@offset 3 (parent b e))", "(@offset 3 (parent b f))"]
+    assert list(i.query("(@limit 0 (parent $x $y))")) == []
+    assert list(i.query("(@and (parent a $x) (@limit 1 (parent $x $y)))")) == [
+        "(@and (parent a b) (@limit 1 (parent b d)))"
+    ]
+
+
+def test_run_script():
+    i = Interpreter(None)
+    script = "(@new (job Ivan dev) (job Olga qa))\n  (@new (salary Ivan $x))\n(job $x dev) oops\n(@new (job Petr dev))"
+    results: List[str] = []
+    errors: List[str] = []
+    assert i.run_script([script[:10], script[10:]], results.append, errors.append) == 2
+    assert results == ["(job Ivan dev)"]
+    assert errors == [
+        "Error in command at line 2: (2, 22): expected ')', got '$x'",
+        "Error in command at line 3: (3, 14): expected '(', got 'oops'",
+    ]
+    assert list(i.query("(job $x dev)")) == ["(job Ivan dev)", "(job Petr dev)"]
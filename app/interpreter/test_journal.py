@@ -0,0 +1,96 @@
+import os
+import time
+
+from app.interpreter.interpreter import Interpreter
+
+GRANDPARENT = "(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))"
+
+
+def reopen(directory: str) -> Interpreter:
+    i = Interpreter(None)
+    i.open_journal(directory)
+    return i
+
+
+def test_replay(tmp_path):
+    directory = str(tmp_path)
+    i = Interpreter(None)
+    i.open_journal(directory, group_size=2)
+    i.run(GRANDPARENT)
+    i.run("(@new (parent a b) (parent b c))")
+    i.run("(@new (parent c d))")
+    i.close_journal()
+    recovered = reopen(directory)
+    assert list(recovered.query("(grandparent $x $y)")) == ["(grandparent a c)", "(grandparent b d)"]
+    assert sorted(os.listdir(directory)) == ["journal-0.log"]
+
+
+def test_torn_record(tmp_path):
+    directory = str(tmp_path)
+    i = Interpreter(None)
+    i.open_journal(directory)
+    i.run("(@new (parent a b))")
+    i.close_journal()
+    with open(os.path.join(directory, "journal-0.log"), "ab") as file:
+        file.write(b"\x40\x00\x00\x00torn")
+    recovered = reopen(directory)
+    assert list(recovered.query("(parent $x $y)")) == ["(parent a b)"]
+    recovered.run("(@new (parent b c))")
+    recovered.close_journal()
+    assert list(reopen(directory).query("(parent $x $y)")) == ["(parent a b)", "(parent b c)"]
+
+
+def test_compaction(tmp_path):
+    directory = str(tmp_path)
+    i = Interpreter(None)
+    i.open_journal(directory)
+    i.run(GRANDPARENT)
+    i.run("(@new (parent a b))")
+    i.compact()
+    assert sorted(os.listdir(directory)) == ["base-0.img", "journal-1.log"]
+    i.run("(@new (parent b c))")
+    i.close_journal()
+    assert list(reopen(directory).query("(grandparent $x $y)")) == ["(grandparent a c)"]
+
+
+def test_background_compaction(tmp_path):
+    directory = str(tmp_path)
+    i = Interpreter(None)
+    i.open_journal(directory, compact_after=2)
+    i.load([])
+    for n in range(5):
+        i.run(f"(@new (parent p{n} p{n + 1}))")
+    i.close_journal()
+    files = sorted(os.listdir(directory))
+    assert files[0].startswith("base-")
+    assert all(name.startswith("journal-") for name in files[1:])
+    assert list(reopen(directory).query("(parent $x $y)")) == [f"(parent p{n} p{n + 1})" for n in range(5)]
+
+
+def test_replay_deletes(tmp_path):
+    directory = str(tmp_path)
+    i = Interpreter(None)
+    i.open_journal(directory)
+    i.run(GRANDPARENT)
+    i.run("(@new (parent a b) (parent b c) (parent c d))")
+    i.run("(@delete (parent b c))")
+    i.compact()
+    i.run("(@delete (parent c d))")
+    i.run("(@new (parent b c))")
+    i.close_journal()
+    recovered = reopen(directory)
+    assert list(recovered.query("(parent $x $y)")) == ["(parent a b)", "(parent b c)"]
+    assert list(recovered.query("(grandparent $x $y)")) == ["(grandparent a c)"]
+
+
+def test_quiet_tail_is_synced(tmp_path):
+    i = Interpreter(None)
+    i.open_journal(str(tmp_path), group_size=100, sync_interval=0.01)
+    i.run("(@new (parent a b))")
+    journal = i.persistence.journal
+    for _ in range(100):
+        if not journal.unsynced:
+            break
+        time.sleep(0.01)
+    assert journal.unsynced == 0
+    i.close_journal()
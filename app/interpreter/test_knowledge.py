@@ -0,0 +1,205 @@
+from typing import List
+
+import pytest
+
+from app.interpreter import terms
+from app.interpreter.interpreter import ALL_ASSERTIONS, ALL_RULES, Interpreter
+from app.interpreter.knowledge import KnowledgeBase
+from app.interpreter.terms import make_term
+from app.interpreter.test_interpreter import ast_to_string
+from app.parser import parse
+
+
+def rule_buckets(knowledge: KnowledgeBase):
+    buckets = {key: [template.rule for template in bucket.values()] for key, bucket in knowledge.rules.items()}
+    return ast_to_string(buckets)
+
+
+def test_indexing():
+    i = Interpreter(None)
+    i.run("(@new (position (Pichugin Vladislav) developer))")
+    i.run("(@new (@rule (selfBoss $x) (boss $x $x)))")
+    i.run("(@new ((birth date) Vlad (19 April)))")
+    i.run("(@new (@rule ($x nextTo $y in ($x $y . $u))))")
+    i.run("(@new (position Ekaterina HR))")
+    i.run("(@new (@rule ($x nextTo $y in ($v . $z)) ($x nextTo $y in $z)))")
+    i.run("(@new (city Vlad Nizhnevartovsk))")
+    i.run("(@new (@rule ((not index) $x) (test $x)))")
+    i.run("(@new (3 follows 2))")
+    assert ast_to_string(i.knowledge.assertions) == {
+        ALL_ASSERTIONS: [
+            ["position", ["Pichugin", "Vladislav"], "developer"],
+            [["birth", "date"], "Vlad", ["19", "April"]],
+            ["position", "Ekaterina", "HR"],
+            ["city", "Vlad", "Nizhnevartovsk"],
+            ["3", "follows", "2"]
+        ],
+        "position": [
+            ["position", ["Pichugin", "Vladislav"], "developer"],
+            ["position", "Ekaterina", "HR"]
+        ],
+        "city": [
+            ["city", "Vlad", "Nizhnevartovsk"]
+        ],
+        "3": [
+            ["3", "follows", "2"]
+        ]
+    }
+    assert rule_buckets(i.knowledge) == {
+        ALL_RULES: [
+            ["@rule", ["selfBoss", "$x"], ["boss", "$x", "$x"]],
+            ["@rule", ["$x", "nextTo", "$y", "in", ["$x", "$y", ".", "$u"]]],
+            ["@rule", ["$x", "nextTo", "$y", "in", ["$v", ".", "$z"]], ["$x", "nextTo", "$y", "in", "$z"]],
+            ["@rule", [["not", "index"], "$x"], ["test", "$x"]]
+        ],
+        "selfBoss": [
+            ["@rule", ["selfBoss", "$x"], ["boss", "$x", "$x"]]
+        ],
+        "$": [
+            ["@rule", ["$x", "nextTo", "$y", "in", ["$x", "$y", ".", "$u"]]],
+            ["@rule", ["$x", "nextTo", "$y", "in", ["$v", ".", "$z"]], ["$x", "nextTo", "$y", "in", "$z"]]
+        ]
+    }
+
+
+def test_load():
+    entities = parse("""
+    (@new
+        (position Denis developer)
+        (@rule (bigBoss $person) (@and (boss $middleManager $person) (boss $x $middleManager)))
+        (boss Vlad Denis)
+        (@rule ($x nextTo $y in ($x $y . $u)))
+        (boss Alex Vlad)
+    )
+    """)[1:]
+    loaded = Interpreter(None)
+    loaded.load(entities)
+    inserted = Interpreter(None)
+    for entity in entities:
+        inserted._insert([make_term(entity)])
+    assert ast_to_string(loaded.knowledge.assertions) == ast_to_string(inserted.knowledge.assertions)
+    assert rule_buckets(loaded.knowledge) == rule_buckets(inserted.knowledge)
+    assert list(loaded.query("(bigBoss $x)")) == ["(bigBoss Denis)"]
+
+
+def test_argument_index():
+    i = Interpreter(None)
+    knowledge = i.knowledge
+    i.run("(@new (position Vlad developer))")
+    i.run("(@new (position Ekaterina HR))")
+    i.run("(@new (address Vlad (Moscow (street 9) 20)))")
+    i.run("(@new (address Anna (Spb 13)))")
+    developers = knowledge.fetch_assertions(make_term(parse("(position $p developer)")), {})
+    assert ast_to_string({"developers": developers}) == {
+        "developers": [["position", "Vlad", "developer"]]
+    }
+    moscow = knowledge.fetch_assertions(make_term(parse("(address $x (Moscow . $rest))")), {})
+    assert ast_to_string({"moscow": moscow}) == {
+        "moscow": [["address", "Vlad", ["Moscow", ["street", "9"], "20"]]]
+    }
+    bound = {"$x": make_term(parse("(Anna)"))[0]}
+    assert len(knowledge.fetch_assertions(make_term(parse("(address $x $where)")), bound)) == 1
+    assert list(i.query("(@and (position $x HR) (address $x $where))")) == []
+
+
+def test_delete():
+    i = Interpreter(None)
+    knowledge = i.knowledge
+    i.run("(@new (parent a b) (parent b c) (parent b d) (parent a b) (age a 40))")
+    i.run(f"(@new {' '.join(f'(age p{n} {n})' for n in range(10))})")
+    i.run("(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))")
+    rows: List[str] = []
+    i.subscribe("(parent b $y)", rows.append)
+    i.run("(@delete (parent a b) (parent x y))")
+    assert list(i.query("(parent a $y)")) == []
+    assert knowledge.tombstones == 2
+    assert knowledge.retracted == {make_term(parse("(parent a b)")): 2}
+    assert list(i.query("(grandparent $x $y)")) == []
+    assert list(i.query("($p a $v)")) == ["(age a 40)"]
+    i.run("(@delete (parent b d))")
+    assert knowledge.tombstones == 3
+    assert ("parent", 2, "d") in knowledge.argument_index
+    i.run("(@new (parent a b) (parent b d))")
+    assert knowledge.tombstones == 0
+    assert ("parent", 2, "d") in knowledge.argument_index
+    assert rows == ["(parent b d)"]
+
+
+def test_delete_compaction():
+    i = Interpreter(None)
+    knowledge = i.knowledge
+    i.run("(@new (parent a b) (parent b c) (parent b d) (parent a b) (age a 40))")
+    i.run(f"(@new {' '.join(f'(age p{n} {n})' for n in range(10))})")
+    i.run("(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))")
+    rows: List[str] = []
+    i.subscribe("(parent b $y)", rows.append)
+    i.run("(@delete (parent b c) (parent b d) (parent a b) (age a 40))")
+    assert knowledge.tombstones == 0
+    assert len(knowledge.assertions[ALL_ASSERTIONS]) == 10
+    assert "parent" in knowledge.assertions
+    assert ("parent", 2, "d") not in knowledge.argument_index
+    assert ("parent", 1) not in i.planner.statistics.distinct
+    i.run("(@new (parent a b) (parent b c) (parent b d))")
+    assert list(i.query("(grandparent $x $y)")) == ["(grandparent a c)", "(grandparent a d)"]
+    assert rows == ["(parent b c)", "(parent b d)"]
+
+
+def test_delete_rules():
+    i = Interpreter(None)
+    knowledge = i.knowledge
+    i.run("(@new (parent a b) (parent b c))")
+    i.run("(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))")
+    i.run("(@new (@rule (sibling $x $y) (@and (parent $z $x) (parent $z $y))))")
+    i.run("(@delete (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))")
+    assert list(knowledge.rules) == [ALL_RULES, "sibling"]
+    assert list(knowledge.rules[ALL_RULES]) == [1]
+    i.run("(@delete (@rule (sibling $x $y) (@and (parent $z $x) (parent $z $y))))")
+    assert knowledge.rules == {ALL_RULES: {}}
+    assert knowledge.rule_index == {}
+    assert list(i.query("(grandparent $x $y)")) == []
+    with pytest.raises(ValueError):
+        i.query("(@delete (parent a b))")
+
+
+def test_delete_repeated_rules():
+    i = Interpreter(None)
+    knowledge = i.knowledge
+    i.run("(@new (@rule (node a)) (@rule (node b)) (@rule (node a)))")
+    assert list(i.query("(node $x)")) == ["(node a)", "(node b)", "(node a)"]
+    i.run("(@delete (@rule (node a)))")
+    assert rule_buckets(knowledge) == {ALL_RULES: [["@rule", ["node", "b"]]], "node": [["@rule", ["node", "b"]]]}
+    i.run("(@delete (@rule (node b)))")
+    assert knowledge.rules == {ALL_RULES: {}}
+    i.run("(@new (@rule (node a)))")
+    assert list(i.query("(node $x)")) == ["(node a)"]
+
+
+def test_compaction_releases_compounds():
+    i = Interpreter(None)
+    i.run("(@new (gone (x 1)) (kept (y 2)))")
+    i.run("(@delete (gone (x 1)))")
+    i.run("(@new (next 3))")
+    i.run("(@delete (next 3))")
+    assert i.knowledge.tombstones == 0
+    interned = ast_to_string({"interned": list(terms._compounds)})["interned"]  # pylint: disable=protected-access
+    assert ["kept", ["y", "2"]] in interned
+    assert ["gone", ["x", "1"]] not in interned
+    assert ["x", "1"] not in interned
+
+
+def test_delete_datalog_and_columns():
+    for columns in [False, True]:
+        i = Interpreter(None)
+        knowledge = i.knowledge
+        if columns:
+            i.use_columns()
+        i.use_datalog()
+        i.run("(@new (@rule (path $x $y) (edge $x $y)) (@rule (path $x $z) (@and (edge $x $y) (path $y $z))))")
+        i.run("(@new (edge a b) (edge b c) (edge c d))")
+        assert len(list(i.query("(path $x $y)"))) == 6
+        i.run("(@delete (edge b c))")
+        assert sorted(i.query("(path $x $y)")) == ["(path a b)", "(path c d)"]
+        assert knowledge.tombstones == 0
+        assert not any(r.removed for relations in knowledge.columns.relations.values() for r in relations)
+        i.run("(@new (edge b c))")
+        assert len(list(i.query("(path $x $y)"))) == 6
@@ -0,0 +1,46 @@
+from app.parser import parse
+
+from .frame import EMPTY_FRAME
+from .helpers import pattern_match
+from .matcher import compile_pattern
+from .terms import make_term
+
+
+def term(text: str):
+    return make_term(parse(text))
+
+
+def matcher(pattern: str):
+    return compile_pattern(term(pattern), pattern_match)
+
+
+def test_constants_and_vars():
+    match = matcher("(position $x (junior developer))")
+    frame = EMPTY_FRAME
+    result = match(term("(position Vlad (junior developer))"), frame)
+    assert result == {"$x": term("(Vlad)")[0]}
+    assert frame == {}
+    assert match(term("(position Vlad (senior developer))"), frame) is None
+    assert match(term("(position Vlad)"), frame) is None
+
+
+def test_repeated_var():
+    match = matcher("(boss $x $x)")
+    assert match(term("(boss Jack Mike)"), EMPTY_FRAME) is None
+    assert match(term("(boss Jack Jack)"), EMPTY_FRAME) == {"$x": term("(Jack)")[0]}
+
+
+def test_dot_tail():
+    match = matcher("(position $x (developer . $type))")
+    assert match(term("(position Nikita (developer))"), EMPTY_FRAME)["$type"] == ()
+    assert match(term("(position Ivan (developer android ios))"), EMPTY_FRAME)["$type"] == term("(android ios)")
+    assert match(term("(position Ekaterina (HR))"), EMPTY_FRAME) is None
+    assert matcher("(. $all)")(term("(a b)"), EMPTY_FRAME)["$all"] == term("(a b)")
+
+
+def test_frame_is_not_mutated():
+    match = matcher("(address $x $where)")
+    frame = EMPTY_FRAME.set("$x", term("((Ivan Ivanov))")[0])
+    assert match(term("(address Vlad Spb)"), frame) is None
+    assert match(term("(address (Ivan Ivanov) Spb)"), frame) == {**frame, "$where": term("(Spb)")[0]}
+    assert frame == {"$x": term("((Ivan Ivanov))")[0]}
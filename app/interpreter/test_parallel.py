@@ -0,0 +1,30 @@
+from app.interpreter.interpreter import Interpreter
+
+
+def test_parallel():
+    commands = [
+        "(@new (@rule (append () $y $y)))",
+        "(@new (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+        "(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))",
+        "(@new (@rule (relative $x $y) (@or (parent $x $y) (grandparent $x $y))))",
+        "(@new (parent a b) (parent b c) (parent c d) (parent b e))",
+    ]
+    queries = [
+        "(@or (append $x $y (a b)) (parent $x $y))",
+        "(relative $x $y)",
+        "(@and (parent $x $y) (@or (grandparent $y $z) (parent $y $z)))",
+    ]
+    i = Interpreter(None)
+    for cmd in commands:
+        i.run(cmd)
+    expected = [list(i.query(query)) for query in queries]
+    i.parallel(workers=2, threshold=0)
+    try:
+        assert [list(i.query(query)) for query in queries] == expected
+        i.run("(@new (parent d f))")
+        assert "(relative c f)" in i.query("(relative $x $y)")
+        i.run("(@delete (parent b e))")
+        assert "(relative b e)" not in i.query("(relative $x $y)")
+        assert i.knowledge.tombstones == 1
+    finally:
+        i.pool.disable()
@@ -0,0 +1,61 @@
+from app.parser import parse
+
+from .interpreter import Interpreter
+from .terms import make_term
+
+
+def term(text: str):
+    return make_term(parse(text))
+
+
+def make_interpreter() -> Interpreter:
+    i = Interpreter(None)
+    for n in range(20):
+        i.run(f"(@new (job person{n} (developer {n % 5})) (address person{n} (city{n % 10} street{n})))")
+    i.run("(@new (address person3 (Moscow Arbat)))")
+    i.run("(@new (@rule (developer $x) (job $x (developer . $level))))")
+    return i
+
+
+def plan(i: Interpreter, query: str) -> str:
+    planned = i.planner.plan(term(query)[1:])
+    return " ".join(str(conjunct[0].value) if len(conjunct) > 1 else "?" for conjunct in planned)
+
+
+def test_statistics():
+    i = make_interpreter()
+    assert i.planner.statistics.distinct["job", 1] == 20
+    assert i.planner.statistics.distinct["job", 2] == 1
+    assert i.planner.statistics.estimate(term("(job $x $y)"), set()) == 20
+    assert i.planner.statistics.estimate(term("(job $x $y)"), {"$x"}) == 1
+
+
+def test_selective_conjunct_goes_first():
+    i = make_interpreter()
+    query = "(@and (job $x $y) (address $x (Moscow . $r)))"
+    assert plan(i, query) == "address job"
+    assert list(i.query(query)) == ["(@and (job person3 (developer 3)) (address person3 (Moscow Arbat)))"]
+
+
+def test_filters_wait_for_their_variables():
+    i = make_interpreter()
+    query = "(@and (job $x $y) (@not (address $x (Moscow . $r))) (address $x $where) (@apply > $x 1))"
+    assert plan(i, query) == "job @not address @apply"
+    assert plan(i, "(@and (@not (job $x $y)) (address $x (Moscow . $r)))") == "@not address"
+
+
+def test_rule_calls_are_not_moved():
+    i = make_interpreter()
+    assert plan(i, "(@and (developer $x) (address $x (Moscow . $r)))") == "developer address"
+    assert plan(i, "(@and (job $x $y) (developer $x) (address $x (Moscow . $r)))") == "job developer address"
+
+
+def test_hash_join():
+    i = make_interpreter()
+    query = "(@and (job $x (developer $level)) (job $y (developer $level)) (@apply < $x $y))"
+    assert i.planner.join_vars(term("(job $y (developer $level))"), {"$x", "$level"}) == {"$level"}
+    assert i.planner.join_vars(term("(job $x (developer $level))"), {"$x", "$level"}) == set()
+    assert i.planner.join_vars(term("(address $y ($city . $s))"), {"$x", "$city"}) == set()
+    results = list(i.query(query))
+    assert len(results) == 30
+    assert results[0] == "(@and (job person0 (developer 0)) (job person5 (developer 0)) (@apply < person0 person5))"
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.test_interpreter import load_commands
+from app.parser import parse
+
+COMMANDS = [
+    "(@new (@rule (colleague $x $y) (@and (job $x $j) (job $y $j) (@not (same $x $y)))))",
+    "(@new (@rule (same $x $x)))",
+    "(@new (job Ivan dev) (job Olga dev) (job Petr qa) (salary Ivan 120) (salary Olga 130) (salary Petr 90))",
+]
+
+
+def test_prepared():
+    for cache in [False, True]:
+        i = Interpreter(None)
+        if cache:
+            i.use_cache()
+        load_commands(COMMANDS, i)
+        salary = i.prepare("(salary ?name $s)")
+        assert salary.parameters == ["name"]
+        assert list(salary.execute(name="Ivan")) == ["(salary Ivan 120)"]
+        assert list(salary.execute(name="Anna")) == []
+        rich = i.prepare("(@and (job $x ?job) (salary $x $s) (@apply > $s ?min))")
+        expected = list(i.query("(@and (job $x dev) (salary $x $s) (@apply > $s 125))"))
+        assert list(rich.execute(job="dev", min=125)) == expected
+        colleagues = i.prepare("(colleague ?name $y)")
+        assert list(colleagues.execute(name="Ivan")) == ["(colleague Ivan Olga)"]
+        i.run("(@new (job Anna dev))")
+        assert list(colleagues.execute(name="Ivan")) == ["(colleague Ivan Olga)", "(colleague Ivan Anna)"]
+
+
+def test_prepared_plan():
+    i = load_commands(COMMANDS)
+    rich = i.prepare("(@and (salary $x $s) (job $x ?job))")
+    list(rich.execute(job="qa"))
+    assert rich.plan is not None
+    assert rich.plan[0] == rich.query[2]
+    assert rich.version == i.knowledge.version
+    i.run("(@new (job Anna qa))")
+    assert list(rich.execute(job="qa")) == ["(@and (salary Petr 90) (job Petr qa))"]
+    assert rich.version == i.knowledge.version
+
+
+def test_errors():
+    i = load_commands(COMMANDS)
+    statement = i.prepare("(salary ?name $s)")
+    with pytest.raises(ValueError):
+        statement.execute()
+    with pytest.raises(ValueError):
+        statement.execute(name="Ivan", age=3)
+    with pytest.raises(ValueError):
+        statement.execute(name="(Ivan)")
+    with pytest.raises(ValueError):
+        i.query("(salary ?name $s)")
+    with pytest.raises(ValueError):
+        i.prepare("(@new (salary Anna 100))")
+    rule = "(@new (@rule (rich $x) (@and (salary $x $s) (@apply > $s ?min))))"
+    with pytest.raises(ValueError):
+        asyncio.run(i.ainsert(rule))
+    with pytest.raises(ValueError):
+        i.load(parse(rule)[1:])
+    with pytest.raises(ValueError):
+        i.retract(parse(rule)[1:])
+    assert "rich" not in i.knowledge.rules
+
+
+def test_statement_cache():
+    i = load_commands(COMMANDS)
+    for _ in range(3):
+        assert list(i.query("(salary Ivan $s)")) == ["(salary Ivan 120)"]
+    assert list(i.statements.parsed) == ["(salary Ivan $s)"]
@@ -0,0 +1,96 @@
+import pytest
+
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.sharding import ShardedInterpreter
+from app.interpreter.terms import make_term
+from app.interpreter.test_interpreter import load_commands, run_commands
+from app.parser import parse
+
+COMMANDS = [
+    "(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))",
+    "(@new (@rule (sibling $x $y) (@and (parent $p $x) (parent $p $y) (@not (same $x $y)))))",
+    "(@new (@rule (same $x $x)))",
+    "(@new (parent a b) (parent b c) (parent c d) (parent b e) (age b 30) (age c 40) (age e 50))",
+]
+
+
+def test_sharded_results():
+    queries = [
+        "(parent $x $y)",
+        "(parent b $y)",
+        "(grandparent $x $y)",
+        "(sibling $x $y)",
+        "(@and (parent $x $y) (age $y $a) (@apply > $a 35))",
+        "(@or (age $x 30) (parent $x e))",
+        "($p b $y)",
+    ]
+    expected = [sorted(run_commands([*COMMANDS, query])) for query in queries]
+    for partition in [None, {"parent": 1}, {"parent": 2, "age": 2}]:
+        sharded = ShardedInterpreter(None, shards=3, partition=partition)
+        try:
+            load_commands(COMMANDS, sharded)
+            assert [sorted(sharded.query(query)) for query in queries] == expected
+            assert sharded.knowledge.assertions == {"all_assertions": []}
+        finally:
+            sharded.close()
+
+
+def test_sharded_load():
+    sharded = ShardedInterpreter(None, shards=2, partition={"edge": 1})
+    try:
+        sharded.load([parse(f"(@new (edge n{k} n{k + 1}))")[1] for k in range(600)])
+        sharded.load([parse("(@new (@rule (hop $x $z) (@and (edge $x $y) (edge $y $z))))")[1]])
+        assert list(sharded.query("(edge n5 $y)")) == ["(edge n5 n6)"]
+        assert len(list(sharded.query("(hop $x $z)"))) == 599
+    finally:
+        sharded.close()
+
+
+def test_sharded_delete():
+    sharded = ShardedInterpreter(None, shards=2, partition={"edge": 1})
+    try:
+        sharded.run("(@new (edge a b) (edge b c) (@rule (hop $x $z) (@and (edge $x $y) (edge $y $z))))")
+        sharded.run("(@delete (edge b c))")
+        assert list(sharded.query("(edge $x $y)")) == ["(edge a b)"]
+        sharded.run("(@delete (@rule (hop $x $z) (@and (edge $x $y) (edge $y $z))))")
+        sharded.run("(@new (edge b c))")
+        assert list(sharded.query("(hop $x $z)")) == []
+    finally:
+        sharded.close()
+
+
+def test_sharded_statistics():
+    commands = [
+        f"(@new {' '.join(f'(edge n{k} n{k + 1})' for k in range(50))})",
+        "(@new (start n7) (start n9))",
+        "(@delete (edge n0 n1))",
+    ]
+    conjuncts = make_term(parse("(@and (edge $x $y) (start $x))"))[1:]
+    single = Interpreter(None)
+    sharded = ShardedInterpreter(None, shards=3, partition={"edge": 1})
+    try:
+        for cmd in commands[:2]:
+            single.run(cmd)
+            sharded.run(cmd)
+        assert sharded.planner.plan(conjuncts) == single.planner.plan(conjuncts) == conjuncts[::-1]
+        assert sharded.planner.statistics.distinct == single.planner.statistics.distinct
+        sharded.run(commands[2])
+        assert sharded.planner.statistics.estimate(conjuncts[0], set()) == 50
+        assert sharded.planner.statistics.estimate(conjuncts[0], {"$x"}) == 1
+    finally:
+        sharded.close()
+
+
+def test_sharded_refusals(tmp_path):
+    sharded = ShardedInterpreter(None, shards=1)
+    path = str(tmp_path / "kb.img")
+    try:
+        for refused in [
+            sharded.use_datalog, sharded.parallel, sharded.datalog.enable, sharded.pool.enable,
+            lambda: sharded.save_snapshot(path), lambda: sharded.load_snapshot(path),
+            lambda: sharded.open_journal(str(tmp_path)),
+        ]:
+            with pytest.raises(RuntimeError):
+                refused()
+    finally:
+        sharded.close()
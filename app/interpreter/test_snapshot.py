@@ -0,0 +1,42 @@
+import struct
+
+import pytest
+
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.snapshot import decode_terms, encode_terms
+from app.interpreter.terms import make_term
+from app.interpreter.test_interpreter import ast_to_string
+from app.parser import parse
+
+
+def test_snapshot(tmp_path):
+    commands = [
+        "(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))",
+        "(@new (@rule (append () $y $y)) (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+        "(@new (parent a b) (parent b c) (parent b (d e)) (age b 30))",
+    ]
+    queries = ["(grandparent $x $y)", "(parent $x (d $y))", "(append $x $y (1 2))", "($p b $y)"]
+    original = Interpreter(None)
+    for cmd in commands:
+        original.run(cmd)
+    original.save_snapshot(str(tmp_path / "kb.img"))
+    restored = Interpreter(None)
+    restored.run("(@new (parent z z))")
+    restored.load_snapshot(str(tmp_path / "kb.img"))
+    assert [list(restored.query(q)) for q in queries] == [list(original.query(q)) for q in queries]
+    assert restored.knowledge.argument_index == original.knowledge.argument_index
+    assert restored.planner.statistics.distinct == original.planner.statistics.distinct
+    assert ast_to_string(restored.knowledge.assertions) == ast_to_string(original.knowledge.assertions)
+    restored.run("(@new (parent c d))")
+    assert "(grandparent b d)" in restored.query("(grandparent $x $y)")
+    with pytest.raises(ValueError):
+        (tmp_path / "bad.img").write_bytes(b"garbage!" * 4)
+        restored.load_snapshot(str(tmp_path / "bad.img"))
+
+
+def test_encoded_terms():
+    terms = [make_term(parse("(parent a (b c))")), make_term(parse("(x $y (b c))")), make_term(parse("(b c)"))]
+    data = encode_terms(terms)
+    assert decode_terms(data) == terms
+    assert decode_terms(data)[2] is terms[2]
+    assert struct.unpack_from("<Q2I", data) == (9, 0, len("word"))
@@ -0,0 +1,77 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.interpreter.interpreter import Interpreter
+
+
+def test_async_query():
+    async def collect(i: Interpreter, query: str, log: List[str]) -> List[str]:
+        rows = []
+        async for row in i.aquery(query, batch_size=2, queue_size=1):
+            log.append(query)
+            rows.append(row)
+        return rows
+
+    async def scenario():
+        i = Interpreter(None)
+        await i.ainsert("(@new " + " ".join(f"(even {2 * n}) (odd {2 * n + 1})" for n in range(5)) + ")")
+        log: List[str] = []
+        evens, odds = await asyncio.gather(collect(i, "(even $x)", log), collect(i, "(odd $x)", log))
+        assert evens == [f"(even {2 * n})" for n in range(5)]
+        assert odds == [f"(odd {2 * n + 1})" for n in range(5)]
+        assert log != sorted(log)
+
+        rows = i.aquery("(even $x)")
+        assert await rows.__anext__() == "(even 0)"
+        await rows.aclose()
+
+        with pytest.raises(ValueError):
+            await i.ainsert("(even $x)")
+        with pytest.raises(ValueError):
+            async for _ in i.aquery("(@new (even 10))"):
+                pass
+
+    asyncio.run(scenario())
+
+
+def test_async_query_yields_while_searching():
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def scenario():
+        i = Interpreter(None)
+        await i.ainsert("(@new " + " ".join(f"(even {2 * n})" for n in range(5000)) + ")")
+        task = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0)
+        start = ticks
+        rows = [row async for row in i.aquery("(@and (even $x) (@apply > $x 9996))", batch_size=1)]
+        task.cancel()
+        assert rows == ["(@and (even 9998) (@apply > 9998 9996))"]
+        assert ticks - start > 10
+
+    asyncio.run(scenario())
+
+
+def test_batches_wait_for_writes():
+    async def collect(i: Interpreter) -> List[str]:
+        return [row async for row in i.aquery("(even $x)")]
+
+    async def scenario():
+        i = Interpreter(None)
+        assert i.streams.executor is not Interpreter(None).streams.executor
+        await i.ainsert("(@new (even 0) (even 2))")
+        with i.streams.lock:
+            rows = asyncio.ensure_future(collect(i))
+            await asyncio.sleep(0.05)
+            assert not rows.done()
+            i.run("(@new (even 4))")
+        assert await rows == ["(even 0)", "(even 2)", "(even 4)"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+from typing import List
+
+from app.interpreter.interpreter import Interpreter
+
+
+def test_subscriptions():
+    i = Interpreter(None)
+    i.run("(@new (job Ivan dev) (salary Ivan 100))")
+    rich: List[str] = []
+    first: List[str] = []
+    i.subscribe("(@and (job $x dev) (salary $x $s) (@apply > $s 90) (@not (fired $x)))", rich.append)
+    i.subscribe("(job $x $j)", lambda row: first.append(row) or False)
+    assert all(subscription.conjuncts is not None for subscription in i.subscriptions.active.values())
+    i.run("(@new (job Olga dev) (job Petr dev) (salary Petr 50) (fired Anna))")
+    assert rich == []
+    assert first == ["(job Olga dev)"]
+    assert len(i.subscriptions.active) == 1
+    i.run("(@new (salary Olga 120) (salary Anna 200) (job Anna dev))")
+    assert rich == ["(@and (job Olga dev) (salary Olga 120) (@apply > 120 90) (@not (fired Olga)))"]
+    i.run("(@new (salary Olga 120))")
+    assert len(rich) == 1
+
+
+def test_subscriptions_to_rules():
+    i = Interpreter(None)
+    chains: List[str] = []
+    handle = i.subscribe("(grandparent $x $y)", chains.append)
+    i.run("(@new (parent a b) (parent b c))")
+    assert chains == []
+    i.run("(@new (@rule (grandparent $x $z) (@and (parent $x $y) (parent $y $z))))")
+    assert chains == ["(grandparent a c)"]
+    assert i.subscriptions.active[handle].conjuncts is None
+    i.run("(@new (parent c d))")
+    assert chains == ["(grandparent a c)", "(grandparent b d)"]
+    i.unsubscribe(handle)
+    i.run("(@new (parent d e))")
+    assert len(chains) == 2
+
+
+def test_subscriptions_after_delete():
+    i = Interpreter(None)
+    i.run("(@new (job Anna dev) (job Ivan dev) (fired Anna))")
+    rows: List[str] = []
+    i.subscribe("(@and (job $x dev) (@not (fired $x)))", rows.append)
+    i.run("(@delete (fired Anna))")
+    assert rows == ["(@and (job Anna dev) (@not (fired Anna)))"]
+    i.run("(@new (fired Anna))")
+    i.run("(@delete (fired Anna))")
+    assert len(rows) == 2
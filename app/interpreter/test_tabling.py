@@ -0,0 +1,61 @@
+from app.interpreter.interpreter import Interpreter
+from app.interpreter.test_interpreter import run_commands
+
+
+def test_tabled_left_recursion():
+    i = Interpreter(None)
+    i.table("path")
+    i.run("(@new (@rule (path $x $y) (@and (path $x $z) (edge $z $y))))")
+    i.run("(@new (@rule (path $x $y) (edge $x $y)))")
+    i.run("(@new (edge a b) (edge b c) (edge c a) (edge c d))")
+    assert sorted(i.query("(path a $y)")) == ["(path a a)", "(path a b)", "(path a c)", "(path a d)"]
+    assert sorted(i.query("(path $x d)")) == ["(path a d)", "(path b d)", "(path c d)"]
+    i.run("(@new (edge d e))")
+    assert list(i.query("(path e $y)")) == []
+    assert "(path a e)" in list(i.query("(path a $y)"))
+
+
+def test_tabled_mutual_recursion():
+    i = Interpreter(None)
+    i.table()
+    i.run("(@new (@rule (reach $x $y) (edge $x $y)))")
+    i.run("(@new (@rule (reach $x $y) (@and (edge $x $z) (step $z $y))))")
+    i.run("(@new (@rule (step $x $y) (reach $x $y)))")
+    i.run("(@new (edge a b) (edge b a) (edge b c))")
+    assert sorted(i.query("(reach a $y)")) == ["(reach a a)", "(reach a b)", "(reach a c)"]
+    assert sorted(i.query("(step b $y)")) == ["(step b a)", "(step b b)", "(step b c)"]
+
+
+def test_tabled_rules_keep_results():
+    commands = [
+        "(@new (@rule (append () $y $y)))",
+        "(@new (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+        "(@new (@rule (same $x $x)))",
+    ]
+    i = Interpreter(None)
+    i.table()
+    for cmd in commands:
+        i.run(cmd)
+    assert list(i.query("(append $x $y (a b c d))")) == run_commands([*commands, "(append $x $y (a b c d))"])
+    assert list(i.query("(append (a b) (c d) $z)")) == ["(append (a b) (c d) (a b c d))"]
+    assert list(i.query("(same $p $q)")) == ["(same $x $x)"]
+
+
+def test_long_list_rules():
+    size = 1200
+    items = " ".join(f"a{n}" for n in range(size))
+    commands = [
+        "(@new (@rule (append () $y $y)))",
+        "(@new (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+        "(@new (@rule (nextTo $x $y ($x $y . $u))))",
+        "(@new (@rule (nextTo $x $y ($v . $z)) (nextTo $x $y $z)))",
+    ]
+    for setup in (lambda i: None, lambda i: i.table(), lambda i: i.use_cache()):
+        i = Interpreter(None)
+        setup(i)
+        for command in commands:
+            i.run(command)
+        assert list(i.query(f"(append ({items}) (z) $r)")) == [f"(append ({items}) (z) ({items} z))"]
+        assert list(i.query(f"(nextTo a{size - 2} $y ({items}))")) == [
+            f"(nextTo a{size - 2} a{size - 1} ({items}))"
+        ]
@@ -0,0 +1,41 @@
+from app.parser import parse
+
+from . import terms
+from .terms import Symbol, make_term, release_compounds, symbol, to_ast
+
+
+def test_symbols_are_interned():
+    assert symbol("word", "Vlad") is symbol("word", "Vlad")
+    assert symbol("word", "1") is not symbol("number", "1")
+    assert isinstance(symbol("word", "Vlad").id, int)
+
+
+def test_ground_terms_are_hash_consed():
+    first = make_term(parse("(@new (address Vlad (Moscow (street 9) 20)))"))
+    second = make_term(parse("(@new (address Vlad (Moscow (street 9) 20)))"))
+    assert first is second
+    assert first[1][2] is make_term(parse("(Moscow (street 9) 20)"))
+
+
+def test_terms_with_variables_are_not_consed():
+    first = make_term(parse("(address $x (Moscow . $rest))"))
+    second = make_term(parse("(address $x (Moscow . $rest))"))
+    assert first == second
+    assert first is not second
+    assert isinstance(first[1], Symbol)
+
+
+def test_to_ast():
+    ast = parse("(position $x (programmer . $type))")
+    assert to_ast(make_term(ast)) == ast
+
+
+def test_unused_compounds_are_released():
+    kept = make_term(parse("(kept (subterm 1))"))
+    release_compounds()
+    size = len(terms._compounds)  # pylint: disable=protected-access
+    make_term(parse("(dropped (subterm 2) (subterm 3))"))
+    assert len(terms._compounds) == size + 3  # pylint: disable=protected-access
+    release_compounds()
+    assert len(terms._compounds) == size  # pylint: disable=protected-access
+    assert make_term(parse("(kept (subterm 1))")) is kept
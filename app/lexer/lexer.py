@@ -1,70 +1,84 @@
 import re
-from typing import Match, Optional
+from typing import Iterator, Optional, Tuple
 
 from . import token
 
 KEYWORD_GROUP = "keyword"
 VARIABLE_GROUP = "variable"
+PARAMETER_GROUP = "parameter"
 WORD_GROUP = "word"
 NUMBER_GROUP = "number"
 LINE_FEED_GROUP = "line_feed"
-WHITESPACES_GROUP = "whitespaces"
+ERROR_GROUP = "error"
 
-KEYWORD = r"\(|\)|@new|@rule|@apply|@and|@or|@not|<|>|\."
+KEYWORD = r"\(|\)|@new|@delete|@rule|@apply|@and|@or|@not|@limit|@offset|<|>|\."
 VARIABLE = r"\$[a-zA-Z]+[0-9]*"
+PARAMETER = r"\?[a-zA-Z]+[0-9]*"
 WORD = r"[a-zA-Z]+[0-9]*"
 NUMBER = r"[0-9]+"
 LINE_FEED = r"\r?\n"
-WHITESPACES = r"[ \f\r\t\v]+"
-PATTERN = f"(?P<{KEYWORD_GROUP}>{KEYWORD})|(?P<{VARIABLE_GROUP}>{VARIABLE})|(?P<{WORD_GROUP}>{WORD})|" \
-          f"(?P<{NUMBER_GROUP}>{NUMBER})|(?P<{LINE_FEED_GROUP}>{LINE_FEED})|(?P<{WHITESPACES_GROUP}>{WHITESPACES})"
+WHITESPACES = r"[ \f\r\t\v]*"
+PATTERN = f"{WHITESPACES}(?:(?P<{WORD_GROUP}>{WORD})|(?P<{KEYWORD_GROUP}>{KEYWORD})|(?P<{NUMBER_GROUP}>{NUMBER})|" \
+          f"(?P<{VARIABLE_GROUP}>{VARIABLE})|(?P<{PARAMETER_GROUP}>{PARAMETER})|(?P<{LINE_FEED_GROUP}>{LINE_FEED})|" \
+          f"(?P<{ERROR_GROUP}>.)|\\Z)"
 regexp = re.compile(PATTERN)
 
+DOMAINS = {
+    VARIABLE_GROUP: token.VAR_DOMAIN,
+    PARAMETER_GROUP: token.PARAMETER_DOMAIN,
+    WORD_GROUP: token.WORD_DOMAIN,
+    NUMBER_GROUP: token.NUMBER_DOMAIN,
+}
 
+# (domain, row, column, value)
+Lexeme = Tuple[str, int, int, str]
+
+
+# `tokens` scans the whole program with one `finditer` over an alternation that also swallows the whitespace before
+# each token, most frequent groups first, so the Python loop runs once per token or line feed. Whitespace at the
+# end of the program matches with no group and is skipped. Unexpected characters are reported and skipped.
+# `next_token` hands out the same tokens one at a time. `row` and `column` place the program inside a larger source
+# for positions in tokens and errors.
 class Lexer:
-    def __init__(self, program: str):
+    def __init__(self, program: str, row: int = 1, column: int = 1):
         self._program = program
-        self._position = 0
-        self._delta = 0
-        self._line_num = 1
-        self._regexp = regexp
-        self._match: Optional[Match[str]] = None
+        self._row = row
+        self._column = column
+        self._lexemes: Optional[Iterator[Lexeme]] = None
+        self._eof: Optional[token.Token] = None
 
-    def _find(self) -> Optional[Match[str]]:
-        return self._regexp.match(self._program, pos=self._position)
+    @staticmethod
+    def _print_error(row: int, column: int) -> None:
+        print(f"Error ({row}, {column}): unexpected character")
 
-    def _print_error(self) -> None:
-        print(f"Error ({self._line_num}, {self._position - self._delta + 1}): unexpected character")
-
-    def _create_token(self, domain: str, group_name: str) -> token.Token:
-        assert self._match is not None
-        column = self._position - self._delta + 1
-        self._position = self._match.end(group_name)
-        return token.Token(domain, (self._line_num, column), self._match.group(group_name))
+    def tokens(self) -> Iterator[Lexeme]:
+        program = self._program
+        domains = DOMAINS
+        row = self._row
+        line_start = 1 - self._column
+        for match in regexp.finditer(program):
+            group = match.lastgroup
+            if group == LINE_FEED_GROUP:
+                row += 1
+                line_start = match.end()
+            elif group == ERROR_GROUP:
+                self._print_error(row, match.start(group) - line_start + 1)
+            elif group is None:
+                continue
+            elif group == KEYWORD_GROUP:
+                value = match.group(group)
+                yield value, row, match.start(group) - line_start + 1, value
+            else:
+                yield domains[group], row, match.start(group) - line_start + 1, match.group(group)  # type: ignore
+        yield token.EOF_DOMAIN, row, len(program) - line_start + 1, ""
 
     def next_token(self) -> token.Token:
-        if self._position >= len(self._program):
-            return token.Token(token.EOF_DOMAIN, (self._line_num, len(self._program) - self._delta + 1), "")
-
-        self._match = self._find()
-
-        if self._match is None:
-            self._print_error()
-            self._position += 1
-            return self.next_token()
-
-        if self._match.group(LINE_FEED_GROUP):
-            self._delta = self._position = self._match.end(LINE_FEED_GROUP)
-            self._line_num += 1
-            return self.next_token()
-        if self._match.group(VARIABLE_GROUP):
-            return self._create_token(token.VAR_DOMAIN, VARIABLE_GROUP)
-        if self._match.group(WORD_GROUP):
-            return self._create_token(token.WORD_DOMAIN, WORD_GROUP)
-        if self._match.group(NUMBER_GROUP):
-            return self._create_token(token.NUMBER_DOMAIN, NUMBER_GROUP)
-        if self._match.group(KEYWORD_GROUP):
-            return self._create_token(self._match.group(KEYWORD_GROUP), KEYWORD_GROUP)
-
-        self._position = self._match.end(WHITESPACES_GROUP)
-        return self.next_token()
+        if self._eof is not None:
+            return self._eof
+        if self._lexemes is None:
+            self._lexemes = self.tokens()
+        domain, row, column, value = next(self._lexemes)
+        result = token.Token(domain, (row, column), value)
+        if domain == token.EOF_DOMAIN:
+            self._eof = result
+        return result
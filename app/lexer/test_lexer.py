@@ -137,3 +137,41 @@ def test_unexpected_character() -> None:
         ") (1, 18): )",
         "eof (1, 19): "
     ]
+
+
+def test_parameter() -> None:
+    assert get_tokens_list("(salary ?name $s)") == [
+        "( (1, 1): (",
+        "word (1, 2): salary",
+        "parameter (1, 9): ?name",
+        "var (1, 15): $s",
+        ") (1, 17): )",
+        "eof (1, 18): "
+    ]
+
+
+def test_tokens() -> None:
+    program = "(job\r\n  $x @  ?y)" + "\n" * 5000 + "\t(z)"
+    lexemes = list(Lexer(program).tokens())
+    assert lexemes[:5] == [
+        ("(", 1, 1, "("),
+        ("word", 1, 2, "job"),
+        ("var", 2, 3, "$x"),
+        ("parameter", 2, 9, "?y"),
+        (")", 2, 11, ")"),
+    ]
+    assert lexemes[5:] == [("(", 5002, 2, "("), ("word", 5002, 3, "z"), (")", 5002, 4, ")"), ("eof", 5002, 5, "")]
+
+
+def test_trailing_whitespace(capsys) -> None:
+    assert list(Lexer("(a b)  \t ").tokens()) == [
+        ("(", 1, 1, "("), ("word", 1, 2, "a"), ("word", 1, 4, "b"), (")", 1, 5, ")"), ("eof", 1, 10, "")
+    ]
+    assert get_tokens_list("\n  \n\t(a)\r\n   \n\n") == [
+        "( (3, 2): (",
+        "word (3, 3): a",
+        ") (3, 4): )",
+        "eof (6, 1): "
+    ]
+    assert get_tokens_list("   ") == ["eof (1, 4): "]
+    assert capsys.readouterr().out == ""
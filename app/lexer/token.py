@@ -4,15 +4,19 @@ from typing import Tuple
 LEFT_PAREN = "("
 RIGHT_PAREN = ")"
 NEW_KEYWORD = "@new"
+DELETE_KEYWORD = "@delete"
 RULE_KEYWORD = "@rule"
 APPLY_KEYWORD = "@apply"
 AND_KEYWORD = "@and"
 OR_KEYWORD = "@or"
 NOT_KEYWORD = "@not"
+LIMIT_KEYWORD = "@limit"
+OFFSET_KEYWORD = "@offset"
 LESS_OP = "<"
 GREATER_OP = ">"
 DOT = "."
 VAR_DOMAIN = "var"
+PARAMETER_DOMAIN = "parameter"
 WORD_DOMAIN = "word"
 NUMBER_DOMAIN = "number"
 EOF_DOMAIN = "eof"
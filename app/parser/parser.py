@@ -5,8 +5,8 @@ from app.lexer import Lexer, token
 from .types import AST, ParseError, token_to_atom
 
 
-def parse(program: str) -> AST:
-    return Parser(Lexer(program)).parse_command()
+def parse(program: str, row: int = 1, column: int = 1) -> AST:
+    return Parser(Lexer(program, row, column)).parse_command()
 
 
 class Parser:
@@ -22,19 +22,23 @@ class Parser:
     def _next(self) -> None:
         self.current = self.lexer.next_token()
 
-    # Command ::= '(' Insert | Query ')'
+    # Command ::= '(' Insert | Delete | Query ')'
     def parse_command(self) -> AST:
         self._expect([token.LEFT_PAREN])
         self._next()
-        ast = self._parse_insert() if self.current.domain == token.NEW_KEYWORD else self._parse_query()
+        if self.current.domain in (token.NEW_KEYWORD, token.DELETE_KEYWORD):
+            ast = self._parse_insert()
+        else:
+            ast = self._parse_query()
         self._expect([token.RIGHT_PAREN])
         self._next()
         self._expect([token.EOF_DOMAIN])
         return ast
 
     # Insert ::= '@new' Entity+
+    # Delete ::= '@delete' Entity+
     def _parse_insert(self) -> AST:
-        self._expect([token.NEW_KEYWORD])
+        self._expect([token.NEW_KEYWORD, token.DELETE_KEYWORD])
         ast: AST = [token_to_atom(self.current)]
         self._next()
         self._expect([token.LEFT_PAREN])
@@ -82,7 +86,7 @@ class Parser:
             self._next()
         return ast
 
-    # Query ::= SimpleQuery | AndQuery | OrQuery | NotQuery
+    # Query ::= SimpleQuery | AndQuery | OrQuery | NotQuery | SliceQuery
     def _parse_query(self) -> AST:
         if self.current.domain == token.AND_KEYWORD:
             return self._parse_and_query()
@@ -90,6 +94,8 @@ class Parser:
             return self._parse_or_query()
         if self.current.domain == token.NOT_KEYWORD:
             return self._not_query()
+        if self.current.domain in (token.LIMIT_KEYWORD, token.OFFSET_KEYWORD):
+            return self._parse_slice_query()
         return self._parse_simple_query()
 
     # AndQuery ::= '@and' InnerQueries
@@ -114,6 +120,17 @@ class Parser:
         ast.append(self._parse_inner_query())
         return ast
 
+    # SliceQuery ::= ('@limit' | '@offset') Number InnerQuery
+    def _parse_slice_query(self) -> AST:
+        self._expect([token.LIMIT_KEYWORD, token.OFFSET_KEYWORD])
+        ast: AST = [token_to_atom(self.current)]
+        self._next()
+        self._expect([token.NUMBER_DOMAIN])
+        ast.append(token_to_atom(self.current))
+        self._next()
+        ast.append(self._parse_inner_query())
+        return ast
+
     # InnerQueries ::= InnerQuery+
     def _parse_inner_queries(self) -> AST:
         self._expect([token.LEFT_PAREN])
@@ -133,7 +150,7 @@ class Parser:
 
     # Apply ::= '@apply' Predicate ApplyArguments
     # Predicate ::= '<' | '>' | Word
-    # ApplyArguments ::= (Var | Word | Number)+
+    # ApplyArguments ::= (Var | Parameter | Word | Number)+
     def _parse_apply(self) -> AST:
         self._expect([token.APPLY_KEYWORD])
         ast: AST = [token_to_atom(self.current)]
@@ -141,16 +158,18 @@ class Parser:
         self._expect([token.LESS_OP, token.GREATER_OP, token.WORD_DOMAIN])
         ast.append(token_to_atom(self.current))
         self._next()
-        expected_domains = [token.VAR_DOMAIN, token.WORD_DOMAIN, token.NUMBER_DOMAIN]
+        expected_domains = [token.VAR_DOMAIN, token.PARAMETER_DOMAIN, token.WORD_DOMAIN, token.NUMBER_DOMAIN]
         self._expect(expected_domains)
         while self.current.domain in expected_domains:
             ast.append(token_to_atom(self.current))
             self._next()
         return ast
 
-    # SimpleQuery ::= ('(' SimpleQuery ')' | Var | Word | Number)* ('.' Var)?
+    # SimpleQuery ::= ('(' SimpleQuery ')' | Var | Parameter | Word | Number)* ('.' Var)?
     def _parse_simple_query(self) -> AST:
-        expected_domains = [token.LEFT_PAREN, token.VAR_DOMAIN, token.WORD_DOMAIN, token.NUMBER_DOMAIN]
+        expected_domains = [
+            token.LEFT_PAREN, token.VAR_DOMAIN, token.PARAMETER_DOMAIN, token.WORD_DOMAIN, token.NUMBER_DOMAIN,
+        ]
         ast: AST = []
         while self.current.domain in expected_domains:
             if self.current.domain == token.LEFT_PAREN:
@@ -0,0 +1,116 @@
+import codecs
+import mmap
+import re
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+SCRIPT_CHUNK_SIZE = 1 << 20
+
+# (text, row, column) of a top-level command
+Command = Tuple[str, int, int]
+
+_blank = re.compile(r"\S")
+_parens = re.compile(r"[()]")
+_stray = re.compile(r"[^\s(]+")
+
+
+def file_chunks(file: IO[str], chunk_size: int = SCRIPT_CHUNK_SIZE) -> Iterator[str]:
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# Decodes a memory-mapped file chunk by chunk; a character split between two chunks is completed by the next one.
+def mapped_chunks(path: str, chunk_size: int = SCRIPT_CHUNK_SIZE) -> Iterator[str]:
+    with open(path, "rb") as file:
+        if not file.seek(0, 2):
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            for start in range(0, len(mapping), chunk_size):
+                yield decoder.decode(mapping[start:start + chunk_size])
+            yield decoder.decode(b"", final=True)
+
+
+# Cuts a source, given as a stream of chunks, into top-level commands: from a '(' to the ')' that closes it, so only
+# the current command is ever buffered. Between commands only blanks are skipped; anything else is handed over as a
+# command of its own and fails to parse at its position. A command left open at the end is handed over as well.
+def split_commands(chunks: Iterable[str]) -> Iterator[Command]:
+    splitter = _Splitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.finish()
+
+
+# Scanning state carried from one chunk to the next: `depth` of open parentheses in the current command, whether it
+# is `stray` text, the `pending` parts from earlier chunks, its `start` and the position of the scan.
+class _Splitter:
+    def __init__(self) -> None:
+        self.depth = 0
+        self.stray = False
+        self.pending: List[str] = []
+        self.start = (1, 1)
+        self.row, self.column = 1, 1
+        self.begin = 0
+
+    def feed(self, chunk: str) -> Iterator[Command]:
+        self.begin = 0
+        position: Optional[int] = 0
+        while position is not None and position < len(chunk):
+            command = None
+            if self.stray:
+                position, command = self._scan_stray(chunk, position)
+            elif self.depth == 0:
+                position = self._scan_blanks(chunk, position)
+            else:
+                position, command = self._scan_parens(chunk, position)
+            if command is not None:
+                yield command
+        if self.depth > 0 or self.stray:
+            self.pending.append(chunk[self.begin:])
+
+    def finish(self) -> Iterator[Command]:
+        if self.depth > 0 or self.stray:
+            yield "".join(self.pending), self.start[0], self.start[1]
+
+    def _scan_blanks(self, chunk: str, position: int) -> Optional[int]:
+        match = _blank.search(chunk, position)
+        if match is None:
+            self.row, self.column = _advance(chunk, position, len(chunk), self.row, self.column)
+            return None
+        self.row, self.column = _advance(chunk, position, match.start(), self.row, self.column)
+        self.start, self.begin = (self.row, self.column), match.start()
+        self.stray = chunk[self.begin] != "("
+        self.depth = 0 if self.stray else 1
+        return self.begin if self.stray else self.begin + 1
+
+    def _scan_stray(self, chunk: str, position: int) -> Tuple[Optional[int], Optional[Command]]:
+        match = _stray.match(chunk, position)
+        end = position if match is None else match.end()
+        if end == len(chunk):
+            return None, None
+        self.stray = False
+        return end, self._command(chunk[self.begin:end])
+
+    def _scan_parens(self, chunk: str, position: int) -> Tuple[Optional[int], Optional[Command]]:
+        match = _parens.search(chunk, position)
+        if match is None:
+            return None, None
+        self.depth += 1 if match.group() == "(" else -1
+        if self.depth > 0:
+            return match.end(), None
+        return match.end(), self._command(chunk[self.begin:match.end()])
+
+    def _command(self, tail: str) -> Command:
+        text = "".join(self.pending) + tail
+        self.pending = []
+        self.row, self.column = _advance(text, 0, len(text), *self.start)
+        return text, self.start[0], self.start[1]
+
+
+def _advance(text: str, begin: int, end: int, row: int, column: int) -> Tuple[int, int]:
+    lines = text.count("\n", begin, end)
+    if not lines:
+        return row, column + end - begin
+    return row + lines, end - text.rfind("\n", begin, end)
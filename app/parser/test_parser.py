@@ -171,3 +171,33 @@ def test_batch_new() -> None:
         ["@rule : @rule", ["word : same", "var : $x", "var : $x"]],
         ["word : position", "word : Vlad", ["word : junior", "word : developer"]]
     ]
+
+
+def test_slice_query() -> None:
+    assert to_string(parse("(@offset 2 (@limit 10 (@and (job $x $y) (@not (boss $x)))))")) == [
+        "@offset : @offset",
+        "number : 2",
+        [
+            "@limit : @limit",
+            "number : 10",
+            ["@and : @and", ["word : job", "var : $x", "var : $y"], ["@not : @not", ["word : boss", "var : $x"]]],
+        ],
+    ]
+    with pytest.raises(ParseError):
+        parse("(@limit $n (job $x $y))")
+
+
+def test_delete() -> None:
+    assert to_string(parse("(@delete (job Ivan dev) (@rule (same $x $x)))")) == [
+        "@delete : @delete",
+        ["word : job", "word : Ivan", "word : dev"],
+        ["@rule : @rule", ["word : same", "var : $x", "var : $x"]],
+    ]
+
+
+def test_parameters() -> None:
+    assert to_string(parse("(@and (salary ?name $s) (@apply > $s ?min))")) == [
+        "@and : @and",
+        ["word : salary", "parameter : ?name", "var : $s"],
+        ["@apply : @apply", "> : >", "var : $s", "parameter : ?min"],
+    ]
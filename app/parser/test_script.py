@@ -0,0 +1,29 @@
+from typing import List
+
+from .script import mapped_chunks, split_commands
+
+SCRIPT = "(@new (job Ivan dev)\n  (job Olga qa))\n\n  (job $x $y) stray (@new\n(salary Ivan 100)"
+
+
+def chunked(text: str, size: int) -> List[str]:
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+
+def test_split_commands() -> None:
+    expected = [
+        ("(@new (job Ivan dev)\n  (job Olga qa))", 1, 1),
+        ("(job $x $y)", 4, 3),
+        ("stray", 4, 15),
+        ("(@new\n(salary Ivan 100)", 4, 21),
+    ]
+    for size in [1, 2, 7, len(SCRIPT)]:
+        assert list(split_commands(chunked(SCRIPT, size))) == expected
+    assert list(split_commands(["  \n", ""])) == []
+
+
+def test_mapped_chunks(tmp_path) -> None:
+    path = tmp_path / "script.sq"
+    path.write_text("(@new (город Москва))", encoding="utf-8")
+    assert "".join(mapped_chunks(str(path), chunk_size=3)) == "(@new (город Москва))"
+    (tmp_path / "empty.sq").write_text("")
+    assert list(mapped_chunks(str(tmp_path / "empty.sq"))) == []
@@ -0,0 +1,33 @@
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+SIZES = [1_000, 2_000, 4_000]
+ROUNDS = 10
+REPEATS = 20
+QUERIES = [f"(@and (order $o client{n} $item) (price $item $p) (@apply > $p 50))" for n in range(5)]
+
+
+def dashboard(size: int, cache: bool) -> None:
+    i = Interpreter(print)
+    if cache:
+        i.use_cache()
+    i.load(parse(f"(@new (price item{n} {n % 100}))")[1] for n in range(size))
+    i.load(parse(f"(@new (order o{n} client{n % 20} item{n}))")[1] for n in range(size))
+    for number in range(ROUNDS):
+        i.run(f"(@new (visit v{number}))")
+        for _ in range(REPEATS):
+            for query in QUERIES:
+                list(i.query(query))
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'uncached, s':>12} {'cached, s':>10}")
+    for size in SIZES:
+        uncached = measure(lambda: dashboard(size, cache=False))
+        cached = measure(lambda: dashboard(size, cache=True))
+        print(f"{size * 2:>10} {uncached:>12.3f} {cached:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
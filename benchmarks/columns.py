@@ -0,0 +1,43 @@
+import tracemalloc
+from typing import Tuple
+
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+SIZES = [50_000, 100_000, 200_000]
+REPEATS = 200
+
+
+def build(size: int, columns: bool) -> Tuple[Interpreter, int]:
+    facts = [parse(f"(@new (salary person{n} {n % 1000}))")[1] for n in range(size)]
+    tracemalloc.start()
+    i = Interpreter(print)
+    if columns:
+        i.use_columns()
+    i.load(facts)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return i, memory
+
+
+def look_up_values(i: Interpreter) -> None:
+    for n in range(REPEATS):
+        list(i.query(f"(salary $x {n})"))
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'store':>8} {'memory, MB':>11} {'by value, ms':>13} {'by name, ms':>12} "
+          f"{'repeated, ms':>13}")
+    for size in SIZES:
+        for columns in [False, True]:
+            i, memory = build(size, columns)
+            lookup = measure(lambda: list(i.query("(salary $x 999)")))  # pylint: disable=cell-var-from-loop
+            scan = measure(lambda: list(i.query("(salary person5 $s)")))  # pylint: disable=cell-var-from-loop
+            repeated = measure(lambda: look_up_values(i))  # pylint: disable=cell-var-from-loop
+            print(f"{size:>10} {'columns' if columns else 'tuples':>8} {memory / 2 ** 20:>11.1f} "
+                  f"{lookup * 1e3:>13.2f} {scan * 1e3:>12.2f} {repeated / REPEATS * 1e3:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+from typing import List
+
+from app.interpreter import Interpreter
+from app.interpreter.terms import make_term
+from app.parser import AST, parse
+from benchmarks.timing import measure
+
+SIZES = [10_000, 20_000, 40_000, 80_000]
+
+
+def make_facts(count: int) -> List[AST]:
+    return [parse(f"(@new (salary person{n} {n}))")[1] for n in range(count)]
+
+
+def insert_one_by_one(facts: List[AST]) -> None:
+    i = Interpreter(print)
+    for fact in facts:
+        i._insert([make_term(fact)])  # pylint: disable=protected-access
+
+
+def bulk_load(facts: List[AST]) -> None:
+    Interpreter(print).load(facts)
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'insert, s':>10} {'per fact, us':>14} {'load, s':>10} {'per fact, us':>14}")
+    for size in SIZES:
+        facts = make_facts(size)
+        insert_time = measure(lambda: insert_one_by_one(facts))
+        load_time = measure(lambda: bulk_load(facts))
+        print(f"{size:>10} {insert_time:>10.3f} {insert_time / size * 1e6:>14.2f} "
+              f"{load_time:>10.3f} {load_time / size * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
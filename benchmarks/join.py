@@ -0,0 +1,22 @@
+import time
+
+from app.interpreter import Interpreter
+from app.parser import parse
+
+SIZES = [1_000, 2_000, 4_000]
+QUERY = "(@and (home $x (city $c)) (office $y (city $c)))"
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'results':>10} {'join, s':>10}")
+    for size in SIZES:
+        i = Interpreter(print)
+        i.load(parse(f"(@new (home person{n} (city {n})))")[1] for n in range(size))
+        i.load(parse(f"(@new (office person{n} (city {n})))")[1] for n in range(size))
+        start = time.perf_counter()
+        results = sum(1 for _ in i.query(QUERY))
+        print(f"{size:>10} {results:>10} {time.perf_counter() - start:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from app.lexer import Lexer, token
+from benchmarks.timing import measure
+
+SIZES = [10_000, 100_000]
+
+
+def program(size: int) -> str:
+    return "".join(
+        f"(@new (order o{n} client{n % 20} item{n}) (price item{n} {n % 100}))\n\n    \n" for n in range(size)
+    )
+
+
+def one_by_one(text: str) -> None:
+    lexer = Lexer(text)
+    while lexer.next_token().domain != token.EOF_DOMAIN:
+        pass
+
+
+def bulk(text: str) -> None:
+    for _ in Lexer(text).tokens():
+        pass
+
+
+def main() -> None:
+    print(f"{'MB':>8} {'next_token, MB/s':>17} {'tokens, MB/s':>13}")
+    for size in SIZES:
+        text = program(size)
+        megabytes = len(text) / 1e6
+        print(f"{megabytes:>8.1f} {megabytes / measure(lambda: one_by_one(text)):>17.1f} "
+              f"{megabytes / measure(lambda: bulk(text)):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+LENGTHS = [1_000, 10_000, 100_000]
+QUERIES = [
+    "(items $x)",
+    "(@and (items $x) (items (a0 a1 . $rest)))",
+    "(@and (items $x) (same $x (a0 . $rest)))",
+]
+
+
+def main() -> None:
+    print(f"{'length':>10} " + " ".join(f"{f'query {n}, s':>12}" for n in range(1, len(QUERIES) + 1)))
+    for length in LENGTHS:
+        i = Interpreter(print)
+        items = " ".join(f"a{n}" for n in range(length))
+        i.load([parse(f"(@new (items ({items})))")[1], parse("(@new (@rule (same $x $x)))")[1]])
+        times = [measure(lambda: list(i.query(query))) for query in QUERIES]
+        print(f"{length:>10} " + " ".join(f"{seconds:>12.3f}" for seconds in times))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from typing import List
+
+from app.interpreter.frame import EMPTY_FRAME
+from app.interpreter.helpers import pattern_match
+from app.interpreter.matcher import compile_pattern
+from app.interpreter.terms import Compound, make_term
+from app.parser import parse
+from benchmarks.timing import measure
+
+FACTS = 100_000
+PATTERNS = [
+    "(position $x (developer . $type))",
+    "(position $x (developer backend))",
+    "(position $x $x)",
+]
+
+
+def make_facts(count: int) -> List[Compound]:
+    kinds = ["(developer backend)", "(developer frontend android)", "(HR)", "analyst"]
+    return [make_term(parse(f"(@new (position person{n} {kinds[n % len(kinds)]}))"))[1] for n in range(count)]
+
+
+def main() -> None:
+    facts = make_facts(FACTS)
+    print(f"{'pattern':>36} {'generic, s':>11} {'compiled, s':>12}")
+    for text in PATTERNS:
+        pattern = make_term(parse(text))
+        match = compile_pattern(pattern, pattern_match)
+
+        def generic() -> int:
+            return sum(pattern_match(pattern, fact, EMPTY_FRAME) is not None for fact in facts)
+
+        def compiled() -> int:
+            return sum(match(fact, EMPTY_FRAME) is not None for fact in facts)
+
+        assert generic() == compiled()
+        print(f"{text:>36} {measure(generic):>11.3f} {measure(compiled):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
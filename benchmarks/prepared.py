@@ -0,0 +1,36 @@
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+SIZES = [1_000, 10_000]
+CALLS = 5_000
+QUERY = "(@and (order $o ?client $item) (price $item $p) (@apply > $p ?min))"
+
+
+def setup(size: int) -> Interpreter:
+    i = Interpreter(print)
+    i.load(parse(f"(@new (price item{n} {n % 100}))")[1] for n in range(size))
+    i.load(parse(f"(@new (order o{n} client{n} item{n}))")[1] for n in range(size))
+    return i
+
+
+def raw(i: Interpreter, size: int) -> None:
+    for n in range(CALLS):
+        list(i.query(QUERY.replace("?client", f"client{n % size}").replace("?min", "50")))
+
+
+def prepared(i: Interpreter, size: int) -> None:
+    statement = i.prepare(QUERY)
+    for n in range(CALLS):
+        list(statement.execute(client=f"client{n % size}", min=50))
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'raw, s':>10} {'prepared, s':>12}")
+    for size in SIZES:
+        i = setup(size)
+        print(f"{size * 2:>10} {measure(lambda: raw(i, size)):>10.3f} {measure(lambda: prepared(i, size)):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import time
+
+from app.interpreter import Interpreter
+
+SIZES = [50, 100, 200]
+RULES = [
+    "(@new (@rule (append () $y $y)))",
+    "(@new (@rule (append ($u . $v) $y ($u . $z)) (append $v $y $z)))",
+]
+
+
+def main() -> None:
+    print(f"{'size':>10} {'append, s':>10} {'dispatch, s':>12}")
+    for size in SIZES:
+        i = Interpreter(print)
+        for rule in RULES:
+            i.run(rule)
+        for n in range(size):
+            i.run(f"(@new (@rule (lookup key{n} $v) (@and (value {n} $v) (@not (hidden $v)))))")
+            i.run(f"(@new (value {n} item{n}))")
+        items = " ".join(f"item{n}" for n in range(size))
+        start = time.perf_counter()
+        for _ in i.query(f"(append $x $y ({items}))"):
+            pass
+        append_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for n in range(size):
+            for _ in i.query(f"(lookup key{n} $v)"):
+                pass
+        print(f"{size:>10} {append_time:>10.3f} {time.perf_counter() - start:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
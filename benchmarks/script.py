@@ -0,0 +1,50 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.interpreter import Interpreter
+from app.parser import parse
+from app.parser.script import file_chunks, split_commands
+
+SIZES = [20_000, 200_000]
+
+
+def write_script(path: str, size: int) -> None:
+    with open(path, "w") as file:
+        for n in range(size):
+            file.write(f"(@new (order o{n} client{n % 20} item{n})\n  (price item{n} {n % 100}))\n")
+
+
+def parse_only(path: str) -> int:
+    tracemalloc.start()
+    with open(path) as file:
+        for text, row, column in split_commands(file_chunks(file)):
+            parse(text, row, column)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def execute(path: str) -> float:
+    i = Interpreter(None)
+    start = time.perf_counter()
+    with open(path) as file:
+        i.run_script(file_chunks(file))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    print(f"{'MB':>8} {'parse peak, MB':>15} {'run, s':>8} {'commands/s':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            path = os.path.join(directory, f"{size}.sq")
+            write_script(path, size)
+            megabytes = os.path.getsize(path) / 1e6
+            peak = parse_only(path) / 1e6
+            seconds = execute(path)
+            print(f"{megabytes:>8.1f} {peak:>15.1f} {seconds:>8.2f} {size / seconds:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
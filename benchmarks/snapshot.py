@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+SIZES = [10_000, 20_000, 40_000, 80_000]
+
+
+def parse_commands(size: int) -> None:
+    i = Interpreter(print)
+    for n in range(size):
+        i.run(f"(@new (salary person{n} {n}) (job person{n} (programmer {n % 10})))")
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'commands, s':>12} {'snapshot, s':>12} {'size, KB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "kb.img")
+        for size in SIZES:
+            commands_time = measure(lambda: parse_commands(size))
+            source = Interpreter(print)
+            for n in range(size):
+                source.load(parse(f"(@new (salary person{n} {n}) (job person{n} (programmer {n % 10})))")[1:])
+            source.save_snapshot(path)
+            snapshot_time = measure(lambda: Interpreter(print).load_snapshot(path))
+            print(f"{size * 2:>10} {commands_time:>12.3f} {snapshot_time:>12.3f} {os.path.getsize(path) / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
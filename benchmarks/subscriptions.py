@@ -0,0 +1,48 @@
+from typing import List
+
+from app.interpreter import Interpreter
+from app.parser import parse
+from benchmarks.timing import measure
+
+SIZES = [2_000, 4_000, 8_000]
+BATCHES = 50
+QUERIES = [f"(@and (order $o client{n} $item) (price $item $p) (@apply > $p 50))" for n in range(12)]
+
+
+def setup(size: int) -> Interpreter:
+    i = Interpreter(print)
+    i.load(parse(f"(@new (price item{n} {n % 100}))")[1] for n in range(size))
+    i.load(parse(f"(@new (order o{n} client{n % 20} item{n}))")[1] for n in range(size))
+    return i
+
+
+def batch(size: int, number: int) -> str:
+    orders = " ".join(f"(order new{number}x{k} client{k % 20} item{(number * 7 + k) % size})" for k in range(10))
+    return f"(@new {orders})"
+
+
+def rerun(size: int) -> None:
+    i = setup(size)
+    for number in range(BATCHES):
+        i.run(batch(size, number))
+        for query in QUERIES:
+            list(i.query(query))
+
+
+def subscribed(size: int) -> None:
+    i = setup(size)
+    results: List[str] = []
+    for query in QUERIES:
+        i.subscribe(query, results.append)
+    for number in range(BATCHES):
+        i.run(batch(size, number))
+
+
+def main() -> None:
+    print(f"{'facts':>10} {'rerun, s':>10} {'subscribe, s':>13}")
+    for size in SIZES:
+        print(f"{size * 2:>10} {measure(lambda: rerun(size)):>10.3f} {measure(lambda: subscribed(size)):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import time
+from typing import Any, Callable
+
+
+def measure(action: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    action()
+    return time.perf_counter() - start
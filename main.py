@@ -2,6 +2,7 @@ import configparser
 import os
 
 from app.interpreter import Interpreter
+from app.parser.script import file_chunks
 
 CONFIG_NAME = "streamql.cfg"
 STREAM_QL_CONFIG_DICT = "StreamQL"
@@ -25,7 +26,7 @@ def show_help():
 
 def run(file_name: str):
     with open(file_name, "r") as f:
-        i.run(f.read())
+        i.run_script(file_chunks(f))
         print()
 
 